@@ -0,0 +1,210 @@
+"""Benchmark the scene, npcs, battle and cheatsheet commands on a large setting.
+
+Each command is timed end to end, by running ``fh`` in a subprocess with and without
+the caches, and stage by stage in this process: finding and loading the setting,
+loading the scene or cheatsheet, building the panes, and laying them out. The pager
+is replaced by ``cat`` with its output discarded.
+
+Results are saved as JSON (by default in benchmarks/results/, named after the
+installed version of Fourhills), and can be compared with an earlier run to see
+regressions.
+
+Usage::
+
+    python benchmarks/bench_commands.py [--setting DIR] [--repeat N]
+        [--output FILE] [--compare FILE]
+
+Without --setting, a synthetic setting is generated in a temporary directory; the
+options of generate_setting.py control its size.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_setting import generate_setting
+
+COMMANDS = ["scene", "npcs", "battle", "cheatsheet"]
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def fourhills_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("fourhills")
+    except Exception:
+        return "unknown"
+
+
+def command_args(command: str):
+    return ["cheatsheet", "cheatsheet_0"] if command == "cheatsheet" else [command]
+
+
+def time_end_to_end(command: str, location: Path, repeat: int, cached: bool) -> dict:
+    """Time running fh in a subprocess, returning the fastest and median times."""
+    env = dict(os.environ, PAGER="cat")
+    env.pop("FH_NO_CACHE", None)
+    if not cached:
+        env["FH_NO_CACHE"] = "1"
+    fh = [sys.executable, "-c", "from fourhills.fourhills import cli; cli()"]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            fh + command_args(command),
+            cwd=location,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings)}
+
+
+def time_stages(command: str, location: Path) -> dict:
+    """Time each stage of a command once, in this process."""
+    from fourhills.scene import Scene
+    from fourhills.setting import Setting
+    from fourhills.text_utils import screen_lines
+
+    stages = {}
+
+    def stage(name, function):
+        start = time.perf_counter()
+        result = function()
+        stages[name] = time.perf_counter() - start
+        return result
+
+    os.chdir(location)
+    setting = stage("setting", Setting)
+    if command == "cheatsheet":
+        cheatsheet = stage(
+            "load", lambda: setting.cheatsheets.from_prefix(command_args(command)[1])
+        )
+        panes = stage(
+            "panes",
+            lambda: [
+                section.lines(setting.pane_width) for section in cheatsheet.sections
+            ],
+        )
+    else:
+        scene = stage(
+            "load",
+            lambda: Scene.from_file("scene.yaml", setting=setting, cache=setting.cache),
+        )
+        method = {
+            "scene": scene.scene_panes,
+            "npcs": scene.npc_panes,
+            "battle": scene.battle_panes,
+        }[command]
+        panes = stage("panes", lambda: list(method()))
+    stage(
+        "layout", lambda: list(screen_lines(panes, setting.panes, setting.pane_width))
+    )
+    return stages
+
+
+def run_benchmarks(location: Path, repeat: int) -> dict:
+    results = {}
+    original_dir = os.getcwd()
+    no_cache = os.environ.get("FH_NO_CACHE")
+    try:
+        for command in COMMANDS:
+            # Uncached stages are measured first, before anything is in memory
+            os.environ["FH_NO_CACHE"] = "1"
+            cold_stages = time_stages(command, location)
+            os.environ.pop("FH_NO_CACHE")
+            time_stages(command, location)
+            warm_stages = time_stages(command, location)
+            results[command] = {
+                "end_to_end_uncached": time_end_to_end(
+                    command, location, repeat, False
+                ),
+                "end_to_end_cached": time_end_to_end(command, location, repeat, True),
+                "stages_uncached": cold_stages,
+                "stages_cached": warm_stages,
+            }
+    finally:
+        os.chdir(original_dir)
+        if no_cache is not None:
+            os.environ["FH_NO_CACHE"] = no_cache
+    return results
+
+
+def print_results(results: dict, previous: dict = None):
+    for command, command_results in results["commands"].items():
+        print(command)
+        for name, timings in command_results.items():
+            for key, seconds in timings.items():
+                line = f"  {name + ' ' + key:<32} {seconds * 1000:9.1f} ms"
+                try:
+                    old_seconds = previous["commands"][command][name][key]
+                    line += f"  ({(seconds / old_seconds - 1) * 100:+.0f}%)"
+                except (KeyError, TypeError, ZeroDivisionError):
+                    pass
+                print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--setting",
+        type=Path,
+        help="Location within an existing setting with a scene file to benchmark.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="File to save the results in.")
+    parser.add_argument("--compare", type=Path, help="Earlier results to compare with.")
+    for option, default in [
+        ("monsters", 2000),
+        ("npcs", 1000),
+        ("cheatsheets", 100),
+        ("depth", 4),
+        ("branching", 5),
+    ]:
+        parser.add_argument(f"--{option}", type=int, default=default)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.setting:
+            location = args.setting.resolve()
+            setting_info = {"path": str(location)}
+        else:
+            setting_info = {
+                option: getattr(args, option)
+                for option in ["monsters", "npcs", "cheatsheets", "depth", "branching"]
+            }
+            print(f"Generating setting: {setting_info}")
+            location = generate_setting(Path(directory), **setting_info)
+
+        results = {
+            "version": fourhills_version(),
+            "python": platform.python_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "setting": setting_info,
+            "commands": run_benchmarks(location, args.repeat),
+        }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    output = args.output or RESULTS_DIR / f"{results['version']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Generate a large synthetic setting, for benchmarking.
+
+The setting has the usual directory structure, with a configurable number of
+monsters, NPCs and cheatsheets, and a world tree of a configurable depth and
+branching factor. Every location in the world has a scene.yaml placing some of the
+monsters and NPCs there, and a scene.md of notes. The content is random, but the
+same seed always gives the same setting.
+
+Usage::
+
+    python benchmarks/generate_setting.py OUTPUT_DIR [--monsters N] [--npcs N]
+        [--cheatsheets N] [--depth N] [--branching N] [--seed N]
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+import yaml
+
+SIZES = ["tiny", "small", "medium", "large", "huge", "gargantuan"]
+CREATURE_TYPES = [
+    "aberration",
+    "beast",
+    "celestial",
+    "construct",
+    "dragon",
+    "elemental",
+    "fey",
+    "fiend",
+    "giant",
+    "humanoid (any race)",
+    "monstrosity",
+    "ooze",
+    "plant",
+    "undead",
+]
+ALIGNMENTS = [
+    "unaligned",
+    "lawful good",
+    "neutral good",
+    "chaotic good",
+    "lawful neutral",
+    "neutral",
+    "chaotic neutral",
+    "lawful evil",
+    "neutral evil",
+    "chaotic evil",
+]
+DAMAGE_TYPES = [
+    "acid",
+    "cold",
+    "fire",
+    "lightning",
+    "necrotic",
+    "poison",
+    "psychic",
+    "radiant",
+    "thunder",
+]
+LANGUAGES = ["Common", "Elvish", "Dwarvish", "Giant", "Goblin", "Draconic", "Abyssal"]
+CHALLENGES = [0, 0.125, 0.25, 0.5] + list(range(1, 31))
+WORDS = (
+    "the old road winds past a ruined watchtower where travellers say a pale light "
+    "burns at midnight and the river runs black with silt from the mines above while "
+    "merchants haggle over salt iron and rumours of a dragon sleeping beneath hills"
+).split()
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + "."
+
+
+def paragraph(rng: random.Random, sentences: int = 4) -> str:
+    return " ".join(sentence(rng, rng.randint(6, 18)) for _ in range(sentences))
+
+
+def make_monster(rng: random.Random, index: int) -> dict:
+    """Return the contents of a random monster file."""
+    hit_dice = rng.randint(1, 20)
+    damage_die = rng.choice([4, 6, 8, 10, 12])
+    return {
+        "name": f"Monster {index}",
+        "size": rng.choice(SIZES),
+        "creature_type": rng.choice(CREATURE_TYPES),
+        "alignment": rng.choice(ALIGNMENTS),
+        "ac": str(rng.randint(8, 20)),
+        "hp": f"{hit_dice * 5} ({hit_dice}d8 + {hit_dice})",
+        "speed": f"{rng.choice([20, 30, 40])} ft.",
+        "ability": {
+            ability: rng.randint(3, 20)
+            for ability in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
+        },
+        "skills": {"perception": f"+{rng.randint(0, 8)}"},
+        "damage_resistances": rng.sample(DAMAGE_TYPES, rng.randint(0, 3)),
+        "damage_immunities": rng.sample(DAMAGE_TYPES, rng.randint(0, 1)),
+        "passive_perception": rng.randint(8, 20),
+        "languages": rng.sample(LANGUAGES, rng.randint(0, 3)),
+        "challenge": rng.choice(CHALLENGES),
+        "special_traits": {"trait": paragraph(rng, 2)},
+        "melee_attacks": {
+            "claw": {
+                "hit": f"+{rng.randint(2, 12)}",
+                "reach": "5 ft.",
+                "targets": "one target",
+                "damage": f"{damage_die} (2d{damage_die} + 2) slashing damage",
+            }
+        },
+        "ranged_attacks": {
+            "spit": {
+                "hit": f"+{rng.randint(2, 12)}",
+                "range": "30/120 ft.",
+                "targets": "one target",
+                "damage": f"{damage_die} (1d{damage_die} + 1) acid damage",
+            }
+        },
+        "multiattack": "The monster makes two claw attacks.",
+        "description": paragraph(rng, 3),
+    }
+
+
+def make_npc(rng: random.Random, index: int, monster_count: int) -> dict:
+    """Return the contents of a random NPC file."""
+    npc = {
+        "name": f"Npc {index}",
+        "appearance": sentence(rng),
+        "temperament": sentence(rng, 6),
+        "accent": rng.choice(["None", "Northern", "Pirate", "Posh"]),
+        "phrases": [sentence(rng) for _ in range(rng.randint(1, 5))],
+        "background": paragraph(rng),
+    }
+    if monster_count and rng.random() < 0.5:
+        npc["stats_base"] = f"monster_{rng.randrange(monster_count)}"
+    return npc
+
+
+def make_cheatsheet(rng: random.Random, index: int) -> dict:
+    """Return the contents of a random cheatsheet file."""
+    return {
+        "description": f"Cheatsheet {index}",
+        "sections": [
+            {
+                "section_title": sentence(rng, 3),
+                "section_content": [
+                    paragraph(rng, 2) for _ in range(rng.randint(2, 6))
+                ],
+            }
+            for _ in range(rng.randint(1, 4))
+        ],
+    }
+
+
+def make_scene(rng: random.Random, monster_count: int, npc_count: int) -> dict:
+    """Return the contents of a random scene file."""
+    scene = {}
+    if monster_count:
+        scene["monsters"] = [
+            f"monster_{rng.randrange(monster_count)} x{rng.randint(1, 6)}"
+            for _ in range(rng.randint(1, 6))
+        ]
+    if npc_count:
+        scene["npcs"] = sorted(
+            {f"npc_{rng.randrange(npc_count)}" for _ in range(rng.randint(0, 4))}
+        )
+    return scene
+
+
+def write_yaml(filepath: Path, data):
+    with open(filepath, "w") as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+
+
+def generate_setting(
+    root: Path,
+    monsters: int = 1000,
+    npcs: int = 500,
+    cheatsheets: int = 50,
+    depth: int = 3,
+    branching: int = 5,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic setting to a directory.
+
+    Parameters
+    ----------
+    root: Path
+        The root directory of the setting. It is created if necessary.
+    monsters, npcs, cheatsheets: int
+        The number of each kind of file to create.
+    depth: int
+        The number of levels of locations in the world.
+    branching: int
+        The number of locations within each location.
+    seed: int
+        Seed for the random content.
+
+    Returns
+    -------
+    Path
+        The deepest location created, i.e. the last leaf of the world tree.
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "fh_setting.yaml").touch()
+    for directory in ["monsters", "npcs", "cheatsheets", "world"]:
+        (root / directory).mkdir(exist_ok=True)
+
+    for index in range(monsters):
+        write_yaml(
+            root / "monsters" / f"monster_{index}.yaml", make_monster(rng, index)
+        )
+    for index in range(npcs):
+        write_yaml(root / "npcs" / f"npc_{index}.yaml", make_npc(rng, index, monsters))
+    for index in range(cheatsheets):
+        write_yaml(
+            root / "cheatsheets" / f"cheatsheet_{index}.yaml",
+            make_cheatsheet(rng, index),
+        )
+
+    deepest = root / "world"
+    locations = [deepest]
+    for level in range(depth):
+        next_locations = []
+        for parent in locations:
+            for index in range(branching):
+                location = parent / f"Location{level}_{index}"
+                location.mkdir(exist_ok=True)
+                write_yaml(location / "scene.yaml", make_scene(rng, monsters, npcs))
+                (location / "scene.md").write_text(
+                    "\n\n".join(paragraph(rng, 5) for _ in range(3)) + "\n"
+                )
+                next_locations.append(location)
+        locations = next_locations
+        deepest = locations[-1] if locations else deepest
+
+    return deepest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir", type=Path, help="Root directory to create.")
+    parser.add_argument("--monsters", type=int, default=1000)
+    parser.add_argument("--npcs", type=int, default=500)
+    parser.add_argument("--cheatsheets", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--branching", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_setting(
+        args.output_dir,
+        monsters=args.monsters,
+        npcs=args.npcs,
+        cheatsheets=args.cheatsheets,
+        depth=args.depth,
+        branching=args.branching,
+        seed=args.seed,
+    )
+    print(f"Generated setting in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Check the import time of the Fourhills command-line interface against a budget.
+
+The command-line module is imported in a fresh interpreter with ``python -X
+importtime``. The script exits with a non-zero status if the cumulative import time
+is over budget, or if any of the modules that should only be imported when a command
+needs them were imported eagerly.
+
+Usage::
+
+    python benchmarks/import_time.py [--budget-ms MS] [--runs N]
+"""
+
+import argparse
+import subprocess
+import sys
+
+CLI_MODULE = "fourhills.fourhills"
+
+# Modules that must not be imported just to start the command-line interface
+LAZY_MODULES = [
+    "yaml",
+    "dataclasses",
+    "textwrap",
+    "fourhills.setting",
+    "fourhills.scene",
+    "fourhills.stats",
+    "fourhills.npc",
+    "fourhills.cheatsheet",
+    "fourhills.text_utils",
+]
+
+
+def measure_import(module_name):
+    """Import a module in a fresh interpreter and return its import times.
+
+    Returns
+    -------
+    dict of str to int
+        Maps the name of every imported module to its cumulative import time, in
+        microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=60.0,
+        help="Maximum allowed import time in milliseconds (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of runs; the fastest is compared to the budget.",
+    )
+    args = parser.parse_args()
+
+    runs = [measure_import(CLI_MODULE) for _ in range(args.runs)]
+    fastest_ms = min(times[CLI_MODULE] for times in runs) / 1000
+    eager_modules = [name for name in LAZY_MODULES if name in runs[0]]
+
+    print(f"Import time of {CLI_MODULE}: {fastest_ms:.1f} ms")
+    print(f"Budget: {args.budget_ms:.1f} ms")
+
+    failed = False
+    if fastest_ms > args.budget_ms:
+        print("FAIL: import time is over budget")
+        failed = True
+    if eager_modules:
+        print(f"FAIL: modules imported eagerly: {', '.join(eager_modules)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
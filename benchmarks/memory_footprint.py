@@ -0,0 +1,144 @@
+"""Measure the memory used by loaded stat blocks, NPCs and cheatsheets.
+
+Files from a synthetic setting are parsed and turned into objects, keeping only the
+objects, and the memory they use is measured with tracemalloc. This is done both for
+the model classes as they are (slotted, with shared strings interned) and for plain
+dataclass equivalents (with a per-instance __dict__ and no interning), so the
+per-object footprint can be compared: both the total, including the strings, lists
+and dicts each object refers to, and the size of the object itself.
+
+Usage::
+
+    python benchmarks/memory_footprint.py [--count N]
+"""
+
+import argparse
+import dataclasses
+import gc
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from generate_setting import generate_setting
+
+from fourhills.cheatsheet import Cheatsheet
+from fourhills.loader import load_yaml
+from fourhills.npc import Npc
+from fourhills.stats import StatBlock
+
+
+def plain_dataclass(cls):
+    """Return a plain dataclass with the same fields as a model class."""
+    return dataclasses.make_dataclass(
+        cls.__name__,
+        [
+            (
+                (field.name, field.type)
+                if field.default is dataclasses.MISSING
+                else (field.name, field.type, dataclasses.field(default=field.default))
+            )
+            for field in dataclasses.fields(cls)
+        ],
+    )
+
+
+PLAIN_CLASSES = {
+    "StatBlock": plain_dataclass(StatBlock),
+    "Npc": plain_dataclass(Npc),
+    "Cheatsheet": plain_dataclass(Cheatsheet),
+    "Section": plain_dataclass(Cheatsheet.Section),
+}
+MODEL_CLASSES = {
+    "StatBlock": StatBlock,
+    "Npc": Npc,
+    "Cheatsheet": Cheatsheet,
+    "Section": Cheatsheet.Section,
+}
+
+
+def make_stat_block(classes, data):
+    return classes["StatBlock"](**data)
+
+
+def make_npc(classes, data):
+    data.pop("stats_base", None)
+    return classes["Npc"](**data)
+
+
+def make_cheatsheet(classes, data):
+    sections = [classes["Section"](**section) for section in data["sections"]]
+    return classes["Cheatsheet"](data["description"], sections)
+
+
+def object_size(obj) -> int:
+    """Return the size of an object itself, including its __dict__ if it has one."""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def measure(filepaths, factory, classes):
+    """Load objects from files, returning the memory they use in bytes per object.
+
+    The parsed YAML is discarded as each object is created, so the only memory left
+    allocated is that of the objects and anything they refer to.
+
+    Returns
+    -------
+    tuple of float, float
+        The total memory used per object, and the size of each object itself.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    objects = [factory(classes, load_yaml(filepath, "")) for filepath in filepaths]
+    gc.collect()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The list holding the objects isn't part of their footprint
+    total = (end - start - sys.getsizeof(objects)) / len(objects)
+    return total, sum(map(object_size, objects)) / len(objects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=1000,
+        help="Number of each kind of file to load (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        generate_setting(
+            root,
+            monsters=args.count,
+            npcs=args.count,
+            cheatsheets=args.count,
+            depth=0,
+        )
+        print("Bytes per object, for plain dataclasses and the compact model classes")
+        print(
+            f"{'Class':<12} {'Total plain':>12} {'Total compact':>14} "
+            f"{'Object plain':>13} {'Object compact':>15}"
+        )
+        for name, directory_name, factory in [
+            ("StatBlock", "monsters", make_stat_block),
+            ("Npc", "npcs", make_npc),
+            ("Cheatsheet", "cheatsheets", make_cheatsheet),
+        ]:
+            filepaths = sorted((root / directory_name).glob("*.yaml"))
+            plain_total, plain_object = measure(filepaths, factory, PLAIN_CLASSES)
+            compact_total, compact_object = measure(filepaths, factory, MODEL_CLASSES)
+            print(
+                f"{name:<12} {plain_total:>12.0f} {compact_total:>14.0f} "
+                f"{plain_object:>13.0f} {compact_object:>15.0f}"
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Benchmark YAML parsing throughput over a large synthetic setting.
+
+Generates a setting of synthetic monster files, then times parsing all of them with
+the pure-Python safe loader and with the loader chosen by ``fourhills.loader``
+(libyaml's C loader, if PyYAML was built with it).
+
+Usage::
+
+    python benchmarks/parse_throughput.py [--files N] [--repeat N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+from fourhills.loader import load_yaml, safe_loader
+
+from generate_setting import generate_setting
+
+
+def time_parse(filepaths, loader, repeat):
+    """Return the fastest time taken to parse all of the files, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for filepath in filepaths:
+            load_yaml(filepath, f'for stat block "{filepath.stem}"', loader)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--files", type=int, default=2000, help="Number of monster files."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of times to parse the files."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        generate_setting(root, monsters=args.files, npcs=0, cheatsheets=0, depth=0)
+        filepaths = sorted((root / "monsters").glob("*.yaml"))
+        total_mb = sum(filepath.stat().st_size for filepath in filepaths) / 1e6
+
+        loaders = [("pure Python", yaml.SafeLoader)]
+        if safe_loader() is not yaml.SafeLoader:
+            loaders.append(("libyaml", safe_loader()))
+        else:
+            print("PyYAML was built without libyaml; only the fallback is available.")
+
+        print(f"Parsing {len(filepaths)} files ({total_mb:.1f} MB)")
+        results = {}
+        for name, loader in loaders:
+            seconds = time_parse(filepaths, loader, args.repeat)
+            results[name] = seconds
+            print(
+                f"{name:>12}: {seconds:.3f} s, {len(filepaths) / seconds:,.0f} files/s, "
+                f"{total_mb / seconds:.2f} MB/s"
+            )
+        if len(results) == 2:
+            print(f"Speedup: {results['pure Python'] / results['libyaml']:.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
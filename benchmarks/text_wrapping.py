@@ -0,0 +1,116 @@
+"""Compare Fourhills' text wrapping with calling textwrap.wrap for every line.
+
+The lines are the text of a synthetic setting's monsters, NPCs and cheatsheets,
+along with the short lines that stat blocks are mostly made of. Each is wrapped at
+the usual pane width and at 80 characters, both with ``textwrap.wrap`` (as Fourhills
+used to) and with ``fourhills.text_utils.wrap_lines_paragraph``. The script exits
+with a non-zero status if the output differs in any way.
+
+Usage::
+
+    python benchmarks/text_wrapping.py [--files N] [--repeat N]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+
+from generate_setting import generate_setting
+
+from fourhills.loader import load_yaml
+from fourhills.text_utils import wrap_lines_paragraph
+
+WIDTHS = [56, 80]
+
+
+def strings(value):
+    """Produce every string within parsed YAML."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from strings(item)
+    elif value is not None:
+        yield str(value)
+
+
+def collect_lines(root: Path):
+    lines = []
+    for filepath in sorted(root.glob("*/*.yaml")):
+        lines.extend(strings(load_yaml(filepath, "")))
+    return lines
+
+
+def textwrap_lines(lines, line_width):
+    output_lines = []
+    for line in lines:
+        output_lines.extend(
+            textwrap.wrap(line, width=line_width, tabsize=4, subsequent_indent="    ")
+        )
+    return output_lines
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=300,
+        help="Number of each kind of file to take lines from (default: %(default)s).",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        generate_setting(
+            root,
+            monsters=args.files,
+            npcs=args.files,
+            cheatsheets=args.files,
+            depth=0,
+        )
+        lines = collect_lines(root)
+    # Include some lines with whitespace that has to be replaced or dropped
+    rng = random.Random(0)
+    for index in range(0, len(lines), 10):
+        lines[index] = rng.choice(["", "  ", "\t", "a\tb", "end  "]) + lines[index]
+    print(f"{len(lines)} lines")
+
+    failed = False
+    for line_width in WIDTHS:
+        old_time, old_lines = best_time(
+            lambda: textwrap_lines(lines, line_width), args.repeat
+        )
+        new_time, new_lines = best_time(
+            lambda: wrap_lines_paragraph(lines, line_width), args.repeat
+        )
+        same = old_lines == new_lines
+        failed = failed or not same
+        print(
+            f"Width {line_width}: textwrap {old_time * 1000:.1f} ms, "
+            f"fourhills {new_time * 1000:.1f} ms ({old_time / new_time:.1f}x), "
+            f"output {'identical' if same else 'DIFFERENT'}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,4 @@
-from .setting import Setting
-from .stats import StatBlock
-from .npc import Npc
-from .cheatsheet import Cheatsheet
-from .scene import Scene
+import importlib
 
 name = "fourhills"
 
@@ -13,3 +9,24 @@ __all__ = [
     "Cheatsheet",
     "Scene",
 ]
+
+# The modules that define each of the public classes. They are only imported when
+# the class is first accessed, so that importing the package (e.g. to run the
+# command-line interface) stays cheap.
+_CLASS_MODULES = {
+    "Npc": "fourhills.npc",
+    "Setting": "fourhills.setting",
+    "StatBlock": "fourhills.stats",
+    "Cheatsheet": "fourhills.cheatsheet",
+    "Scene": "fourhills.scene",
+}
+
+
+def __getattr__(attr_name):
+    if attr_name in _CLASS_MODULES:
+        return getattr(importlib.import_module(_CLASS_MODULES[attr_name]), attr_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {attr_name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
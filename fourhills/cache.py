@@ -0,0 +1,289 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+from fourhills.exceptions import FhError, describe_exception
+from fourhills.trace import phase
+
+
+def file_signature(
+    filepath: Union[str, Path], missing_ok: bool = False
+) -> Optional[Tuple[int, int]]:
+    """Return a file's modification time (in ns) and size, which change when it does.
+
+    Parameters
+    ----------
+    filepath: str or Path
+        The file.
+    missing_ok: bool
+        Whether to return None if the file can't be accessed (e.g. it doesn't exist),
+        rather than raising OSError.
+    """
+    try:
+        file_stat = os.stat(filepath)
+    except OSError:
+        if missing_ok:
+            return None
+        raise
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+# The errors that deriving data from a file can raise if it isn't valid
+FILE_ERRORS = (FhError, OSError, ValueError, KeyError, TypeError, AttributeError)
+
+
+def update_file_entries(
+    entries: Dict[Hashable, Tuple],
+    failures: Dict[Hashable, Tuple],
+    files: Iterable[Tuple[Hashable, Union[str, Path]]],
+    derive: Callable[[Hashable, Union[str, Path]], Any],
+    on_remove: Optional[Callable[[Hashable, Any], None]] = None,
+    signature: Callable[[Union[str, Path]], Tuple] = file_signature,
+) -> Tuple[bool, List[str]]:
+    """Bring data derived from a set of files up to date, only for files that changed.
+
+    This is the basis of the indexes stored with `ParseCache.store_index`: each
+    entry holds the signature of a file and the data derived from it, and only the
+    files that are new or whose signatures have changed are derived again. Files
+    that couldn't be derived are recorded too, so they aren't tried again until they
+    change, but are still reported each time.
+
+    Parameters
+    ----------
+    entries: dict
+        Maps the key of each file to a tuple of its signature and its data. It is
+        updated in place.
+    failures: dict
+        Maps the key of each file that couldn't be derived to a tuple of its
+        signature and a description of the error. It is updated in place.
+    files: iterable of tuple of hashable and str or Path
+        The key and path of every file that should have an entry.
+    derive: Callable
+        Called with the key and path of a new or changed file, returning its data.
+        If it raises one of `FILE_ERRORS`, the file is recorded as a failure.
+    on_remove: Callable or None
+        If given, called with the key and data of each entry before it is replaced
+        or removed, e.g. to update other data built from it.
+    signature: Callable
+        Returns the signature of a file given its path, e.g. `ParseCache.signature`
+        for files loaded through a cache. By default, `file_signature`.
+
+    Returns
+    -------
+    tuple of bool and list of str
+        Whether any entry or failure changed, and a description of each file that
+        couldn't be derived.
+    """
+    changed = False
+    errors = []
+    current_keys = set()
+    for key, filepath in files:
+        current_keys.add(key)
+        current_signature = signature(filepath)
+        entry = entries.get(key)
+        if entry is not None and entry[0] == current_signature:
+            continue
+        failure = failures.get(key)
+        if failure is not None and failure[0] == current_signature:
+            errors.append(failure[1])
+            continue
+        changed = True
+        if entry is not None:
+            if on_remove is not None:
+                on_remove(key, entry[1])
+            del entries[key]
+        try:
+            entries[key] = (current_signature, derive(key, filepath))
+            failures.pop(key, None)
+        except FILE_ERRORS as exc:
+            error = f"{filepath}: {describe_exception(exc)}"
+            failures[key] = (current_signature, error)
+            errors.append(error)
+
+    for key in set(entries) - current_keys:
+        changed = True
+        if on_remove is not None:
+            on_remove(key, entries[key][1])
+        del entries[key]
+    for key in set(failures) - current_keys:
+        changed = True
+        del failures[key]
+    return changed, errors
+
+
+def user_cache_dir() -> Path:
+    """Return the per-user directory that Fourhills keeps its caches in."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "fourhills"
+
+
+class ParseCache:
+    """Persistent on-disk cache of parsed setting files.
+
+    Each file's parsed contents are stored in their own entry under the cache
+    directory. An entry is keyed by the file's path, and is only used while the
+    file's modification time and size are unchanged, so editing a file invalidates
+    just that file's entry. Invalid or missing entries are rebuilt transparently.
+
+    The cache directory is in the per-user cache directory (see `user_cache_dir`),
+    with a subdirectory for each setting root, rather than in the setting itself.
+    Entries are pickled, so they must only be read from a directory that no one else
+    can write to, which a setting shared between users might not be.
+    """
+
+    # Increment this whenever the format of the cached data changes, so that
+    # entries written by older versions are ignored.
+    VERSION = 1
+
+    def __init__(self, root: Path, enabled: bool = True):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        root: Path
+            The root directory of the setting.
+        enabled: bool
+            Whether to use the cache. If False, files are always parsed.
+        """
+        self.root = root
+        root_digest = hashlib.sha1(str(root.resolve()).encode("utf-8")).hexdigest()
+        self.directory = user_cache_dir() / "settings" / root_digest
+        self.enabled = enabled
+        self._parsed_directory = self.directory / "parsed"
+
+    def _key(self, filepath: Path) -> str:
+        """Return the key for a file: its path relative to the setting root."""
+        try:
+            return filepath.relative_to(self.root).as_posix()
+        except ValueError:
+            return filepath.as_posix()
+
+    def _entry_path(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self._parsed_directory / f"{digest}.pickle"
+
+    def load(self, filepath: Union[str, Path], parser: Callable[[Path], Any]) -> Any:
+        """Return the parsed contents of a file, using the cache where possible.
+
+        Parameters
+        ----------
+        filepath: str or Path
+            Path to the file to load.
+        parser: Callable
+            Callable that parses the file when passed its path. It is only called
+            if there isn't a valid cache entry for the file.
+
+        Returns
+        -------
+        Any
+            The parsed contents of the file.
+        """
+        if not self.enabled:
+            return parser(filepath)
+
+        # Relative paths are made absolute so they can be keyed relative to the root
+        filepath = Path(os.path.abspath(filepath))
+        key = self._key(filepath)
+        signature = (self.VERSION, key, *file_signature(filepath))
+        entry_path = self._entry_path(key)
+
+        # Try to use an existing entry. Any problem reading it (it doesn't exist, it
+        # was written by another version, it was truncated...) just means it has to
+        # be rebuilt.
+        with phase("read parse cache"):
+            try:
+                with open(entry_path, "rb") as f:
+                    entry_signature, data = pickle.load(f)
+                if entry_signature == signature:
+                    return data
+            except Exception:
+                pass
+
+        data = parser(filepath)
+        with phase("write parse cache"):
+            self._store(entry_path, (signature, data))
+        return data
+
+    def signature(self, filepath: Union[str, Path]) -> Tuple[int, int]:
+        """Return a signature of a file that changes whenever its contents do.
+
+        Raises
+        ------
+        OSError
+            If the file can't be accessed, e.g. it doesn't exist.
+        """
+        return file_signature(filepath)
+
+    def source(self, filepath: Union[str, Path]) -> Tuple[str, Tuple[int, int]]:
+        """Return a file's key and its signature (see `signature`).
+
+        The key is the file's path relative to the setting root. Together, they
+        identify the contents of the file, e.g. for caching what is derived from it.
+        """
+        filepath = Path(os.path.abspath(filepath))
+        return self._key(filepath), self.signature(filepath)
+
+    def load_index(self, name: str, version: int) -> Any:
+        """Return the data of a named index stored in the cache directory.
+
+        Indexes hold data derived from many files (e.g. which scenes refer to each
+        monster), which the code that builds them keeps up to date.
+
+        Parameters
+        ----------
+        name: str
+            The name of the index.
+        version: int
+            The version of the index's format. Data stored with a different version
+            is ignored.
+
+        Returns
+        -------
+        Any
+            The data stored by `store_index`, or None if there is no valid data or
+            the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with open(self._index_path(name), "rb") as f:
+                index_version, data = pickle.load(f)
+        except Exception:
+            return None
+        return data if index_version == (self.VERSION, version) else None
+
+    def store_index(self, name: str, version: int, data: Any):
+        """Atomically store the data of a named index, if the cache is enabled.
+
+        Parameters
+        ----------
+        name: str
+            The name of the index.
+        version: int
+            The version of the index's format.
+        data: Any
+            The data to store. It must be picklable.
+        """
+        if self.enabled:
+            self._store(self._index_path(name), ((self.VERSION, version), data))
+
+    def _index_path(self, name: str) -> Path:
+        return self.directory / "indexes" / f"{name}.pickle"
+
+    def _store(self, entry_path: Path, entry):
+        """Atomically write an entry, ignoring failures (e.g. a read-only setting)."""
+        import tempfile
+
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, entry_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except (OSError, pickle.PicklingError):
+            pass
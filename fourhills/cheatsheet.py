@@ -1,22 +1,25 @@
-import yaml
 from pathlib import Path
-from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from fourhills.exceptions import FhParseError
+from fourhills.cache import ParseCache
+from fourhills.dataclass_utils import slotted_dataclass
+from fourhills.loader import load_yaml
+from fourhills.render_cache import RenderSource, cached_render
 from fourhills.text_utils import wrap_lines_paragraph, title
 
 
-@dataclass
+@slotted_dataclass
 class Cheatsheet:
     """Represents a 'cheatsheet' containing useful info for the DM."""
 
-    @dataclass
+    @slotted_dataclass(extra_slots=("render_source",))
     class Section:
         """Represents a section of a cheatsheet, with a title and content."""
 
         section_title: str
         section_content: List[str]
 
+        @cached_render
         def lines(self, line_width: int = 80) -> List[str]:
             """Return a list of lines with the section title and content
 
@@ -42,42 +45,49 @@ class Cheatsheet:
         return f'Cheatsheet: "{self.description}"'
 
     @classmethod
-    def from_file(cls, filepath: Path):
+    def from_file(cls, filepath: Path, cache: Optional[ParseCache] = None):
         """Create a Cheatsheet from a YAML file.
 
         Parameters
         ----------
         filename: Path
             Path to the YAML file
+        cache: ParseCache or None
+            If given, the cache is used to avoid re-parsing the YAML file.
 
         Raises
         ------
         FhParseError
             If there is an error parsing the file.
         """
-        with open(filepath) as f:
-            try:
-                cheatsheet_dict = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                raise FhParseError(
-                    f'Error parsing YAML in cheatsheet "{filepath.stem}": {str(exc)}'
-                )
-
-            try:
-                description = cheatsheet_dict["description"]
-            except KeyError:
-                raise FhParseError(
-                    f'Missing "description" in cheatsheet "{filepath.stem}".'
-                )
-            try:
-                sections_list = cheatsheet_dict["sections"]
-            except KeyError:
-                raise FhParseError(
-                    f'Missing "sections" in cheatsheet "{filepath.stem}".'
-                )
-
-            sections = [
-                Cheatsheet.Section(**section_dict) for section_dict in sections_list
-            ]
-
-            return cls(description, sections)
+        cheatsheet_dict = (
+            cache.load(filepath, parse_cheatsheet)
+            if cache
+            else parse_cheatsheet(filepath)
+        )
+
+        try:
+            description = cheatsheet_dict["description"]
+        except KeyError:
+            raise FhParseError(
+                f'Missing "description" in cheatsheet "{filepath.stem}".'
+            )
+        try:
+            sections_list = cheatsheet_dict["sections"]
+        except KeyError:
+            raise FhParseError(f'Missing "sections" in cheatsheet "{filepath.stem}".')
+
+        sections = [
+            Cheatsheet.Section(**section_dict) for section_dict in sections_list
+        ]
+        if cache:
+            key, signature = cache.source(filepath)
+            for index, section in enumerate(sections):
+                section.render_source = RenderSource(key, signature, str(index))
+
+        return cls(description, sections)
+
+
+def parse_cheatsheet(filepath: Path) -> dict:
+    """Parse a cheatsheet YAML file into a dict."""
+    return load_yaml(filepath, f'in cheatsheet "{filepath.stem}"')
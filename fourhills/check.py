@@ -0,0 +1,157 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+import click
+from fourhills.cache import ParseCache
+from fourhills.cheatsheet import Cheatsheet
+from fourhills.exceptions import describe_exception
+from fourhills.fourhills import get_setting
+from fourhills.npc import Npc
+from fourhills.scene import Scene
+from fourhills.setting import Setting
+from fourhills.stats import StatBlock
+
+# Below this many files, checking in this process is quicker than starting workers
+MIN_FILES_FOR_WORKERS = 64
+
+
+def _check_file(task: Tuple[str, str, str, bool]) -> Tuple[List[str], Dict]:
+    """Check a single setting file, returning its errors and references.
+
+    This runs in a worker process, so it only uses its arguments rather than a
+    Setting, and returns names rather than objects; references between files are
+    resolved afterwards by `check_setting`.
+
+    Parameters
+    ----------
+    task: tuple of str, str, str, bool
+        The kind of file ("monster", "npc", "cheatsheet" or "scene"), the setting
+        root, the path of the file relative to the root, and whether to use the
+        parse cache.
+
+    Returns
+    -------
+    tuple of list of str and dict
+        The errors found, and the names the file refers to: a dict which can contain
+        "monsters" and "npcs" keys, each with a list of names.
+    """
+    kind, root, relative_path, use_cache = task
+    cache = ParseCache(Path(root), enabled=use_cache)
+    filepath = Path(root) / relative_path
+    # Stands in for the Setting when loading NPCs and scenes. Looking up an NPC's
+    # stats returns None, and records the name so it can be checked afterwards.
+    placeholder_setting = SimpleNamespace(monsters=defaultdict(lambda: None))
+    references = {}
+    try:
+        if kind == "monster":
+            stat_block = StatBlock.from_file(filepath, cache)
+            # Rendering the stat block checks the challenge rating and the details of
+            # the attacks
+            stat_block.battle_info(StatBlock.MINIMUM_TERMINAL_WIDTH)
+        elif kind == "npc":
+            npc = Npc.from_file(filepath, placeholder_setting, cache)
+            npc.character_info()
+            references["monsters"] = list(placeholder_setting.monsters)
+        elif kind == "cheatsheet":
+            cheatsheet = Cheatsheet.from_file(filepath, cache)
+            for section in cheatsheet.sections:
+                section.lines()
+        elif kind == "scene":
+            scene = Scene.from_file(filepath, placeholder_setting, cache)
+            references["monsters"] = [
+                name for name, _ in scene.monster_names_quantities
+            ]
+            references["npcs"] = list(scene.npc_names)
+    except Exception as exc:
+        return [f"{relative_path}: {describe_exception(exc)}"], references
+    return [], references
+
+
+def check_setting(
+    setting: Setting, jobs: Optional[int] = None
+) -> Tuple[int, List[str]]:
+    """Check every file in the setting, and the references between them.
+
+    Monsters, NPCs, cheatsheets and scene files are parsed (and rendered, to find
+    missing details) in a pool of worker processes. Then every NPC's stats_base,
+    and every monster and NPC placed in a scene, is checked to exist.
+
+    Parameters
+    ----------
+    setting: Setting
+        The setting to check.
+    jobs: int or None
+        The number of worker processes to use. If None, one per CPU is used.
+
+    Returns
+    -------
+    tuple of int and list of str
+        The number of files checked, and a description of each error found.
+    """
+    root = setting.root
+    use_cache = setting.cache.enabled
+    tasks = []
+    for kind, directory_dict in [
+        ("monster", setting.monsters),
+        ("npc", setting.npcs),
+        ("cheatsheet", setting.cheatsheets),
+    ]:
+        for name in directory_dict:
+            relative_path = directory_dict.path(name).relative_to(root).as_posix()
+            tasks.append((kind, str(root), relative_path, use_cache))
+    for scene_path in setting.scene_paths():
+        relative_path = scene_path.relative_to(root).as_posix()
+        tasks.append(("scene", str(root), relative_path, use_cache))
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) < MIN_FILES_FOR_WORKERS:
+        results = list(map(_check_file, tasks))
+    else:
+        # Send the tasks in chunks to reduce the overhead of communicating with the
+        # workers, while still leaving enough chunks to balance the load
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_check_file, tasks, chunksize=chunksize))
+
+    errors = []
+    known_names = {"monsters": setting.monsters, "npcs": setting.npcs}
+    for (_, _, relative_path, _), (file_errors, references) in zip(tasks, results):
+        errors.extend(file_errors)
+        for reference_type, names in references.items():
+            for name in names:
+                if name not in known_names[reference_type]:
+                    singular = "monster" if reference_type == "monsters" else "NPC"
+                    errors.append(f'{relative_path}: unknown {singular} "{name}"')
+
+    return len(tasks), errors
+
+
+@click.command()
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes to use. Defaults to the number of CPUs.",
+)
+@click.pass_context
+def check(ctx, jobs):
+    """Check every file in the setting for errors.
+
+    Parses every monster, NPC, cheatsheet and scene file, checks that every
+    referenced monster and NPC exists, and reports all of the errors found. The
+    files themselves are always checked, even with --compiled.
+    """
+    setting = get_setting(ctx, compiled=False)
+    file_count, errors = check_setting(setting, jobs)
+    for error in errors:
+        click.echo(error)
+    click.echo(
+        f"Checked {file_count} files: "
+        f"{len(errors)} error{'' if len(errors) == 1 else 's'} found."
+    )
+    if errors:
+        ctx.exit(1)
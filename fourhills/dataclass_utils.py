@@ -0,0 +1,60 @@
+import functools
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Tuple
+
+
+def slotted_dataclass(cls=None, *, extra_slots: Tuple[str, ...] = ()):
+    """Decorate a class to make it a dataclass whose fields are stored in slots.
+
+    Objects of the class have no per-instance __dict__, which makes them much smaller
+    when many of them are loaded at once. This is equivalent to
+    `dataclass(slots=True)`, which needs Python 3.10 or later.
+
+    Parameters
+    ----------
+    extra_slots: tuple of str
+        The names of any attributes to give the objects that aren't fields, so
+        aren't part of the generated methods (e.g. __init__ and __eq__). They are
+        unset until they are assigned to. Use as `@slotted_dataclass(extra_slots=...)`.
+
+    Notes
+    -----
+    The class is re-created with `__slots__`, so as with `dataclass(slots=True)`,
+    objects can't be given attributes other than their fields (and `extra_slots`),
+    and methods can't use the zero-argument form of `super()`.
+    """
+    if cls is None:
+        return functools.partial(slotted_dataclass, extra_slots=extra_slots)
+    cls = dataclass(cls)
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(field.name for field in fields(cls))
+    cls_dict["__slots__"] = field_names + tuple(extra_slots)
+    # The class attributes holding the fields' default values would clash with the
+    # slots. The generated __init__ keeps its own references to the defaults.
+    for field_name in field_names:
+        cls_dict.pop(field_name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+    return slotted_cls
+
+
+def intern_strings(value: Any) -> Any:
+    """Intern a string, or the strings in a list or the keys of a dict.
+
+    Strings that are repeated across many objects (e.g. sizes, creature types and
+    damage types) are then only stored once, however many files they were parsed
+    from. Other values are returned unchanged.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    elif isinstance(value, list):
+        return [sys.intern(item) if isinstance(item, str) else item for item in value]
+    elif isinstance(value, dict):
+        return {
+            sys.intern(key) if isinstance(key, str) else key: item
+            for key, item in value.items()
+        }
+    return value
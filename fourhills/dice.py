@@ -0,0 +1,235 @@
+import functools
+import re
+from collections import defaultdict
+from typing import Dict, Tuple
+from fourhills.exceptions import FhParseError
+
+# One term of a dice expression, with its sign: a number of dice such as "2d6" or
+# "d20", or a number
+_TERM_RE = re.compile(r"\s*([+-])?\s*(?:(\d*)\s*[dD]\s*(\d+)|(\d+))\s*")
+# A dice expression in brackets, as in stat blocks, e.g. the "(5d8 + 5)" of HP
+_BRACKETED_RE = re.compile(r"\(([^()]*[dD][^()]*)\)")
+# A dice expression at the start of some text, e.g. the "2d6 + 3" of "2d6 + 3
+# slashing". Each term must end at a word boundary, so the "d" of e.g. "5 damage"
+# isn't taken as a die.
+_LEADING_TERM = r"(?:\d*\s*[dD]\s*\d+|\d+)\b"
+_LEADING_RE = re.compile(rf"\s*({_LEADING_TERM}(?:\s*[+-]\s*{_LEADING_TERM})*)")
+
+
+class DiceExpression:
+    """A compiled dice expression, such as "2d6 + 3" or "1d8 + 1d6 - 1".
+
+    The expression is parsed once, into the dice of each size to add or subtract and
+    a constant, so it can be evaluated many times cheaply. Use `parse_dice` rather
+    than creating instances directly, so each expression is only compiled once.
+    """
+
+    __slots__ = ["expression", "dice", "constant", "_distribution"]
+
+    def __init__(
+        self, expression: str, dice: Tuple[Tuple[int, int], ...], constant: int
+    ):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        expression: str
+            The text of the expression.
+        dice: tuple of tuples of int, int
+            The number of dice rolled (negative if they are subtracted) and the
+            number of sides of each, with one entry per size of dice.
+        constant: int
+            The number added to the dice.
+        """
+        self.expression = expression
+        self.dice = dice
+        self.constant = constant
+        self._distribution = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.expression!r})"
+
+    def __str__(self):
+        return self.expression
+
+    @property
+    def expected_value(self) -> float:
+        """The mean result of the expression."""
+        return self.constant + sum(
+            count * (sides + 1) / 2 for count, sides in self.dice
+        )
+
+    @property
+    def minimum(self) -> int:
+        """The lowest possible result."""
+        return self.constant + sum(
+            count if count > 0 else count * sides for count, sides in self.dice
+        )
+
+    @property
+    def maximum(self) -> int:
+        """The highest possible result."""
+        return self.constant + sum(
+            count * sides if count > 0 else count for count, sides in self.dice
+        )
+
+    def distribution(self) -> Dict[int, float]:
+        """Return the exact probability of each possible result.
+
+        The distribution is calculated by adding the dice one at a time, so it is
+        worked out once and remembered.
+
+        Returns
+        -------
+        dict of int, float
+            Maps each possible result, in increasing order, to its probability.
+        """
+        if self._distribution is None:
+            # The number of ways of rolling each total, out of `outcomes`
+            ways = {self.constant: 1}
+            outcomes = 1
+            for count, sides in self.dice:
+                sign = 1 if count > 0 else -1
+                for _ in range(abs(count)):
+                    new_ways = defaultdict(int)
+                    for total, total_ways in ways.items():
+                        for face in range(1, sides + 1):
+                            new_ways[total + sign * face] += total_ways
+                    ways = new_ways
+                    outcomes *= sides
+            self._distribution = {
+                total: ways[total] / outcomes for total in sorted(ways)
+            }
+        return self._distribution
+
+    def roll(self, n: int = 1, rng=None):
+        """Roll the expression many times at once. Requires NumPy.
+
+        Parameters
+        ----------
+        n: int
+            The number of times to roll.
+        rng: numpy.random.Generator or None
+            The random number generator to use. If None, a new one is created.
+
+        Returns
+        -------
+        numpy.ndarray of int
+            The result of each roll.
+        """
+        import numpy as np
+
+        if rng is None:
+            rng = np.random.default_rng()
+        results = np.full(n, self.constant, dtype=np.int64)
+        for count, sides in self.dice:
+            totals = rng.integers(1, sides + 1, (n, abs(count))).sum(axis=1)
+            if count > 0:
+                results += totals
+            else:
+                results -= totals
+        return results
+
+    def critical(self) -> "DiceExpression":
+        """Return the expression with the number of dice doubled, as for a critical."""
+        dice = tuple((count * 2, sides) for count, sides in self.dice)
+        return DiceExpression(_format_dice(dice, self.constant), dice, self.constant)
+
+    def __add__(self, other: "DiceExpression") -> "DiceExpression":
+        dice = _combine_dice(self.dice + other.dice)
+        constant = self.constant + other.constant
+        return DiceExpression(_format_dice(dice, constant), dice, constant)
+
+
+def _combine_dice(dice) -> Tuple[Tuple[int, int], ...]:
+    """Combine the counts of the added dice of each size, and of the subtracted dice.
+
+    Added and subtracted dice of the same size are kept apart, as 1d6 - 1d6 isn't 0.
+    """
+    counts: Dict[Tuple[int, bool], int] = {}
+    for count, sides in dice:
+        key = (sides, count > 0)
+        counts[key] = counts.get(key, 0) + count
+    return tuple((count, sides) for (sides, _), count in sorted(counts.items()))
+
+
+def _format_dice(dice: Tuple[Tuple[int, int], ...], constant: int) -> str:
+    """Return the text of an expression, e.g. "4d6 + 3", which `parse_dice` parses."""
+    terms = [(count, f"{abs(count)}d{sides}") for count, sides in dice]
+    if constant or not terms:
+        terms.append((constant, str(abs(constant))))
+    text = "".join(f"{' - ' if value < 0 else ' + '}{term}" for value, term in terms)
+    # Remove the " + " before the first term, or the spaces around its "-"
+    return text[3:] if text.startswith(" + ") else f"-{text[3:]}"
+
+
+@functools.lru_cache(maxsize=None)
+def parse_dice(expression: str) -> DiceExpression:
+    """Compile a dice expression, such as "2d6 + 3", "d20" or "1d8 + 1d6 - 1".
+
+    Each expression string is only compiled once; after that the same object is
+    returned.
+
+    Raises
+    ------
+    FhParseError
+        If the expression isn't a valid dice expression.
+    """
+    dice = []
+    constant = 0
+    position = 0
+    while position < len(expression) or position == 0:
+        match = _TERM_RE.match(expression, position)
+        if not match or match.end() == position or (position and not match[1]):
+            raise FhParseError(f'Could not parse dice expression "{expression}".')
+        sign = -1 if match[1] == "-" else 1
+        if match[3] is not None:
+            sides = int(match[3])
+            if sides < 1:
+                raise FhParseError(
+                    f'Dice must have at least one side in "{expression}".'
+                )
+            count = int(match[2]) if match[2] else 1
+            if count:
+                dice.append((sign * count, sides))
+        else:
+            constant += sign * int(match[4])
+        position = match.end()
+    return DiceExpression(expression.strip(), _combine_dice(dice), constant)
+
+
+def parse_stat_dice(text: str) -> DiceExpression:
+    """Compile the dice of a stat block field, such as "27 (5d8 + 5)" for HP.
+
+    The dice in brackets are used if there are any. Otherwise, the expression at
+    the start of the text is used, so "2d6 + 3 slashing" is 2d6 + 3, and "5
+    piercing damage" is the constant 5.
+
+    Raises
+    ------
+    FhParseError
+        If the text has neither dice in brackets nor an expression at its start.
+
+    Examples
+    --------
+    >>> parse_stat_dice("27 (5d8 + 5)")
+    DiceExpression('5d8 + 5')
+    >>> parse_stat_dice("2d6 + 3")
+    DiceExpression('2d6 + 3')
+    >>> parse_stat_dice("2d6 + 3 slashing")
+    DiceExpression('2d6 + 3')
+    >>> parse_stat_dice("1d8")
+    DiceExpression('1d8')
+    >>> parse_stat_dice("d6")
+    DiceExpression('d6')
+    >>> parse_stat_dice("5 piercing damage")
+    DiceExpression('5')
+    """
+    text = str(text)
+    match = _BRACKETED_RE.search(text)
+    if match:
+        return parse_dice(match[1])
+    match = _LEADING_RE.match(text)
+    if not match:
+        raise FhParseError(f'Could not find dice or a number in "{text}".')
+    return parse_dice(match[1])
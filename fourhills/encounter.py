@@ -0,0 +1,276 @@
+import math
+from collections import namedtuple
+from typing import Dict, Iterator, List, Tuple
+import click
+from fourhills.fourhills import get_setting
+from fourhills.monsters import MonsterCatalogue, filter_options, iter_bits, query_rows
+
+# The multiplier applied to the total XP of a group of monsters, by the smallest
+# number of monsters it applies to, largest first
+GROUP_MULTIPLIERS = [(15, 4), (11, 3), (7, 2.5), (3, 2), (2, 1.5), (1, 1)]
+
+# A proposed encounter: the quantity of each monster, the total XP of the monsters,
+# and their adjusted XP, after applying the group multiplier
+Encounter = namedtuple("Encounter", ["monsters_quantities", "xp", "adjusted_xp"])
+
+
+def group_multiplier(count: int) -> float:
+    """Return the multiplier for the XP of a group of monsters of a given size."""
+    for min_count, multiplier in GROUP_MULTIPLIERS:
+        if count >= min_count:
+            return multiplier
+    return 1
+
+
+class EncounterSearch:
+    """Finds the groups of monsters whose adjusted XP is closest to a budget.
+
+    Monsters with the same XP are interchangeable as far as the budget is concerned,
+    so the search is over the distinct XP values of the candidate monsters (at most
+    one per challenge rating), rather than the monsters themselves. This is a bounded
+    knapsack problem, solved by dynamic programming over the XP values in turn.
+
+    The states reachable after each XP value are stored as bitsets: for each number
+    of kinds of monster and number of monsters, an int with bit x set if a total XP
+    of x (in units of the greatest common divisor of the XP values) is reachable.
+    Adding q monsters of an XP value to every state at once is then a single shift.
+    A state is pruned as soon as its XP is over the budget for its number of
+    monsters: adding monsters only increases both the XP and the multiplier.
+    """
+
+    def __init__(
+        self,
+        xp_values: List[int],
+        budget: int,
+        max_monsters: int,
+        max_kinds: int,
+    ):
+        """Initialise the object, finding every reachable state.
+
+        Parameters
+        ----------
+        xp_values: list of int
+            The XP of each kind of monster that can be used. Must be positive.
+        budget: int
+            The most adjusted XP that the encounter can have.
+        max_monsters: int
+            The most monsters that an encounter can have.
+        max_kinds: int
+            The most kinds of monster (each with its own XP) that an encounter can
+            have.
+        """
+        self.budget = budget
+        self.max_monsters = max_monsters
+        self.max_kinds = max_kinds
+        self.unit = math.gcd(*xp_values) if xp_values else 1
+        # The highest total XP (in units) for each number of monsters
+        self._masks = [
+            (1 << (int(budget / group_multiplier(count)) // self.unit + 1)) - 1
+            for count in range(max_monsters + 1)
+        ]
+        self.xp_values = sorted(
+            (xp for xp in set(xp_values) if xp <= budget), reverse=True
+        )
+        # The reachable states before each XP value is considered, and after the
+        # last, indexed by the number of kinds and then the number of monsters
+        empty = [[0] * (max_monsters + 1) for _ in range(max_kinds + 1)]
+        empty[0][0] = 1
+        self._layers = [empty]
+        for xp in self.xp_values:
+            self._layers.append(self._add_xp_value(self._layers[-1], xp // self.unit))
+
+    def _add_xp_value(self, states: List[List[int]], units: int) -> List[List[int]]:
+        new_states = [row[:] for row in states]
+        for kinds in range(self.max_kinds):
+            for count in range(self.max_monsters):
+                bits = states[kinds][count]
+                if not bits:
+                    continue
+                for quantity in range(1, self.max_monsters - count + 1):
+                    shifted = (bits << (quantity * units)) & self._masks[
+                        count + quantity
+                    ]
+                    if not shifted:
+                        # More of them can only go further over budget
+                        break
+                    new_states[kinds + 1][count + quantity] |= shifted
+        return new_states
+
+    def best_totals(self, number: int) -> List[Tuple[float, int, int, int]]:
+        """Return the reachable totals with the highest adjusted XP.
+
+        Returns
+        -------
+        list of tuple of float, int, int and int
+            The adjusted XP, number of kinds, number of monsters and total XP (in
+            units) of up to `number` distinct totals, highest adjusted XP first, then
+            fewest kinds and monsters.
+        """
+        totals = []
+        final_states = self._layers[-1]
+        for kinds in range(1, self.max_kinds + 1):
+            for count in range(1, self.max_monsters + 1):
+                multiplier = group_multiplier(count)
+                bits = final_states[kinds][count]
+                # Only the highest totals of each size of encounter can be the best
+                for _ in range(number):
+                    if not bits:
+                        break
+                    units = bits.bit_length() - 1
+                    bits ^= 1 << units
+                    adjusted_xp = units * self.unit * multiplier
+                    totals.append((adjusted_xp, kinds, count, units))
+        totals.sort(key=lambda total: (-total[0], total[1], total[2]))
+        return totals[:number]
+
+    def quantities(self, kinds: int, count: int, units: int) -> Dict[int, int]:
+        """Return the quantity of each XP value for a reachable total.
+
+        Works back through the layers of states, finding how each state was reached.
+        """
+        quantities = {}
+        for layer in range(len(self.xp_values), 0, -1):
+            previous_states = self._layers[layer - 1]
+            if previous_states[kinds][count] >> units & 1:
+                # Reachable without this XP value
+                continue
+            xp = self.xp_values[layer - 1]
+            step = xp // self.unit
+            for quantity in range(1, count + 1):
+                if quantity * step > units:
+                    break
+                bits = previous_states[kinds - 1][count - quantity]
+                if bits >> (units - quantity * step) & 1:
+                    quantities[xp] = quantity
+                    kinds -= 1
+                    count -= quantity
+                    units -= quantity * step
+                    break
+        return quantities
+
+
+def propose_encounters(
+    monsters_xp: List[Tuple[str, int]],
+    budget: int,
+    max_monsters: int = 20,
+    max_kinds: int = 3,
+    number: int = 5,
+) -> Iterator[Encounter]:
+    """Propose groups of monsters whose adjusted XP is as close to a budget as possible.
+
+    Each encounter has a different total, and at most one monster with each XP. The
+    monsters with each XP are used in turn, so the encounters are varied.
+
+    Parameters
+    ----------
+    monsters_xp: list of tuple of str and int
+        The name and XP of each monster that can be used. Monsters with no XP are
+        ignored, as they would only add to the group multiplier.
+    budget: int
+        The most adjusted XP that an encounter can have.
+    max_monsters: int
+        The most monsters that an encounter can have.
+    max_kinds: int
+        The most kinds of monster that an encounter can have.
+    number: int
+        The most encounters to propose.
+
+    Yields
+    ------
+    Encounter
+        Each encounter, highest adjusted XP first.
+    """
+    names_by_xp: Dict[int, List[str]] = {}
+    for name, xp in monsters_xp:
+        if xp > 0:
+            names_by_xp.setdefault(xp, []).append(name)
+    search = EncounterSearch(list(names_by_xp), budget, max_monsters, max_kinds)
+    uses = {xp: 0 for xp in names_by_xp}
+    for adjusted_xp, kinds, count, units in search.best_totals(number):
+        monsters_quantities = []
+        for xp, quantity in sorted(search.quantities(kinds, count, units).items()):
+            names = names_by_xp[xp]
+            monsters_quantities.append((names[uses[xp] % len(names)], quantity))
+            uses[xp] += 1
+        yield Encounter(monsters_quantities, units * search.unit, adjusted_xp)
+
+
+def _format_xp(xp: float) -> str:
+    return str(int(xp)) if xp == int(xp) else str(xp)
+
+
+def encounter_lines(encounter: Encounter) -> List[str]:
+    """Return a description of an encounter, listing its monsters as in a scene file."""
+    count = sum(quantity for _, quantity in encounter.monsters_quantities)
+    lines = [
+        f"{_format_xp(encounter.adjusted_xp)} adjusted XP "
+        f"({encounter.xp} XP x{_format_xp(group_multiplier(count))} "
+        f"for {count} monster{'s' if count != 1 else ''}):"
+    ]
+    for name, quantity in encounter.monsters_quantities:
+        lines.append(f"  - {name} x{quantity}" if quantity != 1 else f"  - {name}")
+    return lines
+
+
+@click.command()
+@click.option(
+    "-b",
+    "--budget",
+    type=click.IntRange(min=1),
+    required=True,
+    help="The most adjusted XP the encounter can have.",
+)
+@click.option(
+    "-m",
+    "--max-monsters",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="The most monsters in an encounter.",
+)
+@click.option(
+    "-k",
+    "--max-kinds",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="The most kinds of monster in an encounter.",
+)
+@click.option(
+    "-n",
+    "--number",
+    type=click.IntRange(min=1),
+    default=5,
+    show_default=True,
+    help="How many encounters to propose.",
+)
+@filter_options
+@click.pass_context
+def encounter(ctx, budget, max_monsters, max_kinds, number, **filters):
+    """Propose groups of monsters whose XP fits a budget.
+
+    The monsters' total XP is multiplied according to how many there are (x1.5 for
+    2, x2 for 3-6, x2.5 for 7-10, x3 for 11-14 and x4 for 15 or more), and the
+    encounters with the highest adjusted XP within the budget are listed, in the
+    format of a scene file's monsters. The monsters can be chosen from with the same
+    filters as fh monsters.
+    """
+    setting = get_setting(ctx)
+    catalogue = MonsterCatalogue(setting)
+    for error in catalogue.update():
+        click.echo(f"Warning: skipped {error}", err=True)
+
+    monsters_xp = [
+        (catalogue.names[index], catalogue.xp[index])
+        for index in iter_bits(query_rows(catalogue, **filters))
+    ]
+    if not monsters_xp:
+        click.echo("No monsters match.")
+        return
+    encounters = list(
+        propose_encounters(monsters_xp, budget, max_monsters, max_kinds, number)
+    )
+    if not encounters:
+        click.echo(f"No group of monsters fits a budget of {budget} XP.")
+        return
+    click.echo("\n\n".join("\n".join(encounter_lines(e)) for e in encounters))
@@ -24,3 +24,25 @@ class FhConfigError(FhError):
     """Something about the configuration is not valid."""
 
     pass
+
+
+def describe_exception(exc: Exception, key_error: str = "missing key") -> str:
+    """Return a short description of an error from loading or using a setting file.
+
+    Parameters
+    ----------
+    exc: Exception
+        The exception that was raised.
+    key_error: str
+        What the key of a KeyError is, e.g. "unknown monster or NPC" where items are
+        looked up in the setting. By default, it is taken to be missing from a file.
+    """
+    if isinstance(exc, FhError):
+        return str(exc)
+    elif isinstance(exc, KeyError):
+        return f"{key_error} {str(exc)}"
+    elif isinstance(exc, NotImplementedError):
+        return "unsupported key"
+    elif isinstance(exc, FileNotFoundError):
+        return f"file not found: {exc.filename}"
+    return f"{type(exc).__name__}: {str(exc)}"
@@ -0,0 +1,88 @@
+import os
+import sys
+import click
+from fourhills.fourhills import get_setting
+
+
+@click.group()
+def export():
+    """Export the setting in other formats."""
+
+
+@export.command()
+@click.argument("output_dir", metavar="<output_dir>", type=click.Path(file_okay=False))
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes to use. Defaults to the number of CPUs.",
+)
+@click.option(
+    "-f", "--force", is_flag=True, help="Rebuild every page, even if it is up to date."
+)
+@click.pass_context
+def html(ctx, output_dir, jobs, force):
+    """Export the setting as a static website in <output_dir>.
+
+    There is a page for every scene, monster, NPC and cheatsheet, and an index page
+    (index.html) linking to them. When run again, only the pages whose files have
+    changed are rebuilt.
+    """
+    from fourhills.html_export import HtmlExporter
+
+    setting = get_setting(ctx)
+    exporter = HtmlExporter(setting, output_dir)
+    try:
+        result = exporter.export(jobs, force)
+    except OSError as exc:
+        ctx.fail(f"Problem writing the site: {str(exc)}")
+    for error in result.errors:
+        click.echo(f"Warning: skipped {error}", err=True)
+    click.echo(
+        f"Built {result.built} pages, {result.skipped} up to date, "
+        f"{result.removed} removed. Open {exporter.output_dir / 'index.html'}"
+    )
+
+
+@export.command()
+@click.option(
+    "-k",
+    "--kind",
+    "kinds",
+    multiple=True,
+    type=click.Choice(["monster", "npc", "cheatsheet", "scene"]),
+    help="Only export this kind of item. Can be given more than once.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w", encoding="utf-8"),
+    default="-",
+    help="File to write to. Defaults to standard output.",
+)
+@click.pass_context
+def jsonl(ctx, kinds, output):
+    """Export every monster, NPC, cheatsheet and scene as JSON lines.
+
+    Writes one JSON object per line, each with a "kind" and an "id" (the file name,
+    or the location of a scene) as well as the item's fields. Scenes include the
+    full records of their monsters and NPCs. Items are exported one at a time, so
+    the output can be piped straight into other tools.
+    """
+    from fourhills.jsonl_export import KINDS, setting_records, write_jsonl
+
+    setting = get_setting(ctx)
+    errors = []
+    records = setting_records(setting, kinds or KINDS, errors)
+    try:
+        count = write_jsonl(records, output)
+        output.flush()
+    except BrokenPipeError:
+        # The reader has stopped reading (e.g. head), which isn't an error. Stop
+        # Python complaining when it flushes standard output on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    for error in errors:
+        click.echo(f"Warning: skipped {error}", err=True)
+    click.echo(f"Exported {count} items.", err=True)
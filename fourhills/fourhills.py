@@ -1,6 +1,7 @@
+import importlib
 import click
-from fourhills import Scene, Setting
-from fourhills.text_utils import display_panes
+from fourhills import trace
+from fourhills.prefix_index import PrefixIndex
 from fourhills.exceptions import (
     FhConfigError,
     FhError,
@@ -10,6 +11,25 @@ from fourhills.exceptions import (
 )
 
 SCENE_FILENAME = "scene.yaml"
+# The same as Setting.COMPILED_ENV_VAR, which isn't imported here so that starting up
+# stays quick
+COMPILED_ENV_VAR = "FH_COMPILED"
+
+# Commands defined in other modules, mapped to the import path of the command in the
+# form "module:attribute". The modules are only imported when the command is used,
+# so they don't slow down the startup of other commands.
+LAZY_COMMANDS = {
+    "check": "fourhills.check:check",
+    "compile": "fourhills.sqlite_store:compile_command",
+    "encounter": "fourhills.encounter:encounter",
+    "export": "fourhills.export:export",
+    "monsters": "fourhills.monsters:monsters",
+    "search": "fourhills.search:search",
+    "shell": "fourhills.shell:shell",
+    "simulate": "fourhills.simulate:simulate_command",
+    "where": "fourhills.where:where",
+    "xp": "fourhills.xp:xp",
+}
 
 
 class AliasedGroup(click.Group):
@@ -17,26 +37,68 @@ class AliasedGroup(click.Group):
 
     Notes
     -----
-    This class has been taken almost verbatim from "Command Aliases" section of
-    https://click.palletsprojects.com/en/7.x/advanced/
+    The prefix matching has been taken almost verbatim from "Command Aliases" section
+    of https://click.palletsprojects.com/en/7.x/advanced/
+
+    Commands can also be registered lazily, by passing a `lazy_commands` dict that
+    maps command names to import paths of the form "module:attribute". The module is
+    only imported when the command is needed. Prefixes are matched against the
+    commands added directly to the group before the lazy commands, so adding a lazy
+    command doesn't make the prefixes of existing commands ambiguous.
 
     """
 
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        # Indices of the command names for prefix lookups, built when first needed
+        self._prefix_indices = None
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def add_command(self, cmd, name=None):
+        super().add_command(cmd, name)
+        self._prefix_indices = None
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
     def get_command(self, ctx, cmd_name):
-        rv = click.Group.get_command(self, ctx, cmd_name)
+        rv = self._get_exact_command(ctx, cmd_name)
         if rv is not None:
             return rv
-        matches = [x for x in self.list_commands(ctx) if x.startswith(cmd_name)]
+        if self._prefix_indices is None:
+            self._prefix_indices = [
+                PrefixIndex(self.commands),
+                PrefixIndex(self.list_commands(ctx)),
+            ]
+        for prefix_index in self._prefix_indices:
+            matches = prefix_index.completions(cmd_name)
+            if matches:
+                break
         if not matches:
             return None
         elif len(matches) == 1:
-            return click.Group.get_command(self, ctx, matches[0])
+            return self._get_exact_command(ctx, matches[0])
         ctx.fail(f"Ambiguous command. Too many matches: {', '.join(sorted(matches))}")
 
+    def _get_exact_command(self, ctx, cmd_name):
+        """Return the command with exactly this name, importing it if necessary."""
+        if cmd_name in self.lazy_commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(":")
+            return getattr(importlib.import_module(module_name), attribute)
+        return click.Group.get_command(self, ctx, cmd_name)
+
+
+def get_setting(click_ctx, compiled=None):
+    if compiled is None:
+        # The fh command's --compiled flag, which click also sets from its
+        # environment variable
+        compiled = click_ctx.find_root().params.get("compiled")
+    with trace.phase("import modules"):
+        from fourhills.setting import Setting
 
-def get_setting(click_ctx):
     try:
-        return Setting()
+        with trace.phase("load setting"):
+            return Setting(compiled)
     except FhSettingStructureError as exc:
         click_ctx.fail(
             f"Current directory does not appear to part of a valid setting: {str(exc)}"
@@ -44,24 +106,86 @@ def get_setting(click_ctx):
 
 
 def get_scene(click_ctx):
+    with trace.phase("import modules"):
+        from fourhills.scene import Scene
+
+    setting = get_setting(click_ctx)
     try:
-        return Scene.from_file(SCENE_FILENAME, setting=get_setting(click_ctx))
+        return Scene.from_file(SCENE_FILENAME, setting=setting, cache=setting.cache)
     except FileNotFoundError:
         click_ctx.fail("No scene file at this location")
     except FhParseError as exc:
         click_ctx.fail(f"Problem with scene file: {str(exc)}")
 
 
-@click.group(cls=AliasedGroup)
+@click.group(cls=AliasedGroup, lazy_commands=LAZY_COMMANDS)
 @click.version_option(message="Fourhills version %(version)s")
-def cli():
-    pass
+@click.option(
+    "--profile",
+    is_flag=True,
+    envvar=trace.TRACE_ENV_VAR,
+    help=(
+        "Show how long each phase of the command took, on stderr. Can also be "
+        f"enabled by setting {trace.TRACE_ENV_VAR}=1."
+    ),
+)
+@click.option(
+    "--profile-out",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Save cProfile statistics for the command to this file.",
+)
+@click.option(
+    "--compiled",
+    is_flag=True,
+    envvar=COMPILED_ENV_VAR,
+    help=(
+        "Read the setting from the database created by fh compile, rather than "
+        f"from its files. Can also be enabled by setting {COMPILED_ENV_VAR}=1."
+    ),
+)
+@click.pass_context
+def cli(ctx, profile, profile_out, compiled):
+    if profile:
+        trace.start(f"fh {ctx.invoked_subcommand}")
+        # Report once the command has finished, even if it failed
+        ctx.call_on_close(trace.report)
+    if profile_out:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+        def save_profile():
+            profiler.disable()
+            profiler.dump_stats(profile_out)
+
+        ctx.call_on_close(save_profile)
+        profiler.enable()
+
+
+def watch_scene_view(click_ctx, view):
+    from fourhills.watch import watch_scene
+
+    # Check the scene can be found before starting to watch it
+    setting = get_scene(click_ctx).setting
+    watch_scene(setting, view)
+
+
+watch_option = click.option(
+    "-w",
+    "--watch",
+    is_flag=True,
+    help="Keep running, and redraw whenever any of the files displayed change.",
+)
 
 
 @cli.command()
+@watch_option
 @click.pass_context
-def battle(ctx):
+def battle(ctx, watch):
     """Display NPC and monster stat blocks at the current location."""
+    if watch:
+        watch_scene_view(ctx, "battle")
+        return
     try:
         get_scene(ctx).display_battle()
     except (FhParseError, FhConfigError) as exc:
@@ -71,9 +195,13 @@ def battle(ctx):
 
 
 @cli.command()
+@watch_option
 @click.pass_context
-def npcs(ctx):
+def npcs(ctx, watch):
     """Display details of the NPCs at the current location."""
+    if watch:
+        watch_scene_view(ctx, "npcs")
+        return
     try:
         get_scene(ctx).display_npcs()
     except FhParseError as exc:
@@ -83,9 +211,13 @@ def npcs(ctx):
 
 
 @cli.command()
+@watch_option
 @click.pass_context
-def scene(ctx):
+def scene(ctx, watch):
     """Display information about the scene."""
+    if watch:
+        watch_scene_view(ctx, "scene")
+        return
     try:
         get_scene(ctx).display_scene()
     except FhParseError as exc:
@@ -113,13 +245,16 @@ def list_cheatsheets(ctx, param, value):
     is_eager=True,
 )
 @click.argument("cheatsheet_name", metavar="<cheatsheet_name>")
+@watch_option
 @click.pass_context
-def cheatsheet(ctx, cheatsheet_name):
+def cheatsheet(ctx, cheatsheet_name, watch):
     """Display the cheatsheet called <cheatsheet_name>.
 
     Cheatsheets are referred to according to their filename in the cheatsheets
     directory, excluding the .yaml extension.
     """
+    from fourhills.text_utils import display_panes
+
     setting = get_setting(ctx)
 
     try:
@@ -133,6 +268,12 @@ def cheatsheet(ctx, cheatsheet_name):
     except FhError as exc:
         ctx.fail(f"Unexpected exception: {str(exc)}")
 
-    panes = [section.lines(setting.pane_width) for section in cheatsheet.sections]
+    if watch:
+        from fourhills.watch import watch_cheatsheet
+
+        watch_cheatsheet(setting, setting.cheatsheets.completions(cheatsheet_name)[0])
+        return
+
+    panes = (section.lines(setting.pane_width) for section in cheatsheet.sections)
 
     display_panes(panes, setting.panes, setting.pane_width)
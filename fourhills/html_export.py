@@ -0,0 +1,416 @@
+import functools
+import html
+import json
+import os
+import posixpath
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from fourhills.cache import file_signature
+from fourhills.exceptions import describe_exception
+from fourhills.fourhills import SCENE_FILENAME
+from fourhills.npc import parse_npc
+from fourhills.scene import Scene
+from fourhills.search import SCENE_NOTES_FILENAME
+from fourhills.setting import Setting
+
+# Below this many pages, building them in this process is quicker than starting
+# workers
+MIN_PAGES_FOR_WORKERS = 64
+
+# A page of the site: the kind of item it shows ("scene", "monster", "npc" or
+# "cheatsheet"), the item's name (a location relative to the world directory, for
+# scenes), and the page's path relative to the output directory
+Page = namedtuple("Page", ["kind", "name", "path"])
+# The outcome of an export: the number of pages built, left as they were, and
+# removed, and a description of each page that couldn't be built
+ExportResult = namedtuple("ExportResult", ["built", "skipped", "removed", "errors"])
+
+STYLESHEET = """\
+body { font-family: sans-serif; margin: 1em; }
+nav { margin-bottom: 1em; }
+.panes { display: flex; flex-wrap: wrap; gap: 1em; align-items: flex-start; }
+pre { background: #f6f6f0; border: 1px solid #ccc; padding: 0.5em; margin: 0; }
+ul.tree { list-style: none; padding-left: 1.2em; }
+"""
+
+PAGE_TEMPLATE = """\
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<link rel="stylesheet" href="{root}style.css">
+</head>
+<body>
+<nav><a href="{root}index.html">Index</a></nav>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def page_path(kind: str, name: str) -> str:
+    """Return the path of the page for an item, relative to the output directory."""
+    if kind == "scene":
+        return posixpath.normpath(posixpath.join("world", name, "index.html"))
+    return f"{kind}s/{name}.html"
+
+
+def _link(from_path: str, to_path: str, text: str) -> str:
+    href = posixpath.relpath(to_path, posixpath.dirname(from_path) or ".")
+    return f'<a href="{html.escape(href)}">{html.escape(text)}</a>'
+
+
+def _panes_html(panes: Iterable[List[str]]) -> str:
+    return (
+        '<div class="panes">\n'
+        + "\n".join(f"<pre>{html.escape(chr(10).join(pane))}</pre>" for pane in panes)
+        + "\n</div>"
+    )
+
+
+def _page_html(path: str, title: str, body: List[str]) -> str:
+    return PAGE_TEMPLATE.format(
+        title=html.escape(title), root="../" * path.count("/"), body="\n".join(body)
+    )
+
+
+class _PageBuilder:
+    """Renders the pages of the site, recording the files each one depends on."""
+
+    def __init__(self, setting: Setting):
+        self.setting = setting
+
+    def item_path(self, kind: str, name: str) -> Path:
+        items = getattr(self.setting, f"{kind}s")
+        return items.directory / f"{name}.{items.extension}"
+
+    def npc_dependencies(self, name: str, dependencies: Set[Path]):
+        """Add an NPC's file, and its stats_base monster's file, to a set."""
+        npc_path = self.item_path("npc", name)
+        dependencies.add(npc_path)
+        if name not in self.setting.npcs:
+            return
+        stats_base = self.setting.cache.load(npc_path, parse_npc).get("stats_base")
+        if stats_base:
+            dependencies.add(self.item_path("monster", stats_base))
+
+    def build(self, page: Page, dependencies: Set[Path]) -> str:
+        """Return the HTML of a page, adding the files it depends on to a set.
+
+        The files are added before they are read, so if building the page fails,
+        the set holds the files that caused the failure.
+        """
+        builder = getattr(self, f"_{page.kind}_page")
+        return builder(page, dependencies)
+
+    def _scene_page(self, page: Page, dependencies: Set[Path]) -> str:
+        directory = self.setting.world_dir / page.name
+        scene_path = directory / SCENE_FILENAME
+        notes_path = directory / SCENE_NOTES_FILENAME
+        dependencies.update([scene_path, notes_path])
+        scene = Scene.from_file(
+            scene_path, setting=self.setting, cache=self.setting.cache
+        )
+        for name, _ in scene.monster_names_quantities:
+            dependencies.add(self.item_path("monster", name))
+        for name in scene.npc_names:
+            self.npc_dependencies(name, dependencies)
+
+        body = []
+        links = [
+            _link(page.path, page_path("monster", name), name)
+            for name, _ in scene.monster_names_quantities
+        ] + [_link(page.path, page_path("npc", name), name) for name in scene.npc_names]
+        if links:
+            body.append(f"<p>{' &middot; '.join(links)}</p>")
+        body.append("<h2>Scene</h2>")
+        body.append(_panes_html(scene.scene_panes()))
+        if notes_path.is_file():
+            with open(notes_path, encoding="utf-8") as f:
+                body.append("<h2>Notes</h2>")
+                body.append(_panes_html([f.read().splitlines()]))
+        if scene.npc_names:
+            body.append("<h2>NPCs</h2>")
+            body.append(_panes_html(scene.npc_panes()))
+        if links:
+            body.append("<h2>Battle</h2>")
+            body.append(_panes_html(scene.battle_panes()))
+        return _page_html(page.path, self.setting.location(directory), body)
+
+    def _monster_page(self, page: Page, dependencies: Set[Path]) -> str:
+        dependencies.add(self.item_path("monster", page.name))
+        monster = self.setting.monsters[page.name]
+        width = self.setting.pane_width
+        panes = [monster.summary_info(width) + monster.battle_info(width)]
+        return _page_html(page.path, monster.name, [_panes_html(panes)])
+
+    def _npc_page(self, page: Page, dependencies: Set[Path]) -> str:
+        self.npc_dependencies(page.name, dependencies)
+        npc = self.setting.npcs[page.name]
+        width = self.setting.pane_width
+        panes = [
+            npc.summary_info(width) + npc.character_info(width),
+            npc.summary_info(width) + npc.battle_info(width),
+        ]
+        return _page_html(page.path, npc.name, [_panes_html(panes)])
+
+    def _cheatsheet_page(self, page: Page, dependencies: Set[Path]) -> str:
+        dependencies.add(self.item_path("cheatsheet", page.name))
+        cheatsheet = self.setting.cheatsheets[page.name]
+        panes = (
+            section.lines(self.setting.pane_width) for section in cheatsheet.sections
+        )
+        return _page_html(page.path, cheatsheet.description, [_panes_html(panes)])
+
+
+def dependency_signature(setting: Setting, path: Path) -> Optional[Tuple[int, int]]:
+    """Return the signature of a file a page depends on, or None if it is missing.
+
+    Files are read through the setting's cache, so when the setting is compiled this
+    is the signature of its database. Scene notes aren't compiled, so they always
+    have their own signatures.
+    """
+    if path.name == SCENE_NOTES_FILENAME:
+        return file_signature(path, missing_ok=True)
+    try:
+        return setting.cache.signature(path)
+    except OSError:
+        return None
+
+
+def build_page(
+    setting: Setting, output_dir: str, page: Page
+) -> Tuple[Dict[str, Optional[Tuple[int, int]]], Optional[str]]:
+    """Build a page of the site and write it to the output directory.
+
+    Returns
+    -------
+    tuple of dict and str or None
+        The files the page depends on, relative to the setting root, mapped to
+        their signatures; and a description of the error if the page couldn't be
+        built, or None.
+    """
+    dependencies: Set[Path] = set()
+    error = None
+    try:
+        page_html = _PageBuilder(setting).build(page, dependencies)
+        output_path = Path(output_dir, page.path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(page_html)
+    except Exception as exc:
+        error = f"{page.path}: {describe_exception(exc, 'unknown monster or NPC')}"
+    return (
+        {
+            path.relative_to(setting.root).as_posix(): dependency_signature(
+                setting, path
+            )
+            for path in dependencies
+        },
+        error,
+    )
+
+
+# The setting that pages are built from in a worker process, created when the
+# worker builds its first page
+_worker_setting: Optional[Setting] = None
+
+
+def _build_page_task(compiled: bool, task: Tuple[str, Page]):
+    global _worker_setting
+    if _worker_setting is None:
+        _worker_setting = Setting(compiled)
+    return build_page(_worker_setting, *task)
+
+
+class HtmlExporter:
+    """Exports the setting as a static HTML site, rebuilding only what has changed.
+
+    There is a page for each scene (with its notes, NPCs and battle stats), monster,
+    NPC and cheatsheet, showing the same panes as the corresponding command, and an
+    index page linking to them all.
+
+    A manifest in the output directory records the files that each page was built
+    from (its scene file and notes, monsters, NPCs and their stats_base monsters)
+    and their signatures (see `dependency_signature`). A page is only built again
+    when one of those files has changed.
+    """
+
+    MANIFEST_FILENAME = ".fh_manifest.json"
+    # Increment this whenever the pages change, so they are all built again
+    VERSION = 1
+
+    def __init__(self, setting: Setting, output_dir: Path):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        setting: Setting
+            The setting to export.
+        output_dir: Path
+            The directory to write the site to. It is created if necessary.
+        """
+        self.setting = setting
+        self.output_dir = Path(output_dir).resolve()
+        self.manifest_path = self.output_dir / self.MANIFEST_FILENAME
+
+    def pages(self) -> List[Page]:
+        """Return every page of the site, except the index."""
+        pages = []
+        for scene_path in self.setting.scene_paths():
+            location = scene_path.parent.relative_to(self.setting.world_dir).as_posix()
+            pages.append(Page("scene", location, page_path("scene", location)))
+        for kind in ("monster", "npc", "cheatsheet"):
+            for name in sorted(getattr(self.setting, f"{kind}s")):
+                pages.append(Page(kind, name, page_path(kind, name)))
+        return pages
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        """Return the dependencies of each page, or an empty dict if unusable."""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (
+            manifest.get("version") != self.VERSION
+            or manifest.get("pane_width") != self.setting.pane_width
+        ):
+            return {}
+        return manifest.get("pages", {})
+
+    def _save_manifest(self, pages: Dict[str, Dict]):
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.VERSION,
+                    "pane_width": self.setting.pane_width,
+                    "pages": pages,
+                },
+                f,
+            )
+        os.replace(temp_path, self.manifest_path)
+
+    def _is_up_to_date(self, page: Page, dependencies: Optional[Dict]) -> bool:
+        if dependencies is None or not (self.output_dir / page.path).is_file():
+            return False
+        # The manifest is JSON, so its signatures are lists rather than tuples
+        return all(
+            dependency_signature(self.setting, self.setting.root / path)
+            == (tuple(signature) if signature is not None else None)
+            for path, signature in dependencies.items()
+        )
+
+    def export(self, jobs: Optional[int] = None, force: bool = False) -> ExportResult:
+        """Build the pages whose files have changed, and the index.
+
+        Parameters
+        ----------
+        jobs: int or None
+            The number of worker processes to use. If None, one per CPU is used.
+        force: bool
+            Whether to build every page, even if it is up to date.
+
+        Returns
+        -------
+        ExportResult
+            What was done, including any errors. Pages with errors are built again
+            next time.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        old_manifest = {} if force else self._load_manifest()
+        pages = self.pages()
+        manifest = {}
+        stale_pages = []
+        for page in pages:
+            dependencies = old_manifest.get(page.path)
+            if self._is_up_to_date(page, dependencies):
+                manifest[page.path] = dependencies
+            else:
+                stale_pages.append(page)
+
+        tasks = [(str(self.output_dir), page) for page in stale_pages]
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(tasks) < MIN_PAGES_FOR_WORKERS:
+            results = [build_page(self.setting, *task) for task in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (jobs * 4))
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                build_task = functools.partial(_build_page_task, self.setting.compiled)
+                results = list(executor.map(build_task, tasks, chunksize=chunksize))
+
+        errors = []
+        for page, (dependencies, error) in zip(stale_pages, results):
+            if error:
+                # Don't leave the page as it was before the item changed
+                errors.append(error)
+                self._remove_page(page.path)
+            else:
+                manifest[page.path] = dependencies
+
+        # Remove the pages of items that no longer exist
+        current_paths = {page.path for page in pages}
+        removed = sum(
+            self._remove_page(path) for path in set(old_manifest) - current_paths
+        )
+
+        self._write_index(pages)
+        self._save_manifest(manifest)
+        return ExportResult(
+            len(stale_pages) - len(errors),
+            len(pages) - len(stale_pages),
+            removed,
+            errors,
+        )
+
+    def _remove_page(self, path: str) -> bool:
+        """Remove a page from the output directory, returning whether it was removed.
+
+        Paths that aren't within the output directory, e.g. from an edited manifest,
+        are left alone.
+        """
+        output_dir = self.output_dir.resolve()
+        filepath = (output_dir / path).resolve()
+        if output_dir not in filepath.parents:
+            return False
+        try:
+            filepath.unlink()
+        except OSError:
+            return False
+        return True
+
+    def _write_index(self, pages: List[Page]):
+        """Write the index page, which links to every other page, and the stylesheet."""
+        body = []
+        headings = {
+            "scene": "World",
+            "monster": "Monsters",
+            "npc": "NPCs",
+            "cheatsheet": "Cheatsheets",
+        }
+        for kind, heading in headings.items():
+            kind_pages = [page for page in pages if page.kind == kind]
+            if not kind_pages:
+                continue
+            body.append(f"<h2>{heading}</h2>")
+            body.append('<ul class="tree">')
+            for page in kind_pages:
+                if kind == "scene":
+                    # Indent the locations to show the structure of the world
+                    parts = [] if page.name == "." else page.name.split("/")
+                    indent = "&nbsp;" * 4 * max(len(parts) - 1, 0)
+                    text = parts[-1] if parts else "/"
+                else:
+                    indent, text = "", page.name
+                body.append(f"<li>{indent}{_link('index.html', page.path, text)}</li>")
+            body.append("</ul>")
+        with open(self.output_dir / "index.html", "w", encoding="utf-8") as f:
+            f.write(_page_html("index.html", self.setting.root.name, body))
+        with open(self.output_dir / "style.css", "w", encoding="utf-8") as f:
+            f.write(STYLESHEET)
@@ -0,0 +1,155 @@
+import dataclasses
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+from fourhills.exceptions import describe_exception
+from fourhills.fourhills import SCENE_FILENAME
+from fourhills.npc import parse_npc
+from fourhills.scene import Scene
+from fourhills.setting import Setting
+
+# The kinds of record that can be exported, in the order they are produced
+KINDS = ["monster", "npc", "cheatsheet", "scene"]
+
+
+def _as_dict(item) -> Dict:
+    """Return the fields of a dataclass as a dict, converting nested dataclasses.
+
+    Unlike `dataclasses.asdict`, other values aren't copied, as the records are only
+    serialised. This makes a big difference to exporting scenes, which contain the
+    stat blocks of their monsters and NPCs.
+    """
+    fields = {}
+    for field in dataclasses.fields(item):
+        value = getattr(item, field.name)
+        if dataclasses.is_dataclass(value):
+            value = _as_dict(value)
+        elif isinstance(value, list) and value and dataclasses.is_dataclass(value[0]):
+            value = [_as_dict(element) for element in value]
+        fields[field.name] = value
+    return fields
+
+
+class RecordBuilder:
+    """Converts the items of a setting into JSON-compatible dicts.
+
+    Each record has a "kind" ("monster", "npc", "cheatsheet" or "scene") and an "id"
+    (the name of the item's file without its extension, or for scenes, the location
+    relative to the world directory), followed by the item's fields.
+    """
+
+    def __init__(self, setting: Setting):
+        self.setting = setting
+
+    def monster(self, name: str) -> Dict:
+        """Return the record of a monster, including its XP."""
+        monster = self.setting.monsters[name]
+        return {
+            "kind": "monster",
+            "id": name,
+            **_as_dict(monster),
+            "xp": monster.xp,
+        }
+
+    def npc(self, name: str) -> Dict:
+        """Return the record of an NPC, with its stats_base monster's stats."""
+        npc = self.setting.npcs[name]
+        stats_base = self.setting.cache.load(
+            self.setting.npcs.path(name), parse_npc
+        ).get("stats_base")
+        record = {"kind": "npc", "id": name, "stats_base": stats_base}
+        record.update(_as_dict(npc))
+        return record
+
+    def cheatsheet(self, name: str) -> Dict:
+        """Return the record of a cheatsheet."""
+        return {
+            "kind": "cheatsheet",
+            "id": name,
+            **_as_dict(self.setting.cheatsheets[name]),
+        }
+
+    def scene(self, location: str) -> Dict:
+        """Return the record of a scene, with the records of its monsters and NPCs."""
+        scene = Scene.from_file(
+            self.setting.world_dir / location / SCENE_FILENAME,
+            setting=self.setting,
+            cache=self.setting.cache,
+        )
+        monsters = []
+        for name, quantity in scene.monster_names_quantities:
+            monster = self.monster(name)
+            del monster["kind"]
+            monsters.append({"quantity": quantity, **monster})
+        npcs = []
+        for name in scene.npc_names:
+            npc = self.npc(name)
+            del npc["kind"]
+            npcs.append(npc)
+        return {"kind": "scene", "id": location, "monsters": monsters, "npcs": npcs}
+
+
+def _locations(setting: Setting) -> Iterator[str]:
+    """Produce the location of every scene file in the world, in order."""
+    for scene_path in setting.scene_paths():
+        yield scene_path.parent.relative_to(setting.world_dir).as_posix()
+
+
+def setting_records(
+    setting: Setting, kinds: Iterable[str] = KINDS, errors: Optional[List[str]] = None
+) -> Iterator[Dict]:
+    """Produce a record of every monster, NPC, cheatsheet and scene in a setting.
+
+    Items are loaded one at a time as the records are consumed, and the setting only
+    keeps a limited number of them in memory, so memory use doesn't grow with the
+    size of the setting.
+
+    Parameters
+    ----------
+    setting: Setting
+        The setting to export.
+    kinds: iterable of str
+        The kinds of record to produce, from `KINDS`.
+    errors: list of str or None
+        If given, a description of each item that couldn't be loaded is appended
+        to it. These items are skipped.
+
+    Yields
+    ------
+    dict
+        The record of each item, as described in `RecordBuilder`.
+    """
+    builder = RecordBuilder(setting)
+    sources = {
+        "monster": lambda: sorted(setting.monsters),
+        "npc": lambda: sorted(setting.npcs),
+        "cheatsheet": lambda: sorted(setting.cheatsheets),
+        "scene": lambda: _locations(setting),
+    }
+    for kind in KINDS:
+        if kind not in kinds:
+            continue
+        build_record = getattr(builder, kind)
+        for name in sources[kind]():
+            try:
+                record = build_record(name)
+            except Exception as exc:
+                if errors is not None:
+                    error = describe_exception(exc, "unknown monster or NPC")
+                    errors.append(f"{kind} {name}: {error}")
+                continue
+            yield record
+
+
+def write_jsonl(records: Iterable[Dict], file) -> int:
+    """Write records to a file, one JSON object per line, returning how many.
+
+    Values that JSON has no type for, such as the dates YAML parses, are written as
+    strings.
+    """
+    count = 0
+    encoder = json.JSONEncoder(default=str)
+    for record in records:
+        file.write(encoder.encode(record))
+        file.write("\n")
+        count += 1
+    return count
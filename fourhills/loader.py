@@ -0,0 +1,47 @@
+from pathlib import Path
+from typing import Any, Union
+from fourhills.exceptions import FhParseError
+from fourhills.trace import phase
+
+
+def safe_loader():
+    """Return the fastest available safe YAML loader class.
+
+    PyYAML's C loader (backed by libyaml) is used if PyYAML was built with it;
+    otherwise the pure-Python loader is used.
+    """
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(filepath: Union[str, Path], error_context: str, loader=None) -> Any:
+    """Load a YAML file using a safe loader.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        Path to the YAML file.
+    error_context : str
+        Describes what the file defines, for use in error messages, e.g.
+        'for stat block "lion"' gives 'Error parsing YAML for stat block "lion": ...'.
+    loader : yaml.Loader class or None
+        The loader class to use. If None, the fastest available safe loader is used.
+
+    Returns
+    -------
+    Any
+        The contents of the file.
+
+    Raises
+    ------
+    FhParseError
+        If there is an error parsing the file.
+    """
+    import yaml
+
+    with phase("parse YAML"), open(filepath) as f:
+        try:
+            return yaml.load(f, Loader=loader or safe_loader())
+        except yaml.YAMLError as exc:
+            raise FhParseError(f"Error parsing YAML {error_context}: {str(exc)}")
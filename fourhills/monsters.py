@@ -0,0 +1,335 @@
+import bisect
+import re
+from array import array
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import click
+from fourhills.cache import update_file_entries
+from fourhills.exceptions import FhParseError
+from fourhills.fourhills import get_setting
+from fourhills.setting import Setting
+from fourhills.stats import XP_BY_CHALLENGE, parse_stats
+
+# The categorical fields of a stat block that can be filtered on. Each is indexed by
+# the words of its value (or values, for lists), so e.g. a creature_type of
+# "humanoid (goblinoid)" matches both "humanoid" and "goblinoid".
+CATEGORICAL_FIELDS = [
+    "size",
+    "creature_type",
+    "alignment",
+    "damage_resistances",
+    "damage_immunities",
+    "languages",
+]
+
+_WORD_RE = re.compile(r"\w+")
+
+# A monster in the catalogue: its name (of its file), the name in its stat block,
+# its challenge rating and XP, and the values of its categorical fields, in the
+# order of CATEGORICAL_FIELDS
+MonsterRow = Tuple[str, str, float, int, Tuple]
+
+
+def _words(value) -> List[str]:
+    """Return the lower-case words of a field's value or values."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [word for item in value for word in _words(item)]
+    return _WORD_RE.findall(str(value).lower())
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Produce the indices of the bits set in a bitset, in increasing order."""
+    while bits:
+        lowest_bit = bits & -bits
+        yield lowest_bit.bit_length() - 1
+        bits ^= lowest_bit
+
+
+def _range_bits(start: int, end: int) -> int:
+    """Return a bitset with the bits from start (inclusive) to end (exclusive) set."""
+    return ((1 << end) - 1) ^ ((1 << start) - 1)
+
+
+class MonsterCatalogue:
+    """Columnar index of the monsters' challenge ratings, XP and categorical fields.
+
+    The monsters are stored as rows in order of challenge rating (then name), with
+    one column per field. Challenge and XP are arrays, which are sorted, since XP
+    only increases with the challenge rating, so a range of either is found by
+    binary search. Each categorical field has a bitset (an int, with a bit per row)
+    for every word in its values. A query is answered by combining bitsets, without
+    loading any stat blocks.
+
+    The catalogue is persisted in the setting's cache directory, along with each
+    monster's row and the signature of its file, and `update` only parses the files
+    that have changed since it was last updated.
+    """
+
+    NAME = "monsters"
+    # Increment this whenever the format of the catalogue changes
+    VERSION = 3
+
+    def __init__(self, setting: Setting):
+        """Initialise the object, loading the catalogue from the cache if possible.
+
+        Parameters
+        ----------
+        setting: Setting
+            The setting whose monsters to index.
+        """
+        self.setting = setting
+        data = setting.cache.load_index(self.NAME, self.VERSION) or {}
+        # Maps each monster's name to the signature of its file and its row
+        self._rows: Dict[str, Tuple] = data.get("rows", {})
+        # Maps the names of the monsters whose files couldn't be parsed to the
+        # signatures of the files and the errors
+        self._failures: Dict[str, Tuple] = data.get("failures", {})
+        # The columns, with the monsters in order of challenge rating
+        self.names: List[str] = data.get("names", [])
+        self.challenge = data.get("challenge", array("d"))
+        self.xp = data.get("xp", array("q"))
+        # Maps each categorical field to a dict of each word to the rows with it
+        self._bitsets: Dict[str, Dict[str, int]] = data.get(
+            "bitsets", {field: {} for field in CATEGORICAL_FIELDS}
+        )
+
+    def update(self) -> List[str]:
+        """Bring the catalogue up to date with the monster files, and save it.
+
+        Returns
+        -------
+        list of str
+            A description of each file that couldn't be parsed. These monsters are
+            left out of the catalogue.
+        """
+        changed, errors = update_file_entries(
+            self._rows,
+            self._failures,
+            (
+                (name, self.setting.monsters.path(name))
+                for name in self.setting.monsters
+            ),
+            self.parse_row,
+            signature=self.setting.cache.signature,
+        )
+        if changed:
+            self._build_columns()
+            self.setting.cache.store_index(
+                self.NAME,
+                self.VERSION,
+                {
+                    "rows": self._rows,
+                    "failures": self._failures,
+                    "names": self.names,
+                    "challenge": self.challenge,
+                    "xp": self.xp,
+                    "bitsets": self._bitsets,
+                },
+            )
+        return errors
+
+    def parse_row(self, name: str, filepath: Path) -> MonsterRow:
+        """Return a monster's row, parsing its file.
+
+        Raises
+        ------
+        FhParseError
+            If the file can't be parsed, or the challenge rating isn't valid.
+        KeyError
+            If the stat block has no challenge rating.
+        """
+        stat_dict = self.setting.cache.load(filepath, parse_stats)
+        challenge = stat_dict["challenge"]
+        try:
+            xp = XP_BY_CHALLENGE[challenge]
+        except (KeyError, TypeError):
+            raise FhParseError(f'Invalid challenge rating "{challenge}".')
+        return (
+            name,
+            stat_dict.get("name", name),
+            float(challenge),
+            xp,
+            tuple(_words(stat_dict.get(field)) for field in CATEGORICAL_FIELDS),
+        )
+
+    def _build_columns(self):
+        rows = sorted(
+            (row for _, row in self._rows.values()),
+            key=lambda row: (row[2], row[0]),
+        )
+        self.names = [row[0] for row in rows]
+        self.challenge = array("d", (row[2] for row in rows))
+        self.xp = array("q", (row[3] for row in rows))
+        self._bitsets = {field: {} for field in CATEGORICAL_FIELDS}
+        for index, row in enumerate(rows):
+            bit = 1 << index
+            for field, words in zip(CATEGORICAL_FIELDS, row[4]):
+                field_bitsets = self._bitsets[field]
+                for word in set(words):
+                    field_bitsets[word] = field_bitsets.get(word, 0) | bit
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def all_rows(self) -> int:
+        """A bitset of every row."""
+        return (1 << len(self.names)) - 1
+
+    def challenge_rows(self, low: Optional[float], high: Optional[float]) -> int:
+        """Return a bitset of the rows with a challenge rating in a range.
+
+        Either bound can be None, for no limit. Both bounds are inclusive.
+        """
+        return self._range_rows(self.challenge, low, high)
+
+    def xp_rows(self, low: Optional[int], high: Optional[int]) -> int:
+        """Return a bitset of the rows with XP in a range, as for `challenge_rows`."""
+        return self._range_rows(self.xp, low, high)
+
+    def _range_rows(self, column, low, high) -> int:
+        start = 0 if low is None else bisect.bisect_left(column, low)
+        end = len(column) if high is None else bisect.bisect_right(column, high)
+        return _range_bits(start, end) if start < end else 0
+
+    def field_rows(self, field: str, value: str) -> int:
+        """Return a bitset of the rows whose field contains every word of a value."""
+        rows = self.all_rows
+        for word in _words(value):
+            rows &= self._bitsets[field].get(word, 0)
+        return rows
+
+    def row(self, index: int) -> MonsterRow:
+        """Return the details of the monster in a row."""
+        return self._rows[self.names[index]][1]
+
+
+def parse_number(text: str) -> float:
+    """Parse a number, which may be a fraction such as "1/4"."""
+    return float(Fraction(text.strip()))
+
+
+class RangeParamType(click.ParamType):
+    """A range of numbers, such as "1-3", "1/4", "5-" (5 or more) or "-2"."""
+
+    name = "range"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+        low, separator, high = value.partition("-")
+        if not separator:
+            high = low
+        try:
+            return (
+                parse_number(low) if low.strip() else None,
+                parse_number(high) if high.strip() else None,
+            )
+        except (ValueError, ZeroDivisionError):
+            self.fail(f'"{value}" is not a number or range such as 1-3.', param, ctx)
+
+
+def format_challenge(challenge: float) -> str:
+    """Format a challenge rating, writing fractions as e.g. 1/4."""
+    return str(Fraction(challenge).limit_denominator(8))
+
+
+def query_rows(catalogue: MonsterCatalogue, **filters) -> int:
+    """Return a bitset of the rows that match every filter given.
+
+    Parameters
+    ----------
+    catalogue: MonsterCatalogue
+        The catalogue to query.
+    filters:
+        "challenge" and "xp" are tuples of the lowest and highest values (either
+        may be None). The others are the fields of `CATEGORICAL_FIELDS`, each with
+        a list of values that must all be matched. None or empty values are ignored.
+    """
+    rows = catalogue.all_rows
+    if filters.get("challenge"):
+        rows &= catalogue.challenge_rows(*filters["challenge"])
+    if filters.get("xp"):
+        rows &= catalogue.xp_rows(*filters["xp"])
+    for field in CATEGORICAL_FIELDS:
+        for value in filters.get(field) or []:
+            rows &= catalogue.field_rows(field, value)
+    return rows
+
+
+def filter_options(command):
+    """Add the options of `query_rows`'s filters to a click command."""
+    options = [
+        click.option(
+            "-c", "--challenge", type=RangeParamType(), help="e.g. 1-3 or 1/4."
+        ),
+        click.option(
+            "-x", "--xp", type=RangeParamType(), help="e.g. 100-450 or 1000-."
+        ),
+        click.option("-s", "--size", multiple=True, help="e.g. large."),
+        click.option(
+            "-t", "--type", "creature_type", multiple=True, help="e.g. beast."
+        ),
+        click.option("-a", "--alignment", multiple=True, help="e.g. evil."),
+        click.option(
+            "-r",
+            "--resistant",
+            "damage_resistances",
+            multiple=True,
+            help="Damage resistance.",
+        ),
+        click.option(
+            "-i",
+            "--immune",
+            "damage_immunities",
+            multiple=True,
+            help="Damage immunity.",
+        ),
+        click.option(
+            "-l", "--language", "languages", multiple=True, help="e.g. common."
+        ),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+@click.command()
+@filter_options
+@click.pass_context
+def monsters(ctx, **filters):
+    """List the monsters that match all of the filters given.
+
+    Text filters match monsters whose field contains all of the filter's words,
+    ignoring case, so "--type humanoid" matches "humanoid (goblinoid)". Every filter
+    except the ranges can be given more than once. Monsters are listed in order of
+    challenge rating.
+    """
+    setting = get_setting(ctx)
+    catalogue = MonsterCatalogue(setting)
+    for error in catalogue.update():
+        click.echo(f"Warning: skipped {error}", err=True)
+
+    rows = query_rows(catalogue, **filters)
+    lines = [f"{'Monster':<30} {'CR':>5} {'XP':>7}  Size, type and alignment"]
+    count = 0
+    for index in iter_bits(rows):
+        name, _, row_challenge, row_xp, (size, creature_type, alignment, *_) = (
+            catalogue.row(index)
+        )
+        description = ", ".join(
+            " ".join(words) for words in (size, creature_type, alignment)
+        )
+        lines.append(
+            f"{name:<30} {format_challenge(row_challenge):>5} {row_xp:>7}  "
+            f"{description}"
+        )
+        count += 1
+    if not count:
+        click.echo("No monsters match.")
+        return
+    lines.append(f"{count} of {len(catalogue)} monsters match.")
+    click.echo("\n".join(lines))
@@ -1,12 +1,14 @@
-import yaml
 from pathlib import Path
-from dataclasses import dataclass
 from typing import Optional, List, Dict
-from fourhills.exceptions import FhParseError
+from fourhills.cache import ParseCache
+from fourhills.dataclass_utils import slotted_dataclass
+from fourhills.loader import load_yaml
+from fourhills.render_cache import RenderSource, cached_render
 from fourhills.text_utils import wrap_lines_paragraph, title
+from fourhills.trace import phase
 
 
-@dataclass
+@slotted_dataclass(extra_slots=("render_source",))
 class Npc:
     """Represents a non-player character."""
 
@@ -66,6 +68,7 @@ class Npc:
         else:
             return ["This NPC has no stats defined"]
 
+    @cached_render
     def character_info(self, line_width: int = 80) -> List[str]:
         """Return a list of lines describing the NPC.
 
@@ -96,7 +99,7 @@ class Npc:
         return wrap_lines_paragraph(lines, line_width)
 
     @classmethod
-    def from_file(cls, filepath: Path, setting):
+    def from_file(cls, filepath: Path, setting, cache: Optional[ParseCache] = None):
         """Create a Npc from a YAML file.
 
         Parameters
@@ -106,35 +109,39 @@ class Npc:
         setting: Setting
             The Setting object; this is used to find any stats as defined by the
             stats_base key
+        cache: ParseCache or None
+            If given, the cache is used to avoid re-parsing the YAML file.
 
         Raises
         ------
         FhParseError
             If there is an error parsing the file.
         """
-        with open(filepath) as f:
-            try:
-                npc_dict = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                raise FhParseError(
-                    f'Error parsing YAML in NPC "{filepath.stem}": {str(exc)}'
-                )
-
-            if "stats_base" in npc_dict:
+        npc_dict = cache.load(filepath, parse_npc) if cache else parse_npc(filepath)
+
+        if "stats_base" in npc_dict:
+            with phase("resolve NPC stats"):
                 stats = setting.monsters[npc_dict["stats_base"]]
-            else:
-                stats = None
-
-            if "stats" in npc_dict:
-                raise NotImplementedError
-
-            npc = cls(
-                **{
-                    key: value
-                    for key, value in npc_dict.items()
-                    if key not in ["stats_base", "stats"]
-                }
-            )
-            npc.stats = stats
+        else:
+            stats = None
+
+        if "stats" in npc_dict:
+            raise NotImplementedError
+
+        npc = cls(
+            **{
+                key: value
+                for key, value in npc_dict.items()
+                if key not in ["stats_base", "stats"]
+            }
+        )
+        npc.stats = stats
+        if cache:
+            npc.render_source = RenderSource(*cache.source(filepath), "")
+
+        return npc
+
 
-            return npc
+def parse_npc(filepath: Path) -> dict:
+    """Parse an NPC YAML file into a dict."""
+    return load_yaml(filepath, f'in NPC "{filepath.stem}"')
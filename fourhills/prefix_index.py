@@ -0,0 +1,39 @@
+import bisect
+from typing import Iterable, List
+
+
+class PrefixIndex:
+    """Sorted index of names that answers prefix queries by binary search.
+
+    Building the index sorts the names once; after that, listing the names that start
+    with a prefix takes logarithmic time plus the time to copy the matches.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        names: iterable of str
+            The names to index.
+        """
+        self._names = sorted(names)
+
+    def _bounds(self, prefix: str):
+        """Return the start and end indices of the names starting with the prefix."""
+        start = bisect.bisect_left(self._names, prefix)
+        # Every name starting with the prefix sorts before the smallest string that is
+        # greater than all of them: the prefix with its last character incremented.
+        # If the last character can't be incremented, drop it and try again.
+        upper = prefix
+        while upper and ord(upper[-1]) == 0x10FFFF:
+            upper = upper[:-1]
+        if not upper:
+            return start, len(self._names)
+        upper = upper[:-1] + chr(ord(upper[-1]) + 1)
+        return start, bisect.bisect_left(self._names, upper, start)
+
+    def completions(self, prefix: str) -> List[str]:
+        """Return all of the names that start with the prefix, in sorted order."""
+        start, end = self._bounds(prefix)
+        return self._names[start:end]
@@ -0,0 +1,182 @@
+import atexit
+import functools
+import hashlib
+import json
+import os
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from typing import Dict, List, Optional
+from fourhills.trace import phase
+
+# What an object was created from, so that its rendered lines can be cached: the key
+# of its file (its path relative to the setting root), the file's signature (which
+# changes whenever the file does), and which part of the file the object is (e.g.
+# the index of a cheatsheet section), or "" for the whole file.
+RenderSource = namedtuple("RenderSource", ["key", "signature", "part"])
+
+
+class RenderCache:
+    """Cache of rendered lines of text, grouped by the file they were rendered from.
+
+    Each file's entries are only used while the file's signature is unchanged (as in
+    the parse cache), so an object's entries are found without looking at its
+    contents. If a directory is given, each file's entries are saved in their own
+    JSON file in it, which is only read when one of the entries is first needed, and
+    the entries that have changed are saved when `save` is called. The entries of a
+    limited number of files are kept in memory, discarding the least recently used.
+    """
+
+    # Increment this whenever the format of the cache or of any rendered output
+    # changes, so that the entries saved by older versions are ignored.
+    VERSION = 2
+
+    def __init__(self, max_files: int = 512, directory: Optional[Path] = None):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        max_files: int
+            The maximum number of files whose entries are kept in memory.
+        directory: Path or None
+            If given, entries are loaded from this directory when first needed, and
+            saved to it by `save`.
+        """
+        self.max_files = max_files
+        self.directory = directory
+        # Maps each file's key to its signature and a dict of its entries, in order
+        # of least to most recently used
+        self._files = OrderedDict()
+        # The keys of the files whose entries have changed since they were saved
+        self._modified = set()
+
+    def _entry_path(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def _load(self, source: RenderSource) -> Dict[str, List[str]]:
+        if self.directory is None:
+            return {}
+        with phase("read render cache"):
+            try:
+                with open(self._entry_path(source.key), encoding="utf-8") as f:
+                    data = json.load(f)
+                if data["version"] == self.VERSION and data["key"] == source.key:
+                    if data["signature"] == list(source.signature):
+                        return data["entries"]
+            except Exception:
+                pass
+        return {}
+
+    def _entries(self, source: RenderSource) -> Dict[str, List[str]]:
+        """Return the entries for a file, loading them if necessary."""
+        cached = self._files.get(source.key)
+        if cached is not None and cached[0] == source.signature:
+            self._files.move_to_end(source.key)
+            return cached[1]
+        entries = self._load(source)
+        self._files[source.key] = (source.signature, entries)
+        self._files.move_to_end(source.key)
+        self._modified.discard(source.key)
+        while len(self._files) > self.max_files:
+            key, (signature, old_entries) = self._files.popitem(last=False)
+            if key in self._modified:
+                self._save_entries(key, signature, old_entries)
+        return entries
+
+    def get(self, source: RenderSource, render_key: str) -> Optional[List[str]]:
+        """Return the lines for an entry, or None if there is no such entry."""
+        return self._entries(source).get(render_key)
+
+    def put(self, source: RenderSource, render_key: str, lines: List[str]):
+        """Store the lines for an entry."""
+        self._entries(source)[render_key] = lines
+        self._modified.add(source.key)
+
+    def save(self):
+        """Atomically save the entries of each file that have changed.
+
+        Failures (e.g. a read-only cache directory) are ignored.
+        """
+        if self.directory is not None:
+            for key in list(self._modified):
+                signature, entries = self._files[key]
+                self._save_entries(key, signature, entries)
+        self._modified.clear()
+
+    def _save_entries(self, key: str, signature, entries: Dict[str, List[str]]):
+        if self.directory is None:
+            return
+        import tempfile
+
+        data = {
+            "version": self.VERSION,
+            "key": key,
+            "signature": list(signature),
+            "entries": entries,
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self._entry_path(key))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            pass
+        self._modified.discard(key)
+
+
+# The cache used by `cached_render`. It is only kept in memory unless `persist_to`
+# is called.
+_render_cache = RenderCache()
+
+
+def persist_to(directory: Path):
+    """Load rendered lines from a directory, and save them to it at exit.
+
+    Parameters
+    ----------
+    directory: Path
+        The directory to persist the render cache in.
+    """
+    global _render_cache
+    if _render_cache.directory == directory:
+        return
+    _render_cache.save()
+    _render_cache = RenderCache(_render_cache.max_files, directory)
+    atexit.register(_render_cache.save)
+
+
+def cached_render(method):
+    """Decorate a method that renders an object as a list of lines.
+
+    The method's first argument must be the line width. If the object has a
+    `render_source` attribute (a RenderSource), the lines it returns are cached,
+    keyed by the source, the class and method, the line width and any other
+    arguments, so the object is only rendered again if any of those change. Objects
+    without a source are always rendered. A new list is returned each time, so
+    callers can modify it.
+    """
+
+    phase_name = f"render {method.__qualname__}"
+
+    @functools.wraps(method)
+    def wrapper(self, line_width=80, *args, **kwargs):
+        with phase(phase_name):
+            source = getattr(self, "render_source", None)
+            if source is None:
+                return method(self, line_width, *args, **kwargs)
+            render_key = (
+                f"{method.__qualname__}|{source.part}|{line_width}|{args!r}|"
+                f"{sorted(kwargs.items())!r}"
+            )
+            lines = _render_cache.get(source, render_key)
+            if lines is None:
+                lines = method(self, line_width, *args, **kwargs)
+                _render_cache.put(source, render_key, list(lines))
+            return list(lines)
+
+    return wrapper
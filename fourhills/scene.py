@@ -1,9 +1,12 @@
 import re
-import yaml
-from typing import List, Tuple, Optional
+from pathlib import Path
+from typing import Iterator, List, Tuple, Optional, Union
 from fourhills import Setting
+from fourhills.cache import ParseCache
 from fourhills.exceptions import FhParseError
+from fourhills.loader import load_yaml
 from fourhills.text_utils import display_panes, title
+from fourhills.trace import phase
 
 
 class Scene:
@@ -31,95 +34,147 @@ class Scene:
         self.setting = setting or Setting()
 
     @classmethod
-    def from_file(cls, filename: str, setting: Optional[Setting] = None):
+    def from_file(
+        cls,
+        filename: Union[str, Path],
+        setting: Optional[Setting] = None,
+        cache: Optional[ParseCache] = None,
+    ):
         """Load scene info from a file and return a Scene instance.
 
         Parameters
         ----------
-        filename : str
+        filename : str or Path
             Filename of the YAML file to load scene info from.
         setting : Setting or None
             The setting the scene belongs to. If None, one will be generated.
+        cache: ParseCache or None
+            If given, the cache is used to avoid re-parsing the YAML file.
 
         Raises
         ------
         FhParseError
             If there is an error parsing the file.
         """
-        with open(filename) as f:
-            try:
-                scene_info = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                raise FhParseError(f"Error parsing YAML for scene: {str(exc)}")
-
-            # Stores the list of monster names and numbers
-            monster_info = []
-
-            # If there was a monsters section, load the monsters
-            if "monsters" in scene_info:
-                for monster_name_number in scene_info["monsters"]:
-                    # See if it matches the expected format, extracting name and number
-                    match = re.match(r"^(\w*)(?: ?x?(\d+))?$", monster_name_number)
-                    if not match:
-                        raise FhParseError(
-                            f'Error parsing "{monster_name_number}": could not split '
-                            "into a monster name and (optional) quantity."
-                        )
-                    # Get the name of the monster and how many there are. If there
-                    # wasn't a number, assume 1 monster.
-                    name = match[1]
-                    number = match[2] or "1"
-                    # Convert to int
-                    try:
-                        number = int(number)
-                    except ValueError as exc:
-                        raise FhParseError(
-                            f'Error parsing quantity "{number}" of monster "{name}" '
-                            'into an integer.'
-                        ) from exc
-                    # Add to the list
-                    monster_info.append((name, number))
-
-            # Stores the list of NPC names
-            npc_info = scene_info["npcs"] if "npcs" in scene_info else []
-
-            return cls(monster_info, npc_info, setting)
+        with phase("load scene"):
+            scene_info = (
+                cache.load(filename, parse_scene) if cache else parse_scene(filename)
+            )
+            monster_info, npc_info = cls.parse_info(scene_info)
 
-    def display_battle(self):
-        """Display statistsics for battle."""
-        panes = list()
+        return cls(monster_info, npc_info, setting)
+
+    @staticmethod
+    def parse_info(scene_info: dict) -> Tuple[List[Tuple[str, int]], List[str]]:
+        """Extract the monsters and NPCs from the parsed contents of a scene file.
+
+        Parameters
+        ----------
+        scene_info : dict
+            The parsed contents of the scene file.
+
+        Returns
+        -------
+        tuple of list of tuples of str, int and list of str
+            The monster names and the quantity of each, and the NPC names.
 
+        Raises
+        ------
+        FhParseError
+            If a monster and its quantity can't be parsed.
+        """
+        # Stores the list of monster names and numbers
+        monster_info = []
+
+        # If there was a monsters section, load the monsters
+        if "monsters" in scene_info:
+            for monster_name_number in scene_info["monsters"]:
+                # See if it matches the expected format, extracting name and number
+                match = re.match(r"^(\w*)(?: ?x?(\d+))?$", monster_name_number)
+                if not match:
+                    raise FhParseError(
+                        f'Error parsing "{monster_name_number}": could not split '
+                        "into a monster name and (optional) quantity."
+                    )
+                # Get the name of the monster and how many there are. If there
+                # wasn't a number, assume 1 monster.
+                name = match[1]
+                number = match[2] or "1"
+                # Convert to int
+                try:
+                    number = int(number)
+                except ValueError as exc:
+                    raise FhParseError(
+                        f'Error parsing quantity "{number}" of monster "{name}" '
+                        "into an integer."
+                    ) from exc
+                # Add to the list
+                monster_info.append((name, number))
+
+        # Stores the list of NPC names
+        npc_info = scene_info["npcs"] if "npcs" in scene_info else []
+
+        return monster_info, npc_info
+
+    def battle_panes(self) -> Iterator[List[str]]:
+        """Produce a pane of battle statistics for each monster and NPC.
+
+        Panes are produced lazily, so each monster or NPC is only loaded when its
+        pane is needed.
+
+        Yields
+        ------
+        list of str
+            The lines of each pane.
+        """
         for monster_name, quantity in self.monster_names_quantities:
             monster = self.setting.monsters[monster_name]
-            panes.append(
+            yield (
                 monster.summary_info(self.setting.pane_width, quantity)
                 + monster.battle_info(self.setting.pane_width)
             )
 
         for npc_name in self.npc_names:
             npc = self.setting.npcs[npc_name]
-            panes.append(
+            yield (
                 npc.summary_info(self.setting.pane_width)
                 + npc.battle_info(self.setting.pane_width)
             )
 
-        display_panes(panes, self.setting.panes, self.setting.pane_width)
+    def display_battle(self):
+        """Display statistsics for battle."""
+        display_panes(self.battle_panes(), self.setting.panes, self.setting.pane_width)
+
+    def npc_panes(self) -> Iterator[List[str]]:
+        """Produce a pane of information for each NPC.
 
-    def display_npcs(self):
-        """Display information about NPCs."""
-        panes = list()
+        Panes are produced lazily, so each NPC is only loaded when its pane is
+        needed.
 
+        Yields
+        ------
+        list of str
+            The lines of each pane.
+        """
         for npc_name in self.npc_names:
             npc = self.setting.npcs[npc_name]
-            panes.append(
+            yield (
                 npc.summary_info(self.setting.pane_width)
                 + npc.character_info(self.setting.pane_width)
             )
 
-        display_panes(panes, self.setting.panes, self.setting.pane_width)
+    def display_npcs(self):
+        """Display information about NPCs."""
+        display_panes(self.npc_panes(), self.setting.panes, self.setting.pane_width)
+
+    def scene_panes(self) -> List[List[str]]:
+        """Return panes listing the monsters and NPCs at the location, and their XP.
 
-    def display_scene(self):
-        """Display information about location."""
+        Returns
+        -------
+        list of list of str
+            The lines of each pane.
+        """
         panes = list()
 
         # List of all of the monsters at the location, and the quantities of each
@@ -167,4 +222,13 @@ class Scene:
         xp_lines.append("Total XP = " + str(monster_xp + npc_xp))
         panes.append(xp_lines)
 
-        display_panes(panes, self.setting.panes, self.setting.pane_width)
+        return panes
+
+    def display_scene(self):
+        """Display information about location."""
+        display_panes(self.scene_panes(), self.setting.panes, self.setting.pane_width)
+
+
+def parse_scene(filepath: Union[str, Path]) -> dict:
+    """Parse a scene YAML file into a dict."""
+    return load_yaml(filepath, "for scene")
@@ -0,0 +1,328 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+import click
+from fourhills.cache import file_signature, update_file_entries
+from fourhills.cheatsheet import parse_cheatsheet
+from fourhills.exceptions import FhError
+from fourhills.fourhills import get_setting
+from fourhills.npc import parse_npc
+from fourhills.prefix_index import PrefixIndex
+from fourhills.setting import Setting
+
+SCENE_NOTES_FILENAME = "scene.md"
+
+# The NPC fields that are searched, in the order they are shown
+NPC_FIELDS = ["name", "appearance", "temperament", "accent", "background", "phrases"]
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def terms(text: str) -> List[str]:
+    """Split text into lower-case search terms (words)."""
+    return _WORD_RE.findall(text.lower())
+
+
+def _join(value) -> str:
+    """Return a field's value as text, joining lists with newlines."""
+    if value is None:
+        return ""
+    elif isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return str(value)
+
+
+class SearchIndex:
+    """Inverted index of the text of scene notes, NPCs and cheatsheets.
+
+    The searchable documents are each location's scene.md notes, each NPC (its
+    appearance, background, phrases etc.) and each section of each cheatsheet.
+    The index maps every term to the documents containing it, with the number of
+    times it appears, so a search only reads the entries for its terms. Results
+    are ranked with BM25, and each search term also matches longer terms that it is
+    a prefix of.
+
+    The index is persisted in the setting's cache directory, and `update` only
+    re-indexes the files that have changed since it was last updated.
+    """
+
+    NAME = "search"
+    # Increment this whenever the format of the index or the terms change
+    VERSION = 3
+    # BM25 parameters: how quickly repeated terms stop adding to the score, and how
+    # much longer documents are penalised
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, setting: Setting):
+        """Initialise the object, loading the index from the cache if possible.
+
+        Parameters
+        ----------
+        setting: Setting
+            The setting to index.
+        """
+        self.setting = setting
+        data = setting.cache.load_index(self.NAME, self.VERSION) or {}
+        # Maps each indexed file (relative to the setting root) to its signature, and
+        # its kind ("scene", "npc" or "cheatsheet") and the IDs of its documents
+        self._files: Dict[str, Tuple] = data.get("files", {})
+        # Maps the files that couldn't be read to their signatures and the errors
+        self._failures: Dict[str, Tuple] = data.get("failures", {})
+        # Maps each document ID, a tuple of the file and the document's index within
+        # it, to its title, its length in terms, and its distinct terms
+        self._documents: Dict[Tuple[str, int], Tuple] = data.get("documents", {})
+        # Maps each term to a dict of the documents containing it and its frequency
+        # in each
+        self._postings: Dict[str, Dict[Tuple[str, int], int]] = data.get("postings", {})
+        self._total_length: int = data.get("total_length", 0)
+        # Index of the terms for prefix matching, built when first needed
+        self._term_index = data.get("term_index")
+
+    def _setting_files(self) -> Iterator[Tuple[str, Path]]:
+        """Produce the kind and path of every file that should be indexed."""
+        for directory, dirnames, filenames in os.walk(self.setting.world_dir):
+            dirnames.sort()
+            if SCENE_NOTES_FILENAME in filenames:
+                yield "scene", Path(directory, SCENE_NOTES_FILENAME)
+        for name in self.setting.npcs:
+            yield "npc", self.setting.npcs.path(name)
+        for name in self.setting.cheatsheets:
+            yield "cheatsheet", self.setting.cheatsheets.path(name)
+
+    def file_documents(self, kind: str, filepath: Path) -> List[Tuple[str, str]]:
+        """Return the title and text of each document in a file.
+
+        Raises
+        ------
+        FhParseError
+            If the file is an NPC or cheatsheet that can't be parsed.
+        """
+        if kind == "scene":
+            location = self.setting.location(filepath.parent)
+            with open(filepath, encoding="utf-8") as f:
+                return [(f"Scene {location}", f.read())]
+        elif kind == "npc":
+            npc_info = self.setting.cache.load(filepath, parse_npc) or {}
+            text = "\n".join(_join(npc_info.get(field)) for field in NPC_FIELDS)
+            return [(f'NPC "{filepath.stem}"', text)]
+        else:
+            cheatsheet_info = self.setting.cache.load(filepath, parse_cheatsheet) or {}
+            return [
+                (
+                    f'Cheatsheet "{filepath.stem}": {section.get("section_title")}',
+                    "\n".join(
+                        [
+                            _join(cheatsheet_info.get("description")),
+                            _join(section.get("section_title")),
+                            _join(section.get("section_content")),
+                        ]
+                    ),
+                )
+                for section in cheatsheet_info.get("sections") or []
+            ]
+
+    def update(self) -> List[str]:
+        """Bring the index up to date with the setting's files, and save it.
+
+        Only the files whose modification time or size has changed since the index
+        was last updated are read again.
+
+        Returns
+        -------
+        list of str
+            A description of each file that couldn't be read. These files are left
+            out of the index.
+        """
+        kinds = {}
+
+        def setting_files():
+            for kind, filepath in self._setting_files():
+                key = filepath.relative_to(self.setting.root).as_posix()
+                kinds[key] = kind
+                yield key, filepath
+
+        def signature(filepath):
+            # Scene notes aren't compiled, so they are always read from their files
+            if filepath.name == SCENE_NOTES_FILENAME:
+                return file_signature(filepath)
+            return self.setting.cache.signature(filepath)
+
+        changed, errors = update_file_entries(
+            self._files,
+            self._failures,
+            setting_files(),
+            lambda key, filepath: self._add_file(
+                key, kinds[key], self.file_documents(kinds[key], filepath)
+            ),
+            on_remove=self._remove_file,
+            signature=signature,
+        )
+        if changed:
+            self._term_index = PrefixIndex(self._postings)
+            self.setting.cache.store_index(
+                self.NAME,
+                self.VERSION,
+                {
+                    "files": self._files,
+                    "failures": self._failures,
+                    "documents": self._documents,
+                    "postings": self._postings,
+                    "total_length": self._total_length,
+                    "term_index": self._term_index,
+                },
+            )
+        return errors
+
+    def _add_file(self, key: str, kind: str, documents) -> Tuple:
+        """Index a file's documents, returning its kind and the documents' IDs."""
+        document_ids = []
+        for number, (title, text) in enumerate(documents):
+            document_id = (key, number)
+            term_counts = Counter(terms(text))
+            for term, count in term_counts.items():
+                self._postings.setdefault(term, {})[document_id] = count
+            length = sum(term_counts.values())
+            self._documents[document_id] = (title, length, tuple(term_counts))
+            self._total_length += length
+            document_ids.append(document_id)
+        return kind, document_ids
+
+    def _remove_file(self, key: str, file_data: Tuple):
+        _, document_ids = file_data
+        for document_id in document_ids:
+            _, length, document_terms = self._documents.pop(document_id)
+            self._total_length -= length
+            for term in document_terms:
+                postings = self._postings[term]
+                del postings[document_id]
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str) -> List[Tuple[float, Tuple[str, int]]]:
+        """Return the documents that match every term of a query, best first.
+
+        Each term of the query matches any term in the index that starts with it.
+
+        Parameters
+        ----------
+        query: str
+            The search terms.
+
+        Returns
+        -------
+        list of tuples of float, tuple of str, int
+            The score and ID of each matching document.
+        """
+        query_terms = terms(query)
+        if not query_terms or not self._documents:
+            return []
+        if self._term_index is None:
+            self._term_index = PrefixIndex(self._postings)
+        document_count = len(self._documents)
+        average_length = self._total_length / document_count
+
+        scores = None
+        for query_term in set(query_terms):
+            # The score of each document for this query term is the best score of the
+            # terms it matches
+            term_scores = defaultdict(float)
+            for term in self._term_index.completions(query_term):
+                postings = self._postings[term]
+                idf = math.log(
+                    1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for document_id, frequency in postings.items():
+                    length = self._documents[document_id][1]
+                    score = (
+                        idf
+                        * frequency
+                        * (self.K1 + 1)
+                        / (
+                            frequency
+                            + self.K1 * (1 - self.B + self.B * length / average_length)
+                        )
+                    )
+                    if score > term_scores[document_id]:
+                        term_scores[document_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    document_id: score + term_scores[document_id]
+                    for document_id, score in scores.items()
+                    if document_id in term_scores
+                }
+            if not scores:
+                return []
+
+        return sorted(
+            ((score, document_id) for document_id, score in scores.items()),
+            key=lambda result: (-result[0], result[1]),
+        )
+
+    def title(self, document_id: Tuple[str, int]) -> str:
+        """Return the title of a document."""
+        return self._documents[document_id][0]
+
+    def snippet(self, document_id: Tuple[str, int], query: str, width: int) -> str:
+        """Return the first line of a document that matches the query.
+
+        The document's file is read again, so this should only be used for the
+        results that are shown.
+        """
+        key, number = document_id
+        _, (kind, _) = self._files[key]
+        try:
+            _, text = self.file_documents(kind, self.setting.root / key)[number]
+        except (FhError, OSError, UnicodeDecodeError, AttributeError, IndexError):
+            return ""
+        query_terms = terms(query)
+        for line in text.splitlines():
+            if any(
+                term.startswith(query_term)
+                for term in terms(line)
+                for query_term in query_terms
+            ):
+                line = line.strip()
+                return line if len(line) <= width else line[: width - 3] + "..."
+        return ""
+
+
+@click.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Maximum number of results to show.",
+)
+@click.argument("query", nargs=-1, required=True, metavar="<terms>...")
+@click.pass_context
+def search(ctx, limit, query):
+    """Search scene notes, NPCs and cheatsheets for <terms>.
+
+    Shows the scenes, NPCs and cheatsheet sections that contain all of the terms,
+    best match first. Each term also matches longer words that start with it.
+    """
+    setting = get_setting(ctx)
+    index = SearchIndex(setting)
+    for error in index.update():
+        click.echo(f"Warning: skipped {error}", err=True)
+
+    query = " ".join(query)
+    results = index.search(query)
+    if not results:
+        click.echo("No matches found.")
+        return
+    for score, document_id in results[:limit]:
+        click.echo(f"{index.title(document_id)}  ({score:.2f})")
+        snippet = index.snippet(document_id, query, 76)
+        if snippet:
+            click.echo(f"    {snippet}")
+    if len(results) > limit:
+        click.echo(f"... and {len(results) - limit} more.")
@@ -1,17 +1,40 @@
+import functools
+import os
+from collections import OrderedDict, namedtuple
 from collections.abc import Mapping
 from pathlib import Path
-from typing import Optional, Callable, Any
-from fourhills.stats import StatBlock
-from fourhills.npc import Npc
-from fourhills.cheatsheet import Cheatsheet
+from typing import Optional, Callable, Any, Dict, List
+from fourhills.cache import ParseCache, user_cache_dir
+from fourhills.prefix_index import PrefixIndex
+from fourhills import render_cache
+from fourhills.trace import phase
 from fourhills.exceptions import FhSettingStructureError, FhAmbiguousReferenceError
 
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# The values of an environment variable that turn a flag off, as for click's flags
+FALSE_ENV_VALUES = ("", "0", "false", "f", "no", "n", "off")
+
+
+def env_flag(name: str) -> bool:
+    """Return whether an environment variable turns a flag on, as click does.
+
+    The flag is off if the variable isn't set, or is one of `FALSE_ENV_VALUES`
+    (ignoring case), e.g. FH_COMPILED=0.
+    """
+    return os.environ.get(name, "").strip().lower() not in FALSE_ENV_VALUES
+
 
 class DirectoryDict(Mapping):
     """Makes a directory of files look like an immutable dict of a type of class."""
 
     def __init__(
-        self, directory: Path, extension: str, item_factory: Callable[[Path], Any]
+        self,
+        directory: Path,
+        extension: str,
+        item_factory: Callable[[Path], Any],
+        cache_size: Optional[int] = None,
+        item_dependencies: Optional[Callable[[Path], List[Path]]] = None,
     ):
         """Initialise the object.
 
@@ -24,17 +47,113 @@ class DirectoryDict(Mapping):
         item_factory: Callable
             Callable that returns an object of the desired type when passed a single
             argument: a file path (pathlib.Path) that contains the object definition
+        cache_size: int or None
+            If None, the item factory is called every time an item is accessed.
+            Otherwise, up to this many items are kept in memory, discarding the least
+            recently used, so that repeated accesses return the same instance. Kept
+            items are only reused while their file's modification time is unchanged.
+        item_dependencies: Callable or None
+            Callable that returns the paths of any other files that an item depends
+            on (e.g. an NPC's stats_base monster), when passed the path of the item's
+            file after the item has been created. Kept items are only reused while
+            these files are unchanged too.
         """
-        # Create a dictionary mapping names (excluding extension) to their full path
-        self._valid_names_paths = {
-            filepath.stem: filepath
-            for filepath in directory.glob(f"*.{extension}")
-            if filepath.is_file()
-        }
+        self.directory = directory
+        self.extension = extension
+        # Dictionary mapping names (excluding extension) to their full path, created
+        # when first needed
+        self._names_paths = None
         self._item_factory = item_factory
+        self._load_phase_name = f"load {directory.name}"
+        # Index of the names for prefix lookups, built when first needed
+        self._prefix_index = None
+        self._cache_size = cache_size
+        self._item_dependencies = item_dependencies
+        # Maps names to a tuple of the version of the item's file, the paths and
+        # versions of the files it depends on, and the item, in order of least to most
+        # recently used
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def _valid_names_paths(self):
+        if self._names_paths is None:
+            self._names_paths = self._find_files()
+        return self._names_paths
+
+    def _find_files(self):
+        with phase(f"list {self.directory.name}"):
+            return {
+                filepath.stem: filepath
+                for filepath in self.directory.glob(f"*.{self.extension}")
+                if filepath.is_file()
+            }
+
+    def rescan(self):
+        """Find the files in the directory again, e.g. after files are added or removed.
+
+        Items kept in memory are kept, unless their file has been removed.
+        """
+        self._names_paths = self._find_files()
+        self._prefix_index = None
+        for key in list(self._cache):
+            if key not in self._valid_names_paths:
+                del self._cache[key]
+
+    def _item_version(self, filepath: Path):
+        """Return a value that changes whenever an item's file changes."""
+        return filepath.stat().st_mtime_ns
+
+    def _dependency_versions(self, dependencies: List[Path]) -> tuple:
+        versions = []
+        for dependency in dependencies:
+            try:
+                versions.append(self._item_version(dependency))
+            except OSError:
+                # It has been removed, so the item must be created again
+                versions.append(None)
+        return tuple(versions)
 
     def __getitem__(self, key):
-        return self._item_factory(self._valid_names_paths[key])
+        filepath = self.path(key)
+        if self._cache_size is None:
+            with phase(self._load_phase_name):
+                return self._item_factory(filepath)
+
+        version = self._item_version(filepath)
+        if key in self._cache:
+            cached_version, dependencies, cached_dependency_versions, item = (
+                self._cache[key]
+            )
+            if cached_version == version and cached_dependency_versions == (
+                self._dependency_versions(dependencies)
+            ):
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return item
+
+        self._misses += 1
+        with phase(self._load_phase_name):
+            item = self._item_factory(filepath)
+        if self._item_dependencies is None:
+            dependencies = []
+        else:
+            dependencies = self._item_dependencies(filepath)
+        self._cache[key] = (
+            version,
+            dependencies,
+            self._dependency_versions(dependencies),
+            item,
+        )
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return item
+
+    def __contains__(self, key):
+        # Only the names are needed, so don't create the item (as Mapping would)
+        return key in self._valid_names_paths
 
     def __iter__(self):
         return iter(self._valid_names_paths)
@@ -42,6 +161,40 @@ class DirectoryDict(Mapping):
     def __len__(self):
         return len(self._valid_names_paths)
 
+    def path(self, key: str) -> Path:
+        """Return the path of the file that defines an item.
+
+        Raises
+        ------
+        KeyError
+            If there is no item with that name.
+        """
+        return self._valid_names_paths[key]
+
+    def cache_info(self) -> CacheInfo:
+        """Return statistics about the use of the item cache.
+
+        Returns
+        -------
+        CacheInfo
+            Named tuple of the number of hits and misses, the maximum size of the
+            cache (None if caching is disabled), and its current size.
+        """
+        return CacheInfo(self._hits, self._misses, self._cache_size, len(self._cache))
+
+    def invalidate(self, key: Optional[str] = None):
+        """Discard a cached item, so it is re-created the next time it is accessed.
+
+        Parameters
+        ----------
+        key: str or None
+            The name of the item to discard. If None, all items are discarded.
+        """
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
     def from_prefix(self, prefix):
         """Return an item from a prefix of the key (or the full key).
 
@@ -57,7 +210,7 @@ class DirectoryDict(Mapping):
         FhAmbiguousReferenceError
             If the prefix was ambiguous, i.e. there were multiple files it could match.
         """
-        possible_keys = [key for key in self.keys() if key.startswith(prefix)]
+        possible_keys = self.completions(prefix)
         # If the list was empty, the prefix didn't match any real keys
         if len(possible_keys) == 0:
             raise ValueError(prefix)
@@ -70,11 +223,37 @@ class DirectoryDict(Mapping):
                 f'Multiple items match prefix "{prefix}": {", ".join(possible_keys)}'
             )
 
+    def completions(self, prefix: str) -> List[str]:
+        """Return all of the keys that start with a prefix, in sorted order.
+
+        Parameters
+        ----------
+        prefix: str
+            The prefix to complete.
+        """
+        if self._prefix_index is None:
+            self._prefix_index = PrefixIndex(self._valid_names_paths)
+        return self._prefix_index.completions(prefix)
+
 
 class Setting:
     """Represents the campaign setting directory tree."""
 
     CONFIG_FILENAME = "fh_setting.yaml"
+    # If this environment variable turns the flag on (see `env_flag`), the parse
+    # cache won't be used, and setting roots won't be remembered
+    NO_CACHE_ENV_VAR = "FH_NO_CACHE"
+    # If this environment variable is set, it is used as the setting root when
+    # running from within it
+    ROOT_ENV_VAR = "FH_SETTING_ROOT"
+    # If this environment variable turns the flag on (see `env_flag`), monsters,
+    # NPCs, cheatsheets and scenes are read from the setting's compiled database (see
+    # `fourhills.sqlite_store`) rather than from their files
+    COMPILED_ENV_VAR = "FH_COMPILED"
+    # The maximum number of directories to remember the setting roots of
+    MAX_KNOWN_ROOTS = 256
+    # How many of each type of item to keep in memory once loaded
+    ITEM_CACHE_SIZE = 256
     DIRNAMES = {
         "world": "world",
         "monsters": "monsters",
@@ -82,22 +261,146 @@ class Setting:
         "cheatsheets": "cheatsheets",
     }
 
-    def __init__(self):
-        self.root = self.find_root()
+    def __init__(self, compiled: Optional[bool] = None):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        compiled: bool or None
+            Whether to read the setting's items from its compiled database, which
+            `fh compile` creates. If None, they are if `COMPILED_ENV_VAR` turns
+            the flag on.
+
+        Raises
+        ------
+        FhSettingStructureError
+            If the current directory is not part of a valid setting, or the
+            compiled database can't be used.
+        """
+        with phase("find root"):
+            self.root = self.find_root()
         self.pane_width = 56
         self.panes = 2
-        self._monsters = DirectoryDict(
-            self.root / self.DIRNAMES["monsters"], "yaml", StatBlock.from_file
+        if compiled is None:
+            compiled = env_flag(self.COMPILED_ENV_VAR)
+        self.compiled = compiled
+        use_cache = not env_flag(self.NO_CACHE_ENV_VAR)
+        if compiled:
+            from fourhills.sqlite_store import SqliteDict, SqliteStore
+
+            # The store stands in for the parse cache, so the items' from_file()
+            # methods read their parsed contents from the database
+            self.cache = SqliteStore(
+                self.root,
+                self.root / SqliteStore.FILENAME,
+                enabled=use_cache,
+            )
+            directory_dict = functools.partial(SqliteDict, self.cache)
+        else:
+            # Parsed files are cached, so they only need to be parsed again when they
+            # change
+            self.cache = ParseCache(self.root, enabled=use_cache)
+            directory_dict = DirectoryDict
+        # Rendered text is cached alongside the parsed files
+        if self.cache.enabled:
+            render_cache.persist_to(self.cache.directory / "rendered")
+        self._monsters = directory_dict(
+            self.root / self.DIRNAMES["monsters"],
+            "yaml",
+            self._load_monster,
+            self.ITEM_CACHE_SIZE,
         )
-        # The Npc from_file() method needs a setting to be passed in (so it can
-        # look up stats in the setting if necessary)
-        self._npcs = DirectoryDict(
-            self.root / self.DIRNAMES["npcs"], "yaml", lambda f: Npc.from_file(f, self)
+        self._npcs = directory_dict(
+            self.root / self.DIRNAMES["npcs"],
+            "yaml",
+            self._load_npc,
+            self.ITEM_CACHE_SIZE,
+            self._npc_dependencies,
         )
-        self._cheatsheets = DirectoryDict(
-            self.root / self.DIRNAMES["cheatsheets"], "yaml", Cheatsheet.from_file
+        self._cheatsheets = directory_dict(
+            self.root / self.DIRNAMES["cheatsheets"],
+            "yaml",
+            self._load_cheatsheet,
+            self.ITEM_CACHE_SIZE,
         )
 
+    # The item classes are imported when they are first needed rather than at the
+    # top of the module, because some commands (e.g. listing cheatsheets) only need
+    # the names of the files.
+
+    def _load_monster(self, filepath: Path):
+        from fourhills.stats import StatBlock
+
+        return StatBlock.from_file(filepath, self.cache)
+
+    def _load_npc(self, filepath: Path):
+        from fourhills.npc import Npc
+
+        # The Npc from_file() method needs a setting to be passed in (so it can
+        # look up stats in the setting if necessary)
+        return Npc.from_file(filepath, self, self.cache)
+
+    def _npc_dependencies(self, filepath: Path) -> List[Path]:
+        from fourhills.npc import parse_npc
+
+        # The NPC's stats are its stats_base monster, so it must be loaded again if
+        # the monster's file changes
+        stats_base = self.cache.load(filepath, parse_npc).get("stats_base")
+        if stats_base is None:
+            return []
+        return [self.monsters.path(stats_base)]
+
+    def _load_cheatsheet(self, filepath: Path):
+        from fourhills.cheatsheet import Cheatsheet
+
+        return Cheatsheet.from_file(filepath, self.cache)
+
+    @property
+    def world_dir(self) -> Path:
+        """The directory containing the locations of the world."""
+        return self.root / self.DIRNAMES["world"]
+
+    def scene_paths(self, top: Optional[Path] = None) -> List[Path]:
+        """Return the path of every scene file in a part of the world.
+
+        When the setting is compiled, these are the scene files in its database,
+        which needn't exist.
+
+        Parameters
+        ----------
+        top: Path or None
+            The directory to find the scene files in, including in every directory
+            within it. If None, the world directory.
+
+        Returns
+        -------
+        list of Path
+            The scene files, in order of location, with each location followed by
+            the locations within it.
+        """
+        from fourhills.fourhills import SCENE_FILENAME
+
+        top = top or self.world_dir
+        if self.compiled:
+            scene_name, _ = os.path.splitext(SCENE_FILENAME)
+            return sorted(
+                self.cache.find(top, scene_name), key=lambda path: path.parent.parts
+            )
+        scene_paths = []
+        for directory, dirnames, filenames in os.walk(top):
+            dirnames.sort()
+            if SCENE_FILENAME in filenames:
+                scene_paths.append(Path(directory, SCENE_FILENAME))
+        return scene_paths
+
+    def location(self, directory: Path) -> str:
+        """Return the location of a directory in the world, as it is shown.
+
+        Locations are paths from the top of the world, e.g. "/SouthernForest/Cave",
+        with "/" for the world directory itself.
+        """
+        return "/" + "/".join(directory.relative_to(self.world_dir).parts)
+
     @property
     def monsters(self):
         return self._monsters
@@ -116,7 +419,21 @@ class Setting:
 
         Notes
         -----
-        Ascends the directory tree looking for `SETTING_CONFIG_FILENAME`.
+        Ascending the directory tree can be slow (e.g. on network drives), so roots
+        are looked up cheaply first. If the `ROOT_ENV_VAR` environment variable is
+        set to a directory containing the current directory, that is used as the
+        root. Otherwise, if the root has been found from the current directory
+        before, that root is used; these are remembered by directory in a per-user
+        file (see `known_roots_file`). Either kind of root is only used if it still
+        contains `CONFIG_FILENAME` and the directories in `DIRNAMES`. Checking these
+        costs the same few stat calls however deep the current directory is. A
+        setting created later in a directory between the current directory and its
+        remembered root isn't noticed, unless it is the current directory; set
+        `NO_CACHE_ENV_VAR` or remove the file to search again.
+
+        If neither is found, ascends the directory tree looking for
+        `CONFIG_FILENAME`, and remembers the root that is found for the current
+        directory.
 
         Returns
         -------
@@ -130,6 +447,46 @@ class Setting:
         """
         # Get the current working directory and resolve any symlinks etc.
         current_dir = Path.cwd().resolve()
+        remember_roots = not env_flag(Setting.NO_CACHE_ENV_VAR)
+
+        if os.environ.get(Setting.ROOT_ENV_VAR):
+            root = Path(os.environ[Setting.ROOT_ENV_VAR]).resolve()
+            if (
+                root == current_dir or root in current_dir.parents
+            ) and Setting._is_valid_root(root):
+                return root
+
+        known_roots = Setting._read_known_roots() if remember_roots else {}
+        # Only the root found from this exact directory is used, as a directory
+        # between it and a root found from elsewhere could be the root of another
+        # setting. If the directory has since become a root itself, it is used.
+        root = known_roots.get(current_dir)
+        if (
+            root is not None
+            and (
+                root == current_dir
+                or not (current_dir / Setting.CONFIG_FILENAME).exists()
+            )
+            and Setting._is_valid_root(root)
+        ):
+            return root
+
+        root = Setting._search_for_root(current_dir)
+        if remember_roots:
+            Setting._remember_root(current_dir, root, known_roots)
+        return root
+
+    @staticmethod
+    def _is_valid_root(root: Path) -> bool:
+        """Return whether a directory has a config file and the required directories."""
+        return (root / Setting.CONFIG_FILENAME).is_file() and all(
+            (root / directory_name).is_dir()
+            for directory_name in Setting.DIRNAMES.values()
+        )
+
+    @staticmethod
+    def _search_for_root(current_dir: Path) -> Path:
+        """Ascend the directory tree from `current_dir` to find the setting root."""
         # While we can still ascend
         while current_dir != current_dir.parent:
             # See if the settings file exists
@@ -144,3 +501,53 @@ class Setting:
             current_dir = current_dir.parent
         # If the root directory wasn't found, raise an exception
         raise FhSettingStructureError("No valid root directory was found.")
+
+    @staticmethod
+    def known_roots_file() -> Path:
+        """Return the path of the per-user file that remembers setting roots."""
+        return user_cache_dir() / "known_roots"
+
+    @staticmethod
+    def _read_known_roots() -> Dict[Path, Path]:
+        """Return the remembered root of each directory, most recently found first."""
+        known_roots = {}
+        try:
+            with open(Setting.known_roots_file()) as f:
+                for line in f:
+                    directory, separator, root = line.rstrip("\n").partition("\t")
+                    if separator:
+                        known_roots[Path(directory)] = Path(root)
+        except OSError:
+            pass
+        return known_roots
+
+    @staticmethod
+    def _remember_root(directory: Path, root: Path, known_roots: Dict[Path, Path]):
+        import tempfile
+
+        # The most recently found root goes first, and only a limited number are kept
+        roots = [(directory, root)] + [
+            (known_directory, known_root)
+            for known_directory, known_root in known_roots.items()
+            if known_directory != directory
+        ]
+        roots_file = Setting.known_roots_file()
+        try:
+            roots_file.parent.mkdir(parents=True, exist_ok=True)
+            # Write a new file and then replace the old one, so other runs never see
+            # a partly written file
+            fd, temp_path = tempfile.mkstemp(dir=roots_file.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.writelines(
+                        f"{known_directory}\t{known_root}\n"
+                        for known_directory, known_root in roots[
+                            : Setting.MAX_KNOWN_ROOTS
+                        ]
+                    )
+                os.replace(temp_path, roots_file)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            pass
@@ -0,0 +1,288 @@
+import cmd
+import os
+from pathlib import Path
+from typing import Dict, Optional
+import click
+from fourhills.fourhills import SCENE_FILENAME, get_setting
+from fourhills.scene import Scene
+from fourhills.setting import Setting
+from fourhills.text_utils import display_panes
+from fourhills.exceptions import (
+    FhConfigError,
+    FhError,
+    FhAmbiguousReferenceError,
+    FhParseError,
+    FhSettingStructureError,
+)
+
+
+class FourhillsShell(cmd.Cmd):
+    """Interactive session that keeps a setting loaded between commands.
+
+    The setting is only found and loaded once, and monsters, NPCs and cheatsheets are
+    kept in memory once parsed, so running several commands in a row is fast. The
+    session has its own current location in the world, which is changed with `cd`.
+    """
+
+    intro = "Fourhills shell. Type help or ? to list commands, and exit to leave."
+    # The commands which are also commands of fh
+    FH_COMMANDS = ("battle", "cheatsheet", "npcs", "scene")
+
+    def __init__(self, setting: Setting, location: Optional[Path] = None):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        setting: Setting
+            The setting to use for the session.
+        location: Path or None
+            The directory of the starting location. If None, or not in the world, the
+            session starts at the top of the world.
+        """
+        super().__init__()
+        self.setting = setting
+        world_dir = setting.world_dir
+        if location and (location == world_dir or world_dir in location.parents):
+            self.location = location
+        else:
+            self.location = world_dir
+
+    @property
+    def prompt(self):
+        return f"fh:{self.setting.location(self.location)}> "
+
+    def error(self, message: str):
+        click.echo(f"Error: {message}", err=True)
+
+    def emptyline(self):
+        # The default is to repeat the last command, which isn't useful here
+        pass
+
+    def default(self, line):
+        """Run a command given a unique prefix of its name, as with the fh command.
+
+        Prefixes are matched against the fh commands first, so that e.g. "c" means
+        "cheatsheet" as it does for fh, rather than being ambiguous with "cd".
+        """
+        command, arg, _ = self.parseline(line)
+        command_names = [
+            name[3:] for name in self.get_names() if name.startswith("do_")
+        ]
+        for candidates in (self.FH_COMMANDS, command_names):
+            matches = sorted(
+                {name for name in candidates if name.startswith(command or "")}
+                - {"EOF"}
+            )
+            if matches:
+                break
+        if not matches:
+            self.error(f'Unknown command "{command}"')
+        elif len(matches) == 1:
+            return getattr(self, f"do_{matches[0]}")(arg)
+        else:
+            self.error(f"Ambiguous command. Too many matches: {', '.join(matches)}")
+
+    def _is_location(self, directory: Path) -> bool:
+        """Return whether a directory is a location in the world.
+
+        When the setting is compiled, the locations are those containing a scene in
+        its database, as the directories needn't exist.
+        """
+        if directory == self.setting.world_dir:
+            return True
+        if self.setting.compiled:
+            return bool(self.setting.scene_paths(directory))
+        return directory.is_dir()
+
+    def _sublocations(self, directory: Path) -> Dict[str, bool]:
+        """Return the locations directly within a location, in alphabetical order.
+
+        Each location's name is mapped to whether it has a scene file.
+        """
+        if self.setting.compiled:
+            sublocations: Dict[str, bool] = {}
+            for scene_path in self.setting.scene_paths(directory):
+                parts = scene_path.parent.relative_to(directory).parts
+                if parts:
+                    has_scene = sublocations.get(parts[0], False)
+                    sublocations[parts[0]] = has_scene or len(parts) == 1
+            return dict(sorted(sublocations.items()))
+        if not directory.is_dir():
+            return {}
+        return {
+            child.name: (child / SCENE_FILENAME).is_file()
+            for child in sorted(directory.iterdir())
+            if child.is_dir()
+        }
+
+    def do_cd(self, arg):
+        """Move to a location in the world.
+
+        Usage: cd [location]. Locations are relative to the current location, or to
+        the top of the world if they start with '/', and '..' moves up a level. With
+        no location, moves to the top of the world.
+        """
+        world_dir = self.setting.world_dir
+        base = self.location if arg and not arg.startswith("/") else world_dir
+        target = Path(os.path.normpath(base / arg.lstrip("/")))
+        if target != world_dir and world_dir not in target.parents:
+            self.error("Can't move outside of the world")
+        elif not self._is_location(target):
+            self.error(f'Unknown location "{arg}"')
+        else:
+            self.location = target
+
+    def complete_cd(self, text, line, begidx, endidx):
+        # Complete the last component of the path, relative to the current location.
+        # Readline may treat "/" as a delimiter, so text may only be the last
+        # component, and the whole path is taken from the line instead.
+        _, _, path = line[:endidx].partition(" ")
+        path = path.lstrip()
+        parent, separator, prefix = path.rpartition("/")
+        base = self.setting.world_dir if path.startswith("/") else self.location
+        directory = Path(os.path.normpath(base / parent.lstrip("/")))
+        # The completions replace text, which is the end of the path
+        start = len(path) - len(text)
+        return [
+            f"{parent}{separator}{name}/"[start:]
+            for name in self._sublocations(directory)
+            if name.startswith(prefix)
+        ]
+
+    def do_ls(self, arg):
+        """List the locations within the current location.
+
+        Locations marked with * have a scene file.
+        """
+        click.echo(
+            "  ".join(
+                f"{name}*" if has_scene else name
+                for name, has_scene in self._sublocations(self.location).items()
+            )
+        )
+
+    def do_pwd(self, arg):
+        """Show the directory of the current location."""
+        click.echo(str(self.location))
+
+    def _scene(self) -> Optional[Scene]:
+        """Load the scene at the current location, or report why it can't be."""
+        try:
+            return Scene.from_file(
+                self.location / SCENE_FILENAME,
+                setting=self.setting,
+                cache=self.setting.cache,
+            )
+        except FileNotFoundError:
+            self.error("No scene file at this location")
+        except FhParseError as exc:
+            self.error(f"Problem with scene file: {str(exc)}")
+        return None
+
+    def do_battle(self, arg):
+        """Display NPC and monster stat blocks at the current location."""
+        scene = self._scene()
+        if not scene:
+            return
+        try:
+            scene.display_battle()
+        except (FhParseError, FhConfigError) as exc:
+            self.error(f"Problem displaying battle: {str(exc)}")
+        except KeyError as exc:
+            self.error(f"Unknown monster or NPC {str(exc)}")
+        except FhError as exc:
+            self.error(f"Unexpected exception: {str(exc)}")
+
+    def do_npcs(self, arg):
+        """Display details of the NPCs at the current location."""
+        scene = self._scene()
+        if not scene:
+            return
+        try:
+            scene.display_npcs()
+        except FhParseError as exc:
+            self.error(f"Problem displaying NPCs: {str(exc)}")
+        except KeyError as exc:
+            self.error(f"Unknown NPC {str(exc)}")
+        except FhError as exc:
+            self.error(f"Unexpected exception: {str(exc)}")
+
+    def do_scene(self, arg):
+        """Display information about the scene at the current location."""
+        scene = self._scene()
+        if not scene:
+            return
+        try:
+            scene.display_scene()
+        except FhParseError as exc:
+            self.error(f"Problem displaying scene: {str(exc)}")
+        except KeyError as exc:
+            self.error(f"Unknown monster or NPC {str(exc)}")
+        except FhError as exc:
+            self.error(f"Unexpected exception: {str(exc)}")
+
+    def do_cheatsheet(self, arg):
+        """Display a cheatsheet.
+
+        Usage: cheatsheet <cheatsheet_name>, or cheatsheet -l to list the available
+        cheatsheets. As with the fh command, a unique prefix of the name can be used.
+        """
+        if arg in ("-l", "--list"):
+            click.echo("  ".join(self.setting.cheatsheets.keys()))
+            return
+        if not arg:
+            self.error("Missing cheatsheet name")
+            return
+
+        try:
+            cheatsheet = self.setting.cheatsheets.from_prefix(arg)
+        except ValueError:
+            self.error(f'Unknown cheatsheet "{arg}"')
+            return
+        except FhAmbiguousReferenceError as exc:
+            self.error(f"Problem finding cheatsheet: {str(exc)}")
+            return
+        except FhParseError as exc:
+            self.error(f"Problem parsing cheatsheet: {str(exc)}")
+            return
+
+        panes = (
+            section.lines(self.setting.pane_width) for section in cheatsheet.sections
+        )
+        display_panes(panes, self.setting.panes, self.setting.pane_width)
+
+    def complete_cheatsheet(self, text, line, begidx, endidx):
+        return self.setting.cheatsheets.completions(text)
+
+    def do_reload(self, arg):
+        """Reload the setting, e.g. to pick up newly created files."""
+        try:
+            self.setting = Setting(self.setting.compiled)
+        except FhSettingStructureError as exc:
+            self.error(f"Problem reloading the setting: {str(exc)}")
+
+    def do_exit(self, arg):
+        """Leave the shell."""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        click.echo()
+        return True
+
+
+@click.command()
+@click.pass_context
+def shell(ctx):
+    """Start an interactive session that keeps the setting loaded.
+
+    Within the session, use cd to move between locations in the world, and the
+    scene, npcs, battle and cheatsheet commands as with fh.
+    """
+    setting = get_setting(ctx)
+    session = FourhillsShell(setting, location=Path.cwd().resolve())
+    try:
+        session.cmdloop()
+    except KeyboardInterrupt:
+        click.echo()
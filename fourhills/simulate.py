@@ -0,0 +1,543 @@
+import functools
+import math
+import operator
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import click
+from fourhills.dice import DiceExpression, parse_dice, parse_stat_dice
+from fourhills.exceptions import FhError, FhParseError
+from fourhills.fourhills import get_scene
+from fourhills.scene import Scene
+from fourhills.stats import StatBlock
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional, and only needed by this module
+    np = None
+
+# An attack: its name, the bonus added to its attack roll, and its damage as a
+# DiceExpression
+Attack = namedtuple("Attack", ["name", "hit", "damage"])
+# A monster or NPC taking part in a fight: its name, AC and HP, and the attacks it
+# makes on its turn
+Combatant = namedtuple("Combatant", ["name", "ac", "hp", "attacks"])
+# A member of the party: their AC and HP, and the Attack they make on their turn,
+# or None if they don't attack
+PartyMember = namedtuple("PartyMember", ["ac", "hp", "attack"])
+
+NUMBER_WORDS = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+}
+
+_INTEGER_RE = re.compile(r"[+-]?\d+")
+_ATTACK_COUNT_RE = re.compile(
+    r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")\b", flags=re.IGNORECASE
+)
+
+# The number of bins in the histograms of the results
+HISTOGRAM_BINS = 10
+HISTOGRAM_WIDTH = 40
+
+# Starting a worker process takes about as long as simulating this many fights, so
+# each worker is given at least this many
+MIN_FIGHTS_PER_JOB = 50000
+
+
+def parse_integer(text: str, description: str) -> int:
+    """Return the first integer in some text, e.g. 15 from "15 (natural armor)".
+
+    Raises
+    ------
+    FhParseError
+        If the text doesn't contain an integer.
+    """
+    match = _INTEGER_RE.search(str(text))
+    if not match:
+        raise FhParseError(f'Could not find the {description} in "{text}".')
+    return int(match[0])
+
+
+def parse_damage(text: str) -> DiceExpression:
+    """Parse the damage of an attack, such as "4 (1d4+2) piercing plus 3 fire damage".
+
+    Each part of the damage uses the dice in brackets if there are any, or the flat
+    number otherwise, and the parts are added together.
+
+    Raises
+    ------
+    FhParseError
+        If a part of the damage has neither dice nor a number.
+    """
+    parts = [parse_stat_dice(part) for part in str(text).split(" plus ")]
+    return functools.reduce(operator.add, parts)
+
+
+def attacks_per_turn(multiattack: Optional[str]) -> int:
+    """Return the number of attacks a multiattack description allows, or 1."""
+    if not multiattack:
+        return 1
+    match = _ATTACK_COUNT_RE.search(multiattack)
+    if not match:
+        return 1
+    count = match[1].lower()
+    return int(count) if count.isdigit() else NUMBER_WORDS[count]
+
+
+def parse_attacks(stats: StatBlock) -> List[Attack]:
+    """Parse the melee and ranged attacks of a stat block.
+
+    Raises
+    ------
+    FhParseError
+        If the hit bonus or damage of an attack can't be parsed.
+    """
+    attacks = []
+    for attack_dict in (stats.melee_attacks, stats.ranged_attacks):
+        for name, details in (attack_dict or {}).items():
+            try:
+                attacks.append(
+                    Attack(
+                        name,
+                        parse_integer(details["hit"], "hit bonus"),
+                        parse_damage(details["damage"]),
+                    )
+                )
+            except (FhParseError, KeyError, TypeError) as exc:
+                raise FhParseError(
+                    f'Could not parse attack "{name}" of {stats.name}: {str(exc)}'
+                ) from exc
+    return attacks
+
+
+def combatant(stats: StatBlock) -> Combatant:
+    """Return a monster's AC and HP, and the attacks it makes on each of its turns.
+
+    The monster has its average HP (the number before the dice), and uses its attack
+    with the highest average damage, as many times as its multiattack allows.
+
+    Raises
+    ------
+    FhParseError
+        If the AC or HP, or an attack, can't be parsed.
+    """
+    ac = parse_integer(stats.ac, f"AC of {stats.name}")
+    hp = parse_integer(stats.hp, f"HP of {stats.name}")
+    attacks = parse_attacks(stats)
+    if not attacks:
+        return Combatant(stats.name, ac, hp, [])
+    best_attack = max(attacks, key=lambda attack: attack.damage.expected_value)
+    return Combatant(
+        stats.name, ac, hp, [best_attack] * attacks_per_turn(stats.multiattack)
+    )
+
+
+def scene_combatants(scene: Scene) -> List[Combatant]:
+    """Return the monsters and NPCs with stats at a scene, one per creature.
+
+    Raises
+    ------
+    KeyError
+        If a monster or NPC doesn't exist.
+    FhParseError
+        If a stat block can't be loaded or an attack can't be parsed.
+    """
+    combatants = []
+    for name, quantity in scene.monster_names_quantities:
+        combatants.extend([combatant(scene.setting.monsters[name])] * quantity)
+    for name in scene.npc_names:
+        stats = scene.setting.npcs[name].stats
+        if stats:
+            combatants.append(combatant(stats))
+    return combatants
+
+
+def _make_attack(
+    rng,
+    attack: Attack,
+    critical_damage: DiceExpression,
+    attacking,
+    hp,
+    ac,
+    target,
+    round_number: int,
+    down_round,
+):
+    """Make an attack in every fight at once, against the first target standing.
+
+    The attack hits on a natural 20, or if the roll plus its hit bonus is at least
+    the target's AC, and never hits on a natural 1. A target is down when their HP
+    reaches 0, and the next target is attacked from then on. `hp`, `target` and
+    `down_round` are updated in place.
+
+    Parameters
+    ----------
+    rng: numpy.random.Generator
+        The random number generator.
+    attack: Attack
+        The attack to make.
+    critical_damage: DiceExpression
+        The damage of the attack when it is a critical hit.
+    attacking: numpy.ndarray of bool
+        Whether the attack is made in each fight. The dice are rolled in every
+        fight regardless, which is quicker than selecting the fights.
+    hp: numpy.ndarray of int
+        The HP of each target in each fight.
+    ac: numpy.ndarray of int
+        The AC of each target.
+    target: numpy.ndarray of int
+        The target being attacked in each fight, or the number of targets once all
+        are down.
+    round_number: int
+        The current round.
+    down_round: numpy.ndarray of int
+        The round each target went down in each fight (0 if they haven't).
+
+    Returns
+    -------
+    numpy.ndarray of int
+        The damage done in each fight.
+    """
+    fights, target_count = hp.shape
+    current_target = np.minimum(target, target_count - 1)
+    roll = rng.integers(1, 21, fights)
+    critical = roll == 20
+    hit = (
+        attacking
+        & (target < target_count)
+        & (critical | ((roll != 1) & (roll + attack.hit >= ac[current_target])))
+    )
+    damage = np.where(
+        critical, critical_damage.roll(fights, rng), attack.damage.roll(fights, rng)
+    )
+    damage = np.where(hit, np.maximum(damage, 0), 0)
+    fight_indices = np.flatnonzero(hit)
+    hp[fight_indices, current_target[fight_indices]] -= damage[fight_indices]
+    fight_indices = fight_indices[hp[fight_indices, current_target[fight_indices]] <= 0]
+    down_round[fight_indices, current_target[fight_indices]] = round_number
+    target[fight_indices] += 1
+    return damage
+
+
+def simulate_fights(
+    combatants: List[Combatant],
+    party: List[PartyMember],
+    fights: int,
+    max_rounds: int,
+    seed,
+):
+    """Simulate many fights at once, with every roll vectorised across the fights.
+
+    In each round, each monster and NPC still standing makes its attacks in order,
+    and then each party member still standing makes theirs. Each side attacks the
+    first member of the other side that is still standing (see `_make_attack`). A
+    fight ends when either side is down.
+
+    Parameters
+    ----------
+    combatants: list of Combatant
+        The monsters and NPCs.
+    party: list of PartyMember
+        The party.
+    fights: int
+        The number of fights to simulate.
+    max_rounds: int
+        The number of rounds after which a fight is abandoned.
+    seed: int, numpy.random.SeedSequence or None
+        The seed for the random number generator.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The round each fight's party was defeated in (0 if it wasn't); the round
+        each party member went down in each fight (0 if they didn't); the round
+        each fight's monsters were defeated in (0 if they weren't); and the damage
+        done to the party in each round of all of the fights.
+    """
+    rng = np.random.default_rng(seed)
+    # Each attack made in a round, with the index of whoever makes it, and its
+    # damage when it is a critical hit, with double the dice
+    monster_attacks = [
+        (index, attack, attack.damage.critical())
+        for index, creature in enumerate(combatants)
+        for attack in creature.attacks
+    ]
+    party_attacks = [
+        (index, member.attack, member.attack.damage.critical())
+        for index, member in enumerate(party)
+        if member.attack
+    ]
+    party_size = len(party)
+    monster_count = len(combatants)
+    party_ac = np.array([member.ac for member in party])
+    monster_ac = np.array([creature.ac for creature in combatants])
+    party_hp = np.tile(np.array([member.hp for member in party]), (fights, 1))
+    monster_hp = np.tile(
+        np.array([creature.hp for creature in combatants]), (fights, 1)
+    )
+    # The member of each side being attacked in each fight, or the side's size once
+    # all are down
+    party_target = np.zeros(fights, dtype=np.intp)
+    monster_target = np.zeros(fights, dtype=np.intp)
+    party_down_round = np.zeros((fights, party_size), dtype=np.int64)
+    monster_down_round = np.zeros((fights, monster_count), dtype=np.int64)
+    party_defeated_round = np.zeros(fights, dtype=np.int64)
+    monsters_defeated_round = np.zeros(fights, dtype=np.int64)
+    round_damage = []
+    for round_number in range(1, max_rounds + 1):
+        ongoing = (party_target < party_size) & (monster_target < monster_count)
+        if not ongoing.any():
+            break
+        damage_this_round = np.zeros(fights, dtype=np.int64)
+        for index, attack, critical_damage in monster_attacks:
+            damage_this_round += _make_attack(
+                rng,
+                attack,
+                critical_damage,
+                ongoing & (monster_hp[:, index] > 0),
+                party_hp,
+                party_ac,
+                party_target,
+                round_number,
+                party_down_round,
+            )
+        for index, attack, critical_damage in party_attacks:
+            _make_attack(
+                rng,
+                attack,
+                critical_damage,
+                ongoing & (party_hp[:, index] > 0),
+                monster_hp,
+                monster_ac,
+                monster_target,
+                round_number,
+                monster_down_round,
+            )
+        round_damage.append(damage_this_round[ongoing])
+        party_defeated_round[ongoing & (party_target >= party_size)] = round_number
+        monsters_defeated_round[ongoing & (monster_target >= monster_count)] = (
+            round_number
+        )
+    return (
+        party_defeated_round,
+        party_down_round,
+        monsters_defeated_round,
+        np.concatenate(round_damage),
+    )
+
+
+def simulate(
+    combatants: List[Combatant],
+    party: List[PartyMember],
+    fights: int,
+    max_rounds: int = 100,
+    jobs: Optional[int] = None,
+    seed: Optional[int] = None,
+):
+    """Simulate fights, spread across a pool of processes if there are enough.
+
+    Takes the same parameters and returns the same results as `simulate_fights`,
+    except that the fights are split between up to `jobs` processes (one per CPU
+    if None), each with its own independent random number generator. Each process
+    simulates at least `MIN_FIGHTS_PER_JOB` fights, so few fights are simulated in
+    this process, rather than waiting for workers to start.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, fights // MIN_FIGHTS_PER_JOB))
+    seeds = np.random.SeedSequence(seed).spawn(jobs)
+    if jobs == 1:
+        return simulate_fights(combatants, party, fights, max_rounds, seeds[0])
+    batch_sizes = [
+        fights // jobs + (1 if index < fights % jobs else 0) for index in range(jobs)
+    ]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(
+            executor.map(
+                simulate_fights,
+                [combatants] * jobs,
+                [party] * jobs,
+                batch_sizes,
+                [max_rounds] * jobs,
+                seeds,
+            )
+        )
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def histogram_lines(values, unit: str) -> List[str]:
+    """Return the lines of a text histogram of integer values."""
+    if len(values) == 0:
+        return []
+    low, high = int(values.min()), int(values.max())
+    bin_width = max(1, math.ceil((high - low + 1) / HISTOGRAM_BINS))
+    counts = np.bincount((values - low) // bin_width)
+    lines = []
+    for index, count in enumerate(counts):
+        start = low + index * bin_width
+        label = f"{start}" if bin_width == 1 else f"{start}-{start + bin_width - 1}"
+        fraction = count / len(values)
+        bar = "#" * round(fraction * HISTOGRAM_WIDTH)
+        lines.append(f"  {label + ' ' + unit:>16} {fraction:>7.1%} {bar}")
+    return lines
+
+
+def _defeat_lines(defeated_round, description: str) -> List[str]:
+    """Return the lines of a report of the rounds one side was defeated in."""
+    defeated = defeated_round[defeated_round > 0]
+    if not len(defeated):
+        return []
+    lines = [
+        f"Rounds to defeat {description}: mean {defeated.mean():.2f}, "
+        f"median {np.median(defeated):g}, in {len(defeated) / len(defeated_round):.1%} "
+        "of fights"
+    ]
+    lines.extend(histogram_lines(defeated, "rounds"))
+    return lines
+
+
+def report_lines(
+    fights: int,
+    party: List[PartyMember],
+    max_rounds: int,
+    results,
+) -> List[str]:
+    """Return the lines of a report of the results of `simulate`."""
+    party_defeated_round, down_round, monsters_defeated_round, round_damage = results
+    lines = [
+        f"Damage per round: mean {round_damage.mean():.1f}, "
+        f"standard deviation {round_damage.std():.1f}"
+    ]
+    lines.extend(histogram_lines(round_damage, "damage"))
+
+    lines.append("")
+    lines.extend(_defeat_lines(party_defeated_round, "the party"))
+    lines.extend(_defeat_lines(monsters_defeated_round, "the monsters"))
+    unfinished = np.count_nonzero(
+        (party_defeated_round == 0) & (monsters_defeated_round == 0)
+    )
+    if unfinished:
+        lines.append(
+            f"Both sides were still standing after {max_rounds} rounds in "
+            f"{unfinished / fights:.1%} of fights."
+        )
+
+    lines.append("")
+    lines.append("Rounds until each party member is down:")
+    for index, member in enumerate(party):
+        member_down = down_round[:, index]
+        member_down = member_down[member_down > 0]
+        mean = f"mean {member_down.mean():.2f}" if len(member_down) else "never down"
+        lines.append(
+            f"  Member {index + 1} (AC {member.ac}, HP {member.hp}): {mean}, "
+            f"down in {len(member_down) / fights:.1%} of fights"
+        )
+    return lines
+
+
+def parse_member(ctx, param, value):
+    party = []
+    for member in value:
+        match = re.match(
+            r"^\s*(\d+)\s*:\s*(\d+)\s*(?::\s*([+-]?\d+)\s*:([^:]+))?$", member
+        )
+        if not match or int(match[2]) < 1:
+            raise click.BadParameter(
+                f'"{member}" should be the AC and HP of a party member, and '
+                "optionally their attack's hit bonus and damage, e.g. 15:30 or "
+                "15:30:+5:1d8+3."
+            )
+        attack = None
+        if match[3] is not None:
+            try:
+                damage = parse_dice(match[4])
+            except FhParseError as exc:
+                raise click.BadParameter(str(exc))
+            attack = Attack(f"member {len(party) + 1}", int(match[3]), damage)
+        party.append(PartyMember(int(match[1]), int(match[2]), attack))
+    return party
+
+
+@click.command("simulate")
+@click.option(
+    "-m",
+    "--member",
+    "party",
+    multiple=True,
+    required=True,
+    callback=parse_member,
+    metavar="AC:HP[:HIT:DAMAGE]",
+    help="The AC and HP of a party member, and optionally the hit bonus and damage "
+    "of the attack they make each turn, e.g. 15:30 or 15:30:+5:1d8+3. Repeat for "
+    "each member.",
+)
+@click.option(
+    "-n",
+    "--fights",
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help="Number of fights to simulate.",
+)
+@click.option(
+    "--max-rounds",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Number of rounds after which a fight is abandoned.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Maximum number of processes to simulate with. Defaults to the number of "
+    "CPUs. Small simulations use one.",
+)
+@click.option("--seed", type=int, help="Seed for the random numbers.")
+@click.pass_context
+def simulate_command(ctx, party, fights, max_rounds, jobs, seed):
+    """Simulate the monsters at the current location fighting the party.
+
+    The party is given as the AC and HP of each member, who are attacked in order.
+    Each monster and NPC with stats uses its most damaging attack, as many times as
+    its multiattack allows. Party members given an attack fight back, attacking the
+    monsters and NPCs in order, which have the AC and average HP of their stat
+    blocks. Reports the damage done per round, and how many rounds it takes to
+    defeat the party or the monsters. Requires NumPy.
+    """
+    if np is None:
+        ctx.fail(
+            "Simulating fights requires NumPy. Install it with "
+            '"pip install fourhills[simulate]".'
+        )
+    scene = get_scene(ctx)
+    try:
+        combatants = scene_combatants(scene)
+    except KeyError as exc:
+        ctx.fail(f"Unknown monster or NPC {str(exc)}")
+    except FhError as exc:
+        ctx.fail(f"Problem loading stats: {str(exc)}")
+
+    attacks = [attack for creature in combatants for attack in creature.attacks]
+    if not attacks:
+        ctx.fail("There are no monsters or NPCs with attacks at this location")
+    for name in sorted(
+        {creature.name for creature in combatants if not creature.attacks}
+    ):
+        click.echo(f"Warning: {name} has no attacks", err=True)
+
+    click.echo(
+        f"Simulating {fights} fights of {len(combatants)} creatures "
+        f"({len(attacks)} attacks per round) against {len(party)} party members."
+    )
+    click.echo()
+    results = simulate(combatants, party, fights, max_rounds, jobs, seed)
+    click.echo("\n".join(report_lines(fights, party, max_rounds, results)))
@@ -0,0 +1,333 @@
+import errno
+import os
+import pickle
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import click
+from fourhills.cache import ParseCache, file_signature
+from fourhills.exceptions import FhError, FhSettingStructureError
+from fourhills.setting import DirectoryDict, Setting
+from fourhills.trace import phase
+
+SCHEMA = """
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE UNIQUE INDEX files_directory_name ON files (directory, name);
+"""
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string starting with a prefix.
+
+    Returns None if there is no such string, i.e. every string is greater than or
+    equal to the prefix.
+    """
+    upper = prefix.rstrip(chr(0x10FFFF))
+    if not upper:
+        return None
+    return upper[:-1] + chr(ord(upper[-1]) + 1)
+
+
+class SqliteStore(ParseCache):
+    """A setting's files, parsed and compiled into a single SQLite database.
+
+    The database holds the parsed contents of every monster, NPC, cheatsheet and
+    scene file, keyed by the file's path relative to the setting root, and indexed
+    by directory and name. The contents are pickled, as `ParseCache` does, so they
+    read back exactly as they were parsed. It stands in for the setting's
+    `ParseCache`: `load` returns a file's contents from the database, without reading
+    the file (which need not exist). Indexes are still stored in the cache directory.
+
+    The database is created by `compile_setting`, and isn't changed while it's in
+    use, so it must be compiled again for changes to the files to be seen.
+    """
+
+    FILENAME = "fh_setting.sqlite"
+    # Increment this whenever the format of the database changes
+    VERSION = 2
+
+    def __init__(self, root: Path, database_path: Path, enabled: bool = True):
+        """Initialise the object, opening the database.
+
+        Parameters
+        ----------
+        root: Path
+            The root directory of the setting.
+        database_path: Path
+            The compiled database.
+        enabled: bool
+            Whether to use the cache directory for indexes.
+
+        Raises
+        ------
+        FhSettingStructureError
+            If the database doesn't exist or was compiled by another version.
+        """
+        super().__init__(root, enabled)
+        self.database_path = database_path
+        if not database_path.is_file():
+            raise FhSettingStructureError(
+                f"{database_path} doesn't exist. Create it with fh compile."
+            )
+        try:
+            self._connection = sqlite3.connect(
+                f"{database_path.resolve().as_uri()}?mode=ro", uri=True
+            )
+            version = self._connection.execute(
+                "SELECT value FROM metadata WHERE key = 'version'"
+            ).fetchone()
+        except sqlite3.Error as exc:
+            raise FhSettingStructureError(f"Can't read {database_path}: {str(exc)}")
+        self._signature = file_signature(database_path)
+        if version is None or version[0] != str(self.VERSION):
+            raise FhSettingStructureError(
+                f"{database_path} was compiled by a different version of Fourhills. "
+                "Compile it again with fh compile."
+            )
+
+    def load(self, filepath: Union[str, Path], parser: Callable[[Path], Any]) -> Any:
+        """Return the parsed contents of a file from the database.
+
+        Parameters
+        ----------
+        filepath: str or Path
+            Path to the file.
+        parser: Callable
+            Ignored, as every file is parsed when the database is compiled.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file isn't in the database.
+        """
+        filepath = Path(os.path.abspath(filepath))
+        with phase("read compiled setting"):
+            row = self._connection.execute(
+                "SELECT data FROM files WHERE path = ?", (self._key(filepath),)
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(
+                errno.ENOENT, "Not in the compiled setting", str(filepath)
+            )
+        return pickle.loads(row[0])
+
+    def signature(self, filepath: Union[str, Path]) -> Tuple[int, int]:
+        """Return a signature that changes when the database does.
+
+        The file needn't exist, as its contents are read from the database.
+        """
+        return self._signature
+
+    def files(self, directory: Path) -> Dict[str, Path]:
+        """Return the name and path of every file in a directory."""
+        rows = self._connection.execute(
+            "SELECT name, path FROM files WHERE directory = ? ORDER BY name",
+            (self._key(directory),),
+        )
+        return {name: self.root / path for name, path in rows}
+
+    def find(self, directory: Path, name: str) -> List[Path]:
+        """Return the path of every file with a name (excluding extension) in a tree.
+
+        The files are those in the directory and every directory within it, in no
+        particular order.
+        """
+        key = self._key(directory)
+        query = "SELECT path FROM files WHERE name = ? AND (directory = ?"
+        parameters = [name, key]
+        # The directories within it are those whose keys start with the key and "/"
+        prefix = f"{key}/"
+        query += " OR directory >= ?"
+        parameters.append(prefix)
+        upper = _prefix_upper_bound(prefix)
+        if upper is not None:
+            query += " AND directory < ?"
+            parameters.append(upper)
+        rows = self._connection.execute(query + ")", parameters)
+        return [self.root / path for (path,) in rows]
+
+    def contains(self, directory: Path, name: str) -> bool:
+        """Return whether a directory has a file with a name (excluding extension)."""
+        row = self._connection.execute(
+            "SELECT 1 FROM files WHERE directory = ? AND name = ?",
+            (self._key(directory), name),
+        ).fetchone()
+        return row is not None
+
+    def completions(self, directory: Path, prefix: str) -> List[str]:
+        """Return the names of the files in a directory that start with a prefix."""
+        upper = _prefix_upper_bound(prefix)
+        query = "SELECT name FROM files WHERE directory = ? AND name >= ?"
+        parameters = [self._key(directory), prefix]
+        if upper is not None:
+            query += " AND name < ?"
+            parameters.append(upper)
+        rows = self._connection.execute(query + " ORDER BY name", parameters)
+        return [name for (name,) in rows]
+
+
+class SqliteDict(DirectoryDict):
+    """A DirectoryDict whose items are read from a compiled setting.
+
+    Checking whether an item exists, loading it and completing a prefix of its name
+    are each indexed queries, so the directory is only listed if all of the names
+    are needed. Items kept in memory are always reused, as the database doesn't
+    change while it's in use.
+    """
+
+    def __init__(
+        self,
+        store: SqliteStore,
+        directory: Path,
+        extension: str,
+        item_factory: Callable[[Path], Any],
+        cache_size: Optional[int] = None,
+        item_dependencies: Optional[Callable[[Path], List[Path]]] = None,
+    ):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        store: SqliteStore
+            The compiled setting. The item factory must load items using it.
+
+        The other parameters are as for DirectoryDict.
+        """
+        self._store = store
+        super().__init__(
+            directory, extension, item_factory, cache_size, item_dependencies
+        )
+
+    def _find_files(self):
+        with phase(f"list {self.directory.name}"):
+            return self._store.files(self.directory)
+
+    def _item_version(self, filepath: Path):
+        return None
+
+    def __contains__(self, key):
+        if self._names_paths is not None:
+            return key in self._names_paths
+        return self._store.contains(self.directory, key)
+
+    def path(self, key: str) -> Path:
+        if key not in self:
+            raise KeyError(key)
+        return self.directory / f"{key}.{self.extension}"
+
+    def completions(self, prefix: str) -> List[str]:
+        return self._store.completions(self.directory, prefix)
+
+
+def _setting_files(setting: Setting) -> List[Tuple[Path, Callable[[Path], Any]]]:
+    """Return the path of every file to compile, and the function that parses it."""
+    from fourhills.cheatsheet import parse_cheatsheet
+    from fourhills.npc import parse_npc
+    from fourhills.scene import parse_scene
+    from fourhills.stats import parse_stats
+
+    files = []
+    for items, parser in [
+        (setting.monsters, parse_stats),
+        (setting.npcs, parse_npc),
+        (setting.cheatsheets, parse_cheatsheet),
+    ]:
+        files.extend((items.path(name), parser) for name in sorted(items))
+    files.extend((scene_path, parse_scene) for scene_path in setting.scene_paths())
+    return files
+
+
+def compile_setting(setting: Setting, database_path: Path) -> Tuple[int, List[str]]:
+    """Compile the files of a setting into a database that SqliteStore can read.
+
+    The database is written to a temporary file that then replaces any existing
+    database, so commands using it are never left with a partial one.
+
+    Parameters
+    ----------
+    setting: Setting
+        The setting to compile, which must read its files rather than a database.
+    database_path: Path
+        Where to write the database.
+
+    Returns
+    -------
+    tuple of int and list of str
+        The number of files compiled, and a description of each file that couldn't
+        be parsed. These files are left out of the database.
+    """
+    errors = []
+    count = 0
+    fd, temp_path = tempfile.mkstemp(dir=database_path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(SCHEMA)
+            connection.execute(
+                "INSERT INTO metadata VALUES ('version', ?)",
+                (str(SqliteStore.VERSION),),
+            )
+            for filepath, parser in _setting_files(setting):
+                relative_path = filepath.relative_to(setting.root)
+                try:
+                    data = pickle.dumps(
+                        setting.cache.load(filepath, parser),
+                        protocol=pickle.HIGHEST_PROTOCOL,
+                    )
+                except (
+                    FhError,
+                    OSError,
+                    TypeError,
+                    ValueError,
+                    pickle.PicklingError,
+                ) as exc:
+                    errors.append(f"{relative_path}: {str(exc)}")
+                    continue
+                connection.execute(
+                    "INSERT INTO files VALUES (?, ?, ?, ?)",
+                    (
+                        relative_path.as_posix(),
+                        relative_path.parent.as_posix(),
+                        filepath.stem,
+                        data,
+                    ),
+                )
+                count += 1
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, database_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return count, errors
+
+
+@click.command("compile")
+@click.pass_context
+def compile_command(ctx):
+    """Compile the setting into a single database file.
+
+    Parses every monster, NPC, cheatsheet and scene file into fh_setting.sqlite in
+    the setting's root directory. Other commands read the setting from it instead
+    of the files when run with --compiled. Compile again after changing the files.
+    """
+    from fourhills.fourhills import get_setting
+
+    setting = get_setting(ctx, compiled=False)
+    database_path = setting.root / SqliteStore.FILENAME
+    try:
+        count, errors = compile_setting(setting, database_path)
+    except (OSError, sqlite3.Error) as exc:
+        ctx.fail(f"Problem writing {database_path}: {str(exc)}")
+    for error in errors:
+        click.echo(f"Warning: skipped {error}", err=True)
+    click.echo(f"Compiled {count} files into {database_path}")
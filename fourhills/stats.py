@@ -1,7 +1,5 @@
 import math
-import yaml
 from pathlib import Path
-from dataclasses import dataclass
 from typing import Optional, Dict, List
 from fourhills.text_utils import (
     format_indented_paragraph,
@@ -10,9 +8,51 @@ from fourhills.text_utils import (
     title,
 )
 from fourhills.exceptions import FhParseError, FhConfigError
-
-
-@dataclass
+from fourhills.cache import ParseCache
+from fourhills.dataclass_utils import intern_strings, slotted_dataclass
+from fourhills.loader import load_yaml
+from fourhills.render_cache import RenderSource, cached_render
+
+# The experience points of a monster, by its challenge rating
+XP_BY_CHALLENGE = {
+    0: 0,
+    0.125: 25,
+    0.25: 50,
+    0.5: 100,
+    1: 200,
+    2: 450,
+    3: 700,
+    4: 1100,
+    5: 1800,
+    6: 2300,
+    7: 2900,
+    8: 3900,
+    9: 5000,
+    10: 5900,
+    11: 7200,
+    12: 8400,
+    13: 10000,
+    14: 11500,
+    15: 13000,
+    16: 15000,
+    17: 18000,
+    18: 20000,
+    19: 22000,
+    20: 25000,
+    21: 33000,
+    22: 41000,
+    23: 50000,
+    24: 62000,
+    25: 75000,
+    26: 90000,
+    27: 105000,
+    28: 120000,
+    29: 135000,
+    30: 155000,
+}
+
+
+@slotted_dataclass(extra_slots=("render_source",))
 class StatBlock:
     """The stat block for a monster or character."""
 
@@ -47,6 +87,28 @@ class StatBlock:
     other_actions: Optional[Dict[str, str]] = None
     description: Optional[str] = None
 
+    # Fields whose strings (or list items, or dict keys) are shared between many
+    # monsters, so are interned to store each one only once
+    INTERNED_FIELDS = (
+        "size",
+        "creature_type",
+        "alignment",
+        "speed",
+        "ability",
+        "saving_throws",
+        "skills",
+        "damage_vulnerabilities",
+        "damage_resistances",
+        "damage_immunities",
+        "condition_immunities",
+        "special_senses",
+        "languages",
+    )
+
+    def __post_init__(self):
+        for field_name in self.INTERNED_FIELDS:
+            setattr(self, field_name, intern_strings(getattr(self, field_name)))
+
     def __str__(self):
         return self.summary_info(line_width=80)
 
@@ -64,44 +126,8 @@ class StatBlock:
         FhParseError
             If the challenge rating is invalid.
         """
-        xp_table = {
-            0: 0,
-            0.125: 25,
-            0.25: 50,
-            0.5: 100,
-            1: 200,
-            2: 450,
-            3: 700,
-            4: 1100,
-            5: 1800,
-            6: 2300,
-            7: 2900,
-            8: 3900,
-            9: 5000,
-            10: 5900,
-            11: 7200,
-            12: 8400,
-            13: 10000,
-            14: 11500,
-            15: 13000,
-            16: 15000,
-            17: 18000,
-            18: 20000,
-            19: 22000,
-            20: 25000,
-            21: 33000,
-            22: 41000,
-            23: 50000,
-            24: 62000,
-            25: 75000,
-            26: 90000,
-            27: 105000,
-            28: 120000,
-            29: 135000,
-            30: 155000,
-        }
         try:
-            return xp_table[self.challenge]
+            return XP_BY_CHALLENGE[self.challenge]
         except KeyError:
             raise FhParseError(
                 f'StatBlock "{self.name}" has invalid challenge rating '
@@ -125,6 +151,7 @@ class StatBlock:
         """
         return math.floor((ability_score - 10) / 2)
 
+    @cached_render
     def summary_info(
         self, line_width: int = 80, quantity: Optional[int] = None
     ) -> List[str]:
@@ -152,6 +179,7 @@ class StatBlock:
 
         return lines
 
+    @cached_render
     def battle_info(self, line_width: int = 80) -> List[str]:
         """Return the battle info for the stat block as a list of lines.
 
@@ -321,25 +349,31 @@ class StatBlock:
         return lines
 
     @classmethod
-    def from_file(cls, filepath: Path):
+    def from_file(cls, filepath: Path, cache: Optional[ParseCache] = None):
         """Create a StatBlock from a YAML file.
 
         Parameters
         ----------
         filename: Path
             Path to the YAML file
+        cache: ParseCache or None
+            If given, the cache is used to avoid re-parsing the YAML file.
 
         Raises
         ------
         FhParseError
             If there is an error parsing the file.
         """
-        with open(filepath) as f:
-            try:
-                stat_dict = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                raise FhParseError(
-                    f'Error parsing YAML for stat block "{filepath.stem}": {str(exc)}'
-                )
+        stat_dict = (
+            cache.load(filepath, parse_stats) if cache else parse_stats(filepath)
+        )
+
+        stat_block = cls(**stat_dict)
+        if cache:
+            stat_block.render_source = RenderSource(*cache.source(filepath), "")
+        return stat_block
+
 
-            return cls(**stat_dict)
+def parse_stats(filepath: Path) -> dict:
+    """Parse a stat block YAML file into a dict."""
+    return load_yaml(filepath, f'for stat block "{filepath.stem}"')
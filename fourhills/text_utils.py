@@ -1,6 +1,74 @@
+import functools
+import re
 import textwrap
-import click
-from typing import List
+from typing import Iterable, Iterator, List
+from fourhills.trace import phase
+
+# The indent of each line after the first of a wrapped paragraph
+SUBSEQUENT_INDENT = "    "
+
+_SPACES_RE = re.compile("( +)")
+
+
+@functools.lru_cache(maxsize=None)
+def _text_wrapper(line_width: int) -> textwrap.TextWrapper:
+    """Return the TextWrapper for a line width, creating it the first time.
+
+    Creating a TextWrapper is relatively slow, and they keep no state between calls
+    to `wrap`, so one is shared for each width.
+    """
+    return textwrap.TextWrapper(
+        width=line_width, tabsize=4, subsequent_indent=SUBSEQUENT_INDENT
+    )
+
+
+def _wrap(text: str, line_width: int) -> List[str]:
+    """Wrap text exactly as `textwrap.wrap` would, but faster for most text.
+
+    `textwrap.wrap` splits text into chunks with a regular expression that handles
+    tabs, hyphens and other whitespace, which is slow. Most lines have none of
+    those, so they are handled here instead:
+
+    - A printable line's only whitespace is plain spaces, so if it fits, it is
+      returned unchanged, as long as it doesn't end with a space (which would be
+      dropped).
+    - A printable line without hyphens is split into words and runs of spaces, and
+      wrapped in the same way as `textwrap.TextWrapper._wrap_chunks`, as long as no
+      word is too long to fit on a line (which textwrap would break up).
+
+    Anything else is wrapped by a TextWrapper.
+    """
+    if not text.isprintable():
+        return _text_wrapper(line_width).wrap(text)
+    if text and len(text) <= line_width and text[-1] != " ":
+        return [text]
+    if "-" in text:
+        return _text_wrapper(line_width).wrap(text)
+    chunks = [chunk for chunk in _SPACES_RE.split(text) if chunk]
+    if max(map(len, chunks), default=0) > line_width - len(SUBSEQUENT_INDENT):
+        return _text_wrapper(line_width).wrap(text)
+
+    lines = []
+    index = 0
+    while index < len(chunks):
+        if lines:
+            indent = SUBSEQUENT_INDENT
+            # Spaces at the start of a line (other than the first) are dropped
+            if chunks[index][0] == " ":
+                index += 1
+        else:
+            indent = ""
+        width = line_width - len(indent)
+        start = index
+        length = 0
+        while index < len(chunks) and length + len(chunks[index]) <= width:
+            length += len(chunks[index])
+            index += 1
+        # Spaces at the end of a line are dropped
+        end = index - 1 if index > start and chunks[index - 1][0] == " " else index
+        if end > start:
+            lines.append(indent + "".join(chunks[start:end]))
+    return lines
 
 
 def format_indented_paragraph(text: str, line_width: int) -> list:
@@ -18,7 +86,8 @@ def format_indented_paragraph(text: str, line_width: int) -> list:
     list of str
         The wrapped lines of text.
     """
-    return textwrap.wrap(text, width=line_width, tabsize=4, subsequent_indent="    ")
+    with phase("wrap text"):
+        return _wrap(text, line_width)
 
 
 def wrap_lines_paragraph(lines: List[str], line_width: int) -> List[str]:
@@ -37,10 +106,9 @@ def wrap_lines_paragraph(lines: List[str], line_width: int) -> List[str]:
         The wrapped lines of text.
     """
     output_lines = list()
-    for line in lines:
-        output_lines.extend(
-            textwrap.wrap(line, width=line_width, tabsize=4, subsequent_indent="    ")
-        )
+    with phase("wrap text"):
+        for line in lines:
+            output_lines.extend(_wrap(line, line_width))
 
     return output_lines
 
@@ -80,20 +148,23 @@ def title(text: str, line_width: int) -> list:
     return [centre_pad(text, line_width), "=" * line_width]
 
 
-def display_panes(
-    panes: List[List[str]],
+def screen_lines(
+    panes: Iterable[List[str]],
     columns: int,
     column_width: int,
     pane_gap: bool = True,
     column_gap: bool = True,
-):
-    """Display a set of panes in columns on the screen via click.
+) -> Iterator[str]:
+    """Lay out a set of panes in columns, producing whole-screen lines lazily.
+
+    Panes are taken from `panes` only when the layout reaches them, so if `panes` is
+    a generator, the first lines are produced as soon as the first panes are ready.
 
     Parameters
     ----------
-    panes : list of list of str
-        Each pane is represented by a list of lines (strings). This is a list of the
-        data for each pane to be displayed.
+    panes : iterable of list of str
+        Each pane is represented by a list of lines (strings). This is an iterable of
+        the data for each pane to be displayed.
     columns : int
         How many columns to display.
     column_width : int
@@ -102,17 +173,44 @@ def display_panes(
         Whether to include a blank line between panes in a column. Defaults to True.
     column_gap : bool
         Whether to include a blank vertical line between columns. Defaults to True.
+
+    Yields
+    ------
+    str
+        Each line of the whole-screen display.
     """
+    panes_iterator = iter(panes)
+    # The panes taken from the iterator so far. Panes are placed in the columns in
+    # turn, so a column can need a pane before the panes for the other columns have
+    # been displayed; those are kept here until they are needed.
+    produced_panes = []
+
+    # Return the pane at the given index, or None if there are no more panes
+    def get_pane(pane_index):
+        while len(produced_panes) <= pane_index:
+            try:
+                produced_panes.append(next(panes_iterator))
+            except StopIteration:
+                return None
+        pane = produced_panes[pane_index]
+        # Each pane is only displayed once, so it doesn't need to be kept
+        produced_panes[pane_index] = None
+        return pane
 
     # This returns a generator that will produce all of the lines for a particular
     # column on the screen until there are no more, followed by a blank line (if
     # pane_gap is True); after that, it will produce None forever.
     def line_for_column(column_index):
-        for pane_index in range(column_index, len(panes), columns):
-            yield from panes[pane_index]
+        pane_index = column_index
+        while True:
+            pane = get_pane(pane_index)
+            if pane is None:
+                break
+            yield from pane
             # If there's a gap between panes in a column, produce a blank line
             if pane_gap:
                 yield " " * column_width
+            pane_index += columns
         while True:
             yield None
 
@@ -137,8 +235,6 @@ def display_panes(
     # List of generators for each of the columns
     column_generators = [line_for_column(column) for column in range(columns)]
 
-    # List of whole-screen lines
-    screen_lines = []
     # Keep going until all of the columns are done
     while True:
         # Create a list of the strings from each pane that will make up this line
@@ -146,8 +242,52 @@ def display_panes(
         # If all of the generators have run out of lines, stop
         if all(part is None for part in line_parts):
             break
-        # Join the parts of the line to make a whole-screen line and append
-        screen_lines.append(format_screen_line(line_parts))
+        # Join the parts of the line to make a whole-screen line
+        yield format_screen_line(line_parts)
+
 
-    # Display the result
-    click.echo_via_pager("\n".join(screen_lines))
+def display_panes(
+    panes: Iterable[List[str]],
+    columns: int,
+    column_width: int,
+    pane_gap: bool = True,
+    column_gap: bool = True,
+    pager: bool = True,
+):
+    """Display a set of panes in columns on the screen via click.
+
+    Lines are streamed to the pager as they are laid out, so if `panes` is a
+    generator, the first screen is displayed while later panes are still being
+    produced.
+
+    Parameters
+    ----------
+    panes : iterable of list of str
+        Each pane is represented by a list of lines (strings). This is an iterable of
+        the data for each pane to be displayed.
+    columns : int
+        How many columns to display.
+    column_width : int
+        The width of each column, in characters.
+    pane_gap: bool
+        Whether to include a blank line between panes in a column. Defaults to True.
+    column_gap : bool
+        Whether to include a blank vertical line between columns. Defaults to True.
+    pager : bool
+        Whether to display the lines via a pager, or just print them (e.g. when the
+        display is redrawn whenever files change). Defaults to True.
+    """
+    import click
+
+    lines = screen_lines(panes, columns, column_width, pane_gap, column_gap)
+    if not pager:
+        for line in lines:
+            click.echo(line)
+        return
+    # The pager adds a final newline after the last line. Panes are produced as the
+    # pager reads the lines, so the time spent producing them is included in the
+    # time for this phase.
+    with phase("pager"):
+        click.echo_via_pager(
+            line if index == 0 else "\n" + line for index, line in enumerate(lines)
+        )
@@ -0,0 +1,163 @@
+import sys
+import time
+from typing import Dict, Iterator, Optional, TextIO
+
+# If this environment variable is set to a true value (e.g. 1), commands are traced
+# as if the --profile option had been given
+TRACE_ENV_VAR = "FH_TRACE"
+
+
+class Phase:
+    """A phase of a command, with the total time spent in it and its sub-phases.
+
+    Each time a phase with the same name is entered within the same parent phase,
+    its time is added to the same Phase object, so e.g. parsing many files is shown
+    as a single phase with a count of the number of calls.
+    """
+
+    def __init__(self, name: str, parent: Optional["Phase"] = None):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        name: str
+            The name of the phase.
+        parent: Phase or None
+            The phase this phase happens within, or None for the whole command.
+        """
+        self.name = name
+        self.parent = parent
+        self.calls = 0
+        self.elapsed = 0.0
+        self.children: Dict[str, Phase] = {}
+
+    def child(self, name: str) -> "Phase":
+        """Return the sub-phase with a name, creating it if necessary."""
+        phase = self.children.get(name)
+        if phase is None:
+            phase = self.children[name] = Phase(name, self)
+        return phase
+
+    @property
+    def self_time(self) -> float:
+        """The time spent in this phase but not in any of its sub-phases."""
+        return self.elapsed - sum(child.elapsed for child in self.children.values())
+
+    def report_lines(self, depth: int = 0) -> Iterator[str]:
+        """Produce lines of a table of the times of this phase and its sub-phases.
+
+        Sub-phases are indented beneath their parent, slowest first.
+        """
+        if depth == 0:
+            yield f"{'Phase':<44} {'Calls':>7} {'Total ms':>10} {'Self ms':>10}"
+        name = "  " * depth + self.name
+        yield (
+            f"{name:<44} {self.calls:>7} {self.elapsed * 1000:>10.1f} "
+            f"{self.self_time * 1000:>10.1f}"
+        )
+        for child in sorted(
+            self.children.values(), key=lambda phase: phase.elapsed, reverse=True
+        ):
+            yield from child.report_lines(depth + 1)
+
+
+class _Timer:
+    """Context manager that adds the time spent within it to a phase."""
+
+    __slots__ = ("name", "phase", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        global _current_phase
+        self.phase = _current_phase.child(self.name)
+        _current_phase = self.phase
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        global _current_phase
+        self.phase.elapsed += time.perf_counter() - self.start
+        self.phase.calls += 1
+        _current_phase = self.phase.parent
+        return False
+
+
+class _NullTimer:
+    """Context manager that does nothing, used when tracing is disabled."""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+# The phase for the whole command, and the phase currently running, while tracing
+_root_phase = None
+_current_phase = None
+_start_time = None
+
+
+def phase(name: str):
+    """Return a context manager that times a phase of the command.
+
+    When tracing is disabled, the context manager does nothing, so this is cheap
+    enough to use around frequently called code.
+
+    Parameters
+    ----------
+    name: str
+        The name of the phase, as it will be shown in the report.
+    """
+    return _NULL_TIMER if _current_phase is None else _Timer(name)
+
+
+def is_tracing() -> bool:
+    """Return whether tracing is enabled."""
+    return _root_phase is not None
+
+
+def start(name: str):
+    """Start tracing.
+
+    Parameters
+    ----------
+    name: str
+        The name of the phase for the whole command.
+    """
+    global _root_phase, _current_phase, _start_time
+    _root_phase = _current_phase = Phase(name)
+    _start_time = time.perf_counter()
+
+
+def stop() -> Optional[Phase]:
+    """Stop tracing, and return the phase for the whole command.
+
+    Returns None if tracing wasn't started.
+    """
+    global _root_phase, _current_phase
+    root_phase = _root_phase
+    if root_phase is not None:
+        root_phase.elapsed = time.perf_counter() - _start_time
+        root_phase.calls = 1
+    _root_phase = _current_phase = None
+    return root_phase
+
+
+def report(file: Optional[TextIO] = None):
+    """Stop tracing, and write the timing tree (by default to stderr).
+
+    Parameters
+    ----------
+    file: file-like object or None
+        Where to write the report. If None, it is written to stderr.
+    """
+    root_phase = stop()
+    if root_phase is None:
+        return
+    file = file or sys.stderr
+    for line in root_phase.report_lines():
+        print(line, file=file)
@@ -0,0 +1,358 @@
+import os
+import select
+import struct
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import click
+from fourhills.cache import FILE_ERRORS, file_signature
+from fourhills.exceptions import FhError, describe_exception
+from fourhills.fourhills import SCENE_FILENAME
+from fourhills.npc import parse_npc
+from fourhills.scene import Scene
+from fourhills.setting import DirectoryDict, Setting
+from fourhills.text_utils import display_panes
+
+# Editors often save a file in several steps (e.g. writing a temporary file and
+# renaming it), so after a change, wait this long for any more before redrawing
+SETTLE_SECONDS = 0.1
+
+
+class PollingWatcher:
+    """Waits for files to change by checking their modification times regularly."""
+
+    def __init__(self, interval: float = 0.5):
+        """Initialise the object.
+
+        Parameters
+        ----------
+        interval: float
+            How often to check the files, in seconds.
+        """
+        self.interval = interval
+        self._signatures: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+    def watch(self, paths: Iterable[Path]):
+        """Set the files to watch, which need not exist yet.
+
+        Changes are detected from this point, so this should be called before the
+        files are read.
+        """
+        self._signatures = {
+            path: file_signature(path, missing_ok=True) for path in paths
+        }
+
+    def wait(self) -> Set[Path]:
+        """Wait until any of the watched files is changed, created or removed.
+
+        Returns
+        -------
+        set of Path
+            The files that changed.
+        """
+        while True:
+            time.sleep(self.interval)
+            changed = {
+                path
+                for path, signature in self._signatures.items()
+                if file_signature(path, missing_ok=True) != signature
+            }
+            if changed:
+                time.sleep(SETTLE_SECONDS)
+                return changed
+
+    def close(self):
+        """Stop watching. There is nothing to release."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class InotifyWatcher:
+    """Waits for files to change using Linux's inotify, via ctypes.
+
+    The directories containing the files are watched rather than the files
+    themselves, so files that are replaced (as many editors do when saving), or
+    that don't exist yet, are still detected.
+    """
+
+    # Flags from <sys/inotify.h>
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    WATCH_MASK = (
+        IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+    )
+    # The fixed-size part of struct inotify_event: wd, mask, cookie and len
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self):
+        """Initialise the object.
+
+        Raises
+        ------
+        OSError
+            If inotify isn't available.
+        """
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Maps watch descriptors to the directories they watch, and back
+        self._directories: Dict[int, Path] = {}
+        self._descriptors: Dict[Path, int] = {}
+        self._paths: Set[Path] = set()
+
+    def watch(self, paths: Iterable[Path]):
+        """Set the files to watch, which need not exist yet.
+
+        Changes are detected from this point, so this should be called before the
+        files are read.
+        """
+        self._paths = set(paths)
+        directories = {path.parent for path in self._paths}
+        for directory in set(self._descriptors) - directories:
+            descriptor = self._descriptors.pop(directory)
+            del self._directories[descriptor]
+            self._libc.inotify_rm_watch(self._fd, descriptor)
+        for directory in directories - set(self._descriptors):
+            descriptor = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), self.WATCH_MASK
+            )
+            if descriptor < 0:
+                # E.g. the directory doesn't exist
+                continue
+            self._descriptors[directory] = descriptor
+            self._directories[descriptor] = directory
+
+    def _read_events(self) -> Set[Path]:
+        """Read the pending events, returning the watched files they affect."""
+        changed = set()
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            descriptor, _, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name_end = offset + length
+            name = data[offset:name_end].rstrip(b"\0")
+            offset = name_end
+            directory = self._directories.get(descriptor)
+            if directory is not None and name:
+                path = directory / os.fsdecode(name)
+                if path in self._paths:
+                    changed.add(path)
+        return changed
+
+    def wait(self) -> Set[Path]:
+        """Wait until any of the watched files is changed, created or removed.
+
+        Returns
+        -------
+        set of Path
+            The files that changed.
+        """
+        changed = set()
+        while not changed:
+            select.select([self._fd], [], [])
+            changed = self._read_events()
+        # Collect the rest of the changes if the file is being saved in several steps
+        while select.select([self._fd], [], [], SETTLE_SECONDS)[0]:
+            changed |= self._read_events()
+        return changed
+
+    def close(self):
+        """Stop watching, closing the inotify file descriptor (and its watches)."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._directories.clear()
+            self._descriptors.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def make_watcher():
+    """Return an inotify watcher if possible, or a polling watcher otherwise."""
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        # AttributeError if the C library doesn't have the inotify functions
+        return PollingWatcher()
+
+
+class SettingWatch:
+    """Redraws a display whenever any of the setting files it depends on change.
+
+    Only the files the display depends on are watched. When they change, only the
+    changed items are discarded from the setting, so they are parsed again while
+    every other item is reused.
+    """
+
+    def __init__(self, setting: Setting):
+        self.setting = setting
+        self.watcher = make_watcher()
+        # Maps the name of each monster to the NPCs that use it as their stats_base,
+        # which have to be reloaded when it changes
+        self.stats_base_npcs: Dict[str, Set[str]] = defaultdict(set)
+
+    def item_path(self, items: DirectoryDict, name: str) -> Path:
+        """Return the path of the file for an item, even if it doesn't exist yet."""
+        return items.directory / f"{name}.{items.extension}"
+
+    def scene_dependencies(self, scene: Scene, dependencies: Set[Path]):
+        """Add the files a scene's monsters and NPCs are defined in to a set."""
+        for name, _ in scene.monster_names_quantities:
+            dependencies.add(self.item_path(self.setting.monsters, name))
+        for name in scene.npc_names:
+            npc_path = self.item_path(self.setting.npcs, name)
+            dependencies.add(npc_path)
+            if name not in self.setting.npcs:
+                continue
+            # The NPC's stats are loaded from its stats_base, so that file is a
+            # dependency too. The file is only parsed (not loaded) to find it.
+            try:
+                stats_base = self.setting.cache.load(npc_path, parse_npc).get(
+                    "stats_base"
+                )
+            except (FhError, AttributeError):
+                continue
+            if stats_base:
+                dependencies.add(self.item_path(self.setting.monsters, stats_base))
+                self.stats_base_npcs[stats_base].add(name)
+
+    def invalidate(self, changed: Set[Path]):
+        """Discard the items defined in changed files, so they are parsed again."""
+        for items in (
+            self.setting.monsters,
+            self.setting.npcs,
+            self.setting.cheatsheets,
+        ):
+            changed_names = [
+                path.stem for path in changed if path.parent == items.directory
+            ]
+            if not changed_names:
+                continue
+            # Files may have been created or removed
+            items.rescan()
+            for name in changed_names:
+                items.invalidate(name)
+                if items is self.setting.monsters:
+                    for npc_name in self.stats_base_npcs.pop(name, ()):
+                        self.setting.npcs.invalidate(npc_name)
+
+    def run(self, prepare: Callable[[Set[Path]], Iterable[List[str]]]):
+        """Draw a display, and redraw it whenever its files change, until Ctrl+C.
+
+        Parameters
+        ----------
+        prepare: Callable
+            Called with an empty set, which it adds the paths of the files the
+            display depends on to. It returns the panes to display. Any files added
+            before it raises an exception are still watched.
+        """
+        dependencies: Set[Path] = set()
+        try:
+            with self.watcher:
+                while True:
+                    previous_dependencies = dependencies
+                    dependencies = set()
+                    click.clear()
+                    try:
+                        panes = prepare(dependencies)
+                        self.watcher.watch(dependencies)
+                        display_panes(
+                            panes,
+                            self.setting.panes,
+                            self.setting.pane_width,
+                            pager=False,
+                        )
+                    except FILE_ERRORS as exc:
+                        # E.g. a file that is empty while an editor saves it, or has
+                        # a misspelt field. Keep watching the files from before the
+                        # error, so fixing it causes a redraw.
+                        dependencies |= previous_dependencies
+                        self.watcher.watch(dependencies)
+                        error = describe_exception(exc, "Unknown monster or NPC")
+                        click.echo(f"Error: {error}", err=True)
+                    click.echo(
+                        f"Watching {len(dependencies)} files for changes. "
+                        "Press Ctrl+C to stop.",
+                        err=True,
+                    )
+                    self.invalidate(self.watcher.wait())
+        except KeyboardInterrupt:
+            click.echo()
+
+
+def watch_scene(setting: Setting, view: str):
+    """Display a view of the scene at the current location, redrawing it on changes.
+
+    Parameters
+    ----------
+    setting: Setting
+        The setting the scene is in.
+    view: str
+        Which view to display: "battle", "npcs" or "scene".
+    """
+    setting_watch = SettingWatch(setting)
+    scene_path = Path(SCENE_FILENAME).resolve()
+
+    def prepare(dependencies):
+        dependencies.add(scene_path)
+        scene = Scene.from_file(scene_path, setting=setting, cache=setting.cache)
+        setting_watch.scene_dependencies(scene, dependencies)
+        if view == "battle":
+            return scene.battle_panes()
+        elif view == "npcs":
+            return scene.npc_panes()
+        return scene.scene_panes()
+
+    setting_watch.run(prepare)
+
+
+def watch_cheatsheet(setting: Setting, name: str):
+    """Display a cheatsheet, redrawing it when its file changes.
+
+    Parameters
+    ----------
+    setting: Setting
+        The setting the cheatsheet is in.
+    name: str
+        The full name of the cheatsheet.
+    """
+    setting_watch = SettingWatch(setting)
+    cheatsheet_path = setting_watch.item_path(setting.cheatsheets, name)
+
+    def prepare(dependencies):
+        dependencies.add(cheatsheet_path)
+        if name not in setting.cheatsheets:
+            raise FhError(f'Cheatsheet "{name}" has been removed')
+        cheatsheet = setting.cheatsheets[name]
+        return (section.lines(setting.pane_width) for section in cheatsheet.sections)
+
+    setting_watch.run(prepare)
@@ -0,0 +1,315 @@
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import click
+from fourhills.cache import update_file_entries
+from fourhills.fourhills import SCENE_FILENAME, get_setting
+from fourhills.npc import parse_npc
+from fourhills.prefix_index import PrefixIndex
+from fourhills.scene import Scene
+from fourhills.setting import Setting
+
+
+class ReferenceIndex:
+    """Index of where each monster and NPC is referred to in the setting.
+
+    Records the monsters and NPCs placed in each scene, and each NPC's stats_base
+    monster, and the reverse: the scenes each monster and NPC is placed in, and the
+    NPCs based on each monster. The index is persisted in the setting's cache
+    directory, and `update` only parses the files that have changed since it was
+    last updated.
+
+    Locations are identified as by `Setting.location`, e.g. "/SouthernForest/Cave".
+
+    Finding the scene files doesn't list every directory of the world each time:
+    the subdirectories of each directory, and whether it has a scene file, are kept
+    in the index with the directory's modification time, which changes whenever a
+    file or subdirectory is created, removed or renamed in it. The scene files
+    themselves are still checked for changes, as editing a file in place doesn't
+    change its directory.
+    """
+
+    NAME = "references"
+    # Increment this whenever the format of the index changes
+    VERSION = 3
+
+    def __init__(self, setting: Setting):
+        """Initialise the object, loading the index from the cache if possible.
+
+        Parameters
+        ----------
+        setting: Setting
+            The setting to index.
+        """
+        self.setting = setting
+        data = setting.cache.load_index(self.NAME, self.VERSION) or {}
+        # Maps each location with a scene file to the signature of the file, and the
+        # names and quantities of the monsters there and the names of the NPCs there
+        self._scenes: Dict[str, Tuple] = data.get("scenes", {})
+        # Maps each NPC name to the signature of its file and its stats_base (or None)
+        self._npcs: Dict[str, Tuple] = data.get("npcs", {})
+        # Maps the scene files and NPC files that couldn't be parsed to their
+        # signatures and the errors, so they aren't parsed again until they change
+        self._scene_failures: Dict[str, Tuple] = data.get("scene_failures", {})
+        self._npc_failures: Dict[str, Tuple] = data.get("npc_failures", {})
+        # Maps each directory of the world, relative to the world directory, to its
+        # modification time, the names of its subdirectories, and whether it has a
+        # scene file
+        self._directories: Dict[str, Tuple] = data.get("directories", {})
+        # The reverse references, built from the above
+        self._monster_scenes: Dict[str, List[Tuple[str, int]]] = data.get(
+            "monster_scenes", {}
+        )
+        self._npc_scenes: Dict[str, List[str]] = data.get("npc_scenes", {})
+        self._stats_base_npcs: Dict[str, List[str]] = data.get("stats_base_npcs", {})
+
+    def _scene_files(self) -> List[Tuple[str, str]]:
+        """Return the location and path of every scene file in the world.
+
+        Only the directories that have changed since the index was last updated are
+        listed, and `_directories` is updated. When the setting is compiled, the
+        scene files are those in its database instead.
+        """
+        if self.setting.compiled:
+            return [
+                (self.setting.location(scene_path.parent), str(scene_path))
+                for scene_path in self.setting.scene_paths()
+            ]
+        world_dir = str(self.setting.world_dir)
+        directories = {}
+        scene_files = []
+        pending = [""]
+        while pending:
+            relative_dir = pending.pop()
+            directory = os.path.join(world_dir, relative_dir)
+            try:
+                modified = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            entry = self._directories.get(relative_dir)
+            if entry is None or entry[0] != modified:
+                subdirectories = []
+                has_scene = False
+                with os.scandir(directory) as dir_entries:
+                    for dir_entry in dir_entries:
+                        # As with os.walk, symlinks to directories aren't followed
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(dir_entry.name)
+                        elif dir_entry.name == SCENE_FILENAME:
+                            has_scene = True
+                entry = (modified, tuple(subdirectories), has_scene)
+            directories[relative_dir] = entry
+            if entry[2]:
+                scene_files.append(
+                    (
+                        "/" + relative_dir.replace(os.sep, "/"),
+                        os.path.join(directory, SCENE_FILENAME),
+                    )
+                )
+            pending.extend(
+                os.path.join(relative_dir, name) if relative_dir else name
+                for name in entry[1]
+            )
+        self._directories = directories
+        return scene_files
+
+    def update(self) -> List[str]:
+        """Bring the index up to date with the setting's files, and save it.
+
+        Only the scene and NPC files whose modification time or size has changed
+        since the index was last updated are parsed.
+
+        Returns
+        -------
+        list of str
+            A description of each file that couldn't be parsed. These files are
+            left out of the index.
+        """
+        previous_directories = self._directories
+        scene_files = self._scene_files()
+        scenes_changed, errors = update_file_entries(
+            self._scenes,
+            self._scene_failures,
+            scene_files,
+            self.parse_scene_references,
+            signature=self.setting.cache.signature,
+        )
+        npcs_changed, npc_errors = update_file_entries(
+            self._npcs,
+            self._npc_failures,
+            ((name, self.setting.npcs.path(name)) for name in self.setting.npcs),
+            self.parse_npc_references,
+            signature=self.setting.cache.signature,
+        )
+        errors.extend(npc_errors)
+
+        if scenes_changed or npcs_changed:
+            self._build_reverse_references()
+        if scenes_changed or npcs_changed or self._directories != previous_directories:
+            self.setting.cache.store_index(
+                self.NAME,
+                self.VERSION,
+                {
+                    "scenes": self._scenes,
+                    "npcs": self._npcs,
+                    "scene_failures": self._scene_failures,
+                    "npc_failures": self._npc_failures,
+                    "directories": self._directories,
+                    "monster_scenes": self._monster_scenes,
+                    "npc_scenes": self._npc_scenes,
+                    "stats_base_npcs": self._stats_base_npcs,
+                },
+            )
+        return errors
+
+    def parse_scene_references(self, location: str, scene_path: str) -> Tuple:
+        """Return the names and quantities of a scene's monsters, and its NPCs' names.
+
+        Raises
+        ------
+        FhParseError
+            If the scene file can't be parsed.
+        """
+        scene = Scene.from_file(
+            Path(scene_path), setting=self.setting, cache=self.setting.cache
+        )
+        return tuple(scene.monster_names_quantities), tuple(scene.npc_names)
+
+    def parse_npc_references(self, name: str, npc_path: Path) -> Optional[str]:
+        """Return the name of an NPC's stats_base, or None if it has none.
+
+        Only the name is needed, so the NPC's file is parsed rather than loading the
+        NPC (which loads its stats too).
+
+        Raises
+        ------
+        FhParseError
+            If the NPC file can't be parsed.
+        """
+        return self.setting.cache.load(npc_path, parse_npc).get("stats_base")
+
+    def _build_reverse_references(self):
+        monster_quantities = defaultdict(dict)
+        npc_scenes = defaultdict(list)
+        for location in sorted(self._scenes):
+            _, (monster_names_quantities, npc_names) = self._scenes[location]
+            for name, quantity in monster_names_quantities:
+                quantities = monster_quantities[name]
+                quantities[location] = quantities.get(location, 0) + quantity
+            for name in npc_names:
+                npc_scenes[name].append(location)
+        stats_base_npcs = defaultdict(list)
+        for name in sorted(self._npcs):
+            _, stats_base = self._npcs[name]
+            if stats_base:
+                stats_base_npcs[stats_base].append(name)
+
+        self._monster_scenes = {
+            name: list(quantities.items())
+            for name, quantities in monster_quantities.items()
+        }
+        self._npc_scenes = dict(npc_scenes)
+        self._stats_base_npcs = dict(stats_base_npcs)
+
+    def monster_scenes(self, name: str) -> List[Tuple[str, int]]:
+        """Return the locations a monster is placed at, and how many are at each."""
+        return self._monster_scenes.get(name, [])
+
+    def npc_scenes(self, name: str) -> List[str]:
+        """Return the locations an NPC is placed at."""
+        return self._npc_scenes.get(name, [])
+
+    def npcs_based_on(self, name: str) -> List[str]:
+        """Return the names of the NPCs whose stats_base is a monster."""
+        return self._stats_base_npcs.get(name, [])
+
+    def stats_base(self, name: str) -> Optional[str]:
+        """Return the stats_base of an NPC, or None if it has none."""
+        entry = self._npcs.get(name)
+        return entry[1] if entry else None
+
+    def is_monster(self, name: str) -> bool:
+        """Return whether a name is of a monster, or is referred to as one."""
+        return (
+            name in self.setting.monsters
+            or name in self._monster_scenes
+            or name in self._stats_base_npcs
+        )
+
+    def is_npc(self, name: str) -> bool:
+        """Return whether a name is of an NPC, or is referred to as one."""
+        return name in self.setting.npcs or name in self._npc_scenes
+
+    def names(self) -> List[str]:
+        """Return the names of every monster and NPC, including ones without files."""
+        return sorted(
+            set(self.setting.monsters)
+            | set(self.setting.npcs)
+            | set(self._monster_scenes)
+            | set(self._npc_scenes)
+            | set(self._stats_base_npcs)
+        )
+
+
+def _scene_lines(locations: List[str]) -> List[str]:
+    # Locations are shown as in the shell's prompt
+    lines = ["  Scenes:"]
+    lines.extend(f"    {location}" for location in locations)
+    if not locations:
+        lines.append("    None")
+    return lines
+
+
+def where_lines(index: ReferenceIndex, name: str) -> List[str]:
+    """Return lines describing where a monster and/or NPC is referred to."""
+    lines = []
+    if index.is_monster(name):
+        missing = "" if name in index.setting.monsters else " (no monster file)"
+        lines.append(f'Monster "{name}"{missing}')
+        lines.extend(
+            _scene_lines(
+                [
+                    f"{location} x{quantity}" if quantity != 1 else location
+                    for location, quantity in index.monster_scenes(name)
+                ]
+            )
+        )
+        based_npcs = index.npcs_based_on(name)
+        if based_npcs:
+            lines.append(f"  NPCs with its stats: {', '.join(based_npcs)}")
+    if index.is_npc(name):
+        missing = "" if name in index.setting.npcs else " (no NPC file)"
+        lines.append(f'NPC "{name}"{missing}')
+        stats_base = index.stats_base(name)
+        if stats_base:
+            lines.append(f"  Stats base: {stats_base}")
+        lines.extend(_scene_lines(index.npc_scenes(name)))
+    return lines
+
+
+@click.command()
+@click.argument("name", metavar="<name>")
+@click.pass_context
+def where(ctx, name):
+    """Show where the monster or NPC called <name> is used.
+
+    Lists the scenes it is placed in, as well as an NPC's stats base, and the NPCs
+    whose stats are based on a monster. As with cheatsheets, a unique prefix of the
+    name can be used.
+    """
+    setting = get_setting(ctx)
+    index = ReferenceIndex(setting)
+    for error in index.update():
+        click.echo(f"Warning: skipped {error}", err=True)
+
+    names = index.names()
+    if name not in names:
+        matches = PrefixIndex(names).completions(name)
+        if not matches:
+            ctx.fail(f'Unknown monster or NPC "{name}"')
+        elif len(matches) > 1:
+            ctx.fail(f"Ambiguous name. Too many matches: {', '.join(matches)}")
+        name = matches[0]
+
+    click.echo("\n".join(where_lines(index, name)))
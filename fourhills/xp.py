@@ -0,0 +1,229 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import click
+from fourhills.exceptions import FhError, FhParseError
+from fourhills.fourhills import SCENE_FILENAME, get_setting
+from fourhills.scene import Scene
+from fourhills.setting import Setting
+
+LocationXp = namedtuple(
+    "LocationXp",
+    ["location", "monster_xp", "npc_xp", "subtree_monster_xp", "subtree_npc_xp"],
+)
+
+
+class XpCalculator:
+    """Calculates the XP of scenes, looking up the XP of each monster and NPC once.
+
+    The XP of every monster and NPC is remembered by name, so each file only has to
+    be loaded the first time it is placed in a scene, however many scenes it is in.
+    """
+
+    def __init__(self, setting: Setting):
+        self.setting = setting
+        self._monster_xp: Dict[str, int] = {}
+        self._npc_xp: Dict[str, int] = {}
+
+    def monster_xp(self, name: str) -> int:
+        """Return the XP of a monster.
+
+        Raises
+        ------
+        KeyError
+            If there is no monster with that name.
+        FhParseError
+            If the monster's file or challenge rating is invalid.
+        """
+        if name not in self._monster_xp:
+            self._monster_xp[name] = self.setting.monsters[name].xp
+        return self._monster_xp[name]
+
+    def npc_xp(self, name: str) -> int:
+        """Return the XP of an NPC, which is 0 if it has no stats.
+
+        Raises
+        ------
+        KeyError
+            If there is no NPC with that name.
+        FhParseError
+            If the NPC's file or the challenge rating of its stats is invalid.
+        """
+        if name not in self._npc_xp:
+            stats = self.setting.npcs[name].stats
+            self._npc_xp[name] = stats.xp if stats else 0
+        return self._npc_xp[name]
+
+    def scene_xp(self, scene: Scene) -> Tuple[int, int]:
+        """Return the total XP of the monsters and of the NPCs in a scene."""
+        monster_xp = sum(
+            quantity * self.monster_xp(name)
+            for name, quantity in scene.monster_names_quantities
+        )
+        npc_xp = sum(self.npc_xp(name) for name in scene.npc_names)
+        return monster_xp, npc_xp
+
+
+def _scene_locations(
+    setting: Setting, top: Path, recursive: bool
+) -> Iterator[Tuple[Path, Optional[Path]]]:
+    """Produce each location in (part of) the world, and its scene file if it has one.
+
+    Locations are relative to `top`, top-down with each location followed by the
+    locations within it in alphabetical order. When the setting is compiled, the
+    locations are those with a scene in its database, and the locations containing
+    them, as the scene files needn't exist.
+    """
+    if setting.compiled:
+        scene_paths = {
+            scene_path.parent.relative_to(top): scene_path
+            for scene_path in setting.scene_paths(top)
+            if recursive or scene_path.parent == top
+        }
+        locations = {Path(".")}
+        for location in scene_paths:
+            locations.add(location)
+            locations.update(location.parents)
+        for location in sorted(locations, key=lambda location: location.parts):
+            yield location, scene_paths.get(location)
+        return
+
+    for directory, dirnames, filenames in os.walk(top):
+        dirnames.sort()
+        if not recursive:
+            dirnames.clear()
+        scene_path = Path(directory, SCENE_FILENAME)
+        yield (
+            Path(directory).relative_to(top),
+            scene_path if SCENE_FILENAME in filenames else None,
+        )
+
+
+def world_xp(
+    setting: Setting, top: Path, recursive: bool = True
+) -> Iterator[LocationXp]:
+    """Calculate the XP at each location in (part of) the world.
+
+    The directory tree is walked once, loading each scene file, and the XP of each
+    location is added to the subtree totals of all of the locations containing it.
+
+    Parameters
+    ----------
+    setting: Setting
+        The setting the world belongs to.
+    top: Path
+        The directory of the location to start from.
+    recursive: bool
+        Whether to include every location within `top`, or only `top` itself.
+
+    Yields
+    ------
+    LocationXp
+        The XP of each location, top-down with each location followed by the
+        locations within it in alphabetical order. The location is a path relative to
+        `top`. Locations without a scene file have 0 XP of their own.
+
+    Raises
+    ------
+    FhParseError
+        If there is a problem with a scene, monster or NPC file. The message
+        includes the path of the scene file.
+    """
+    calculator = XpCalculator(setting)
+    # The locations in the order they are walked, and the XP at each
+    locations: List[Path] = []
+    own_xp: Dict[Path, Tuple[int, int]] = {}
+    for location, scene_path in _scene_locations(setting, top, recursive):
+        locations.append(location)
+        if scene_path is None:
+            own_xp[location] = (0, 0)
+            continue
+        try:
+            scene = Scene.from_file(scene_path, setting=setting, cache=setting.cache)
+            own_xp[location] = calculator.scene_xp(scene)
+        except KeyError as exc:
+            raise FhParseError(f"{scene_path}: unknown monster or NPC {str(exc)}")
+        except FileNotFoundError:
+            raise FhParseError(f"{scene_path}: scene file not found")
+        except FhError as exc:
+            raise FhParseError(f"{scene_path}: {str(exc)}")
+
+    # Add up the subtrees from the bottom up, so each location's subtree total is
+    # complete before it is added to its parent's
+    subtree_xp = dict(own_xp)
+    for location in reversed(locations):
+        if location != Path("."):
+            monster_xp, npc_xp = subtree_xp[location]
+            parent_monster_xp, parent_npc_xp = subtree_xp[location.parent]
+            subtree_xp[location.parent] = (
+                parent_monster_xp + monster_xp,
+                parent_npc_xp + npc_xp,
+            )
+
+    for location in locations:
+        yield LocationXp(location, *own_xp[location], *subtree_xp[location])
+
+
+def report_lines(
+    location_xps: List[LocationXp], top_name: str, subtrees: bool = True
+) -> Iterator[str]:
+    """Produce the lines of a table of XP per location, indented as a tree.
+
+    Parameters
+    ----------
+    location_xps: list of LocationXp
+        The XP of each location, as produced by `world_xp`.
+    top_name: str
+        The name to show for the top location.
+    subtrees: bool
+        Whether to include a column of the total XP of each location's subtree.
+    """
+    header = f"{'Location':<40} {'Monster XP':>10} {'NPC XP':>10} {'Total XP':>10}"
+    yield header + f" {'Subtree XP':>11}" if subtrees else header
+    for location_xp in location_xps:
+        location = location_xp.location
+        name = "  " * len(location.parts) + (location.name or top_name)
+        line = (
+            f"{name:<40} {location_xp.monster_xp:>10} {location_xp.npc_xp:>10} "
+            f"{location_xp.monster_xp + location_xp.npc_xp:>10}"
+        )
+        if subtrees:
+            subtree_xp = location_xp.subtree_monster_xp + location_xp.subtree_npc_xp
+            line += f" {subtree_xp:>11}"
+        yield line
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--recursive",
+    is_flag=True,
+    help="Include every location within the current location.",
+)
+@click.pass_context
+def xp(ctx, recursive):
+    """Display the monster and NPC XP at the current location.
+
+    With --recursive, every location within the current location is included, along
+    with the total XP of the locations within each one. Run from outside the world
+    directory, the whole world is included.
+    """
+    setting = get_setting(ctx)
+    world_dir = setting.world_dir
+    current_dir = Path.cwd().resolve()
+    if current_dir == world_dir or world_dir in current_dir.parents:
+        top = current_dir
+    else:
+        top = world_dir
+        recursive = True
+
+    try:
+        location_xps = list(world_xp(setting, top, recursive))
+    except FhParseError as exc:
+        ctx.fail(f"Problem calculating XP: {str(exc)}")
+
+    lines = report_lines(location_xps, top.name, subtrees=recursive)
+    click.echo_via_pager(
+        line if index == 0 else "\n" + line for index, line in enumerate(lines)
+    )
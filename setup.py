@@ -13,6 +13,9 @@ setuptools.setup(
         "dataclasses",
         "pyyaml",
     ],
+    extras_require={
+        "simulate": ["numpy"],
+    },
     entry_points={
         'console_scripts': [
             'fh = fourhills.fourhills:cli',